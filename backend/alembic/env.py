@@ -3,7 +3,6 @@ from logging.config import fileConfig
 from sqlalchemy import engine_from_config, pool
 
 from alembic import context
-from database import engine
 from models.models import SQLModel
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,69 @@
+"""baseline schema
+
+The original `users` and `events` tables, as SQLModel.metadata.create_all()
+used to create them. Databases bootstrapped that way should run `alembic
+stamp 0001` once instead of applying this revision (or stamp a later one
+if create_all had already added that revision's tables).
+
+Revision ID: 0001
+Revises: 
+Create Date: 2025-09-01 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('users',
+    sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('picture', sa.String(), nullable=True),
+    sa.Column('google_id', sa.String(), nullable=True),
+    sa.Column('calendar_id', sa.String(), nullable=True),
+    sa.Column('google_access_token', sa.Text(), nullable=True),
+    sa.Column('google_refresh_token', sa.Text(), nullable=True),
+    sa.Column('token_expiry', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_index(op.f('ix_users_google_id'), 'users', ['google_id'], unique=False)
+    op.create_table('events',
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('type', sa.Enum('assignment', 'exam', 'final', 'project', 'office-hours', 'reminder', name='eventtype'), nullable=False),
+    sa.Column('event_date', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('task_time', sa.Time(), nullable=False),
+    sa.Column('duration_minutes', sa.Integer(), nullable=True),
+    sa.Column('google_event_id', sa.String(), nullable=True),
+    sa.Column('is_synced', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('events')
+    op.drop_index(op.f('ix_users_google_id'), table_name='users')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_table('users')
+    sa.Enum(name='eventtype').drop(op.get_bind(), checkfirst=True)
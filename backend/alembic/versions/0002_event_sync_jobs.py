@@ -0,0 +1,51 @@
+"""event_sync_jobs: outbox of Google Calendar pushes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-09-02 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('event_sync_jobs',
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('event_id', postgresql.UUID(as_uuid=True), nullable=True),
+    sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('operation', sa.Enum('insert', 'update', 'delete', name='syncoperation'), nullable=False),
+    sa.Column('google_event_id', sa.String(), nullable=True),
+    sa.Column('status', sa.Enum('pending', 'in-progress', 'done', 'failed', name='syncjobstatus'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_event_sync_jobs_status_next_attempt', 'event_sync_jobs', ['status', 'next_attempt_at'], unique=False)
+    op.create_index(op.f('ix_event_sync_jobs_user_id'), 'event_sync_jobs', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_event_sync_jobs_user_id'), table_name='event_sync_jobs')
+    op.drop_index('ix_event_sync_jobs_status_next_attempt', table_name='event_sync_jobs')
+    op.drop_table('event_sync_jobs')
+    sa.Enum(name='syncjobstatus').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='syncoperation').drop(op.get_bind(), checkfirst=True)
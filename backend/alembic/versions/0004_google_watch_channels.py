@@ -0,0 +1,46 @@
+"""google_watch_channels: Calendar push notification channels
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-09-04 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('google_watch_channels',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('calendar_id', sa.String(), nullable=False),
+    sa.Column('resource_id', sa.String(), nullable=False),
+    sa.Column('token', sa.String(), nullable=False),
+    sa.Column('expiration', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_google_watch_channels_expiration'), 'google_watch_channels', ['expiration'], unique=False)
+    op.create_index(op.f('ix_google_watch_channels_user_id'), 'google_watch_channels', ['user_id'], unique=False)
+    op.add_column('google_calendar_sync_state', sa.Column('watch_expires_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('google_calendar_sync_state') as batch:
+        batch.drop_column('watch_expires_at')
+    op.drop_index(op.f('ix_google_watch_channels_user_id'), table_name='google_watch_channels')
+    op.drop_index(op.f('ix_google_watch_channels_expiration'), table_name='google_watch_channels')
+    op.drop_table('google_watch_channels')
@@ -0,0 +1,47 @@
+"""index events by (user_id, event_date)
+
+Lets a month view be a bounded index range scan instead of reading the
+user's whole event history.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-09-08 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY keeps events writable while the index builds; it cannot
+    # run inside a transaction, hence the autocommit block
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_events_user_id_event_date',
+            'events',
+            ['user_id', 'event_date'],
+            unique=False,
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_events_user_id_event_date',
+            table_name='events',
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
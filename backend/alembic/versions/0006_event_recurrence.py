@@ -0,0 +1,56 @@
+"""recurring events
+
+Adds the recurrence rule, exception dates and last-occurrence bound to
+events, plus a partial index used to find a user's series overlapping a
+requested window.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2025-09-15 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # nullable columns without defaults: a metadata-only change on Postgres
+    op.add_column('events', sa.Column('recurrence_rule', sa.Text(), nullable=True))
+    op.add_column('events', sa.Column('exdates', sa.JSON(), nullable=True))
+    op.add_column('events', sa.Column('recurrence_until', sa.DateTime(timezone=True), nullable=True))
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_events_user_id_recurring',
+            'events',
+            ['user_id', 'recurrence_until'],
+            unique=False,
+            if_not_exists=True,
+            postgresql_concurrently=True,
+            postgresql_where=sa.text('recurrence_rule IS NOT NULL'),
+            sqlite_where=sa.text('recurrence_rule IS NOT NULL'),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_events_user_id_recurring',
+            table_name='events',
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+    op.drop_column('events', 'recurrence_until')
+    op.drop_column('events', 'exdates')
+    op.drop_column('events', 'recurrence_rule')
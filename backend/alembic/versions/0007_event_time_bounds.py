@@ -0,0 +1,129 @@
+"""events.starts_at / ends_at with a GiST period index
+
+event_date + task_time + duration_minutes become real instants so range and
+overlap filters run in SQL. Existing rows are backfilled in batches; the
+GiST index over (user_id, tstzrange(starts_at, ends_at)) needs btree_gist
+for the uuid column.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2025-09-22 00:00:00.000000
+
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+# same rule as models.event_bounds: the UTC day of event_date at task_time
+BACKFILL_SQL = sa.text("""
+    WITH batch AS (
+        SELECT id FROM events WHERE starts_at IS NULL LIMIT :batch_size
+    ), bounds AS (
+        SELECT e.id,
+               ((e.event_date AT TIME ZONE 'UTC')::date + e.task_time) AT TIME ZONE 'UTC' AS starts_at,
+               COALESCE(e.duration_minutes, 60) AS minutes
+        FROM events e JOIN batch USING (id)
+    )
+    UPDATE events
+    SET starts_at = bounds.starts_at,
+        ends_at = bounds.starts_at + make_interval(mins => bounds.minutes)
+    FROM bounds
+    WHERE events.id = bounds.id
+""")
+
+
+def _backfill_generic(bind) -> None:
+    events = sa.table(
+        'events',
+        sa.column('id'), sa.column('event_date', sa.DateTime(timezone=True)),
+        sa.column('task_time', sa.Time()), sa.column('duration_minutes', sa.Integer()),
+        sa.column('starts_at', sa.DateTime(timezone=True)),
+        sa.column('ends_at', sa.DateTime(timezone=True)),
+    )
+    rows = bind.execute(
+        sa.select(events.c.id, events.c.event_date, events.c.task_time,
+                  events.c.duration_minutes).where(events.c.starts_at.is_(None))
+    ).all()
+    for row in rows:
+        event_date = row.event_date
+        if event_date.tzinfo is not None:
+            event_date = event_date.astimezone(timezone.utc)
+        starts_at = datetime.combine(event_date.date(), row.task_time, tzinfo=timezone.utc)
+        bind.execute(
+            events.update().where(events.c.id == row.id).values(
+                starts_at=starts_at,
+                ends_at=starts_at + timedelta(minutes=row.duration_minutes or 60),
+            )
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('events', sa.Column('starts_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('events', sa.Column('ends_at', sa.DateTime(timezone=True), nullable=True))
+
+    bind = op.get_bind()
+    is_postgres = bind.dialect.name == 'postgresql'
+    if is_postgres:
+        # batches keep each UPDATE's row locks and WAL burst small
+        with op.get_context().autocommit_block():
+            while bind.execute(BACKFILL_SQL, {'batch_size': BATCH_SIZE}).rowcount:
+                pass
+    else:
+        _backfill_generic(bind)
+
+    with op.batch_alter_table('events') as batch:
+        batch.alter_column('starts_at', nullable=False)
+        batch.alter_column('ends_at', nullable=False)
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_events_user_id_starts_at',
+            'events',
+            ['user_id', 'starts_at'],
+            unique=False,
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+        if is_postgres:
+            op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+            op.create_index(
+                'ix_events_user_id_period',
+                'events',
+                ['user_id', sa.text('tstzrange(starts_at, ends_at)')],
+                unique=False,
+                if_not_exists=True,
+                postgresql_using='gist',
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_events_user_id_period',
+            table_name='events',
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_events_user_id_starts_at',
+            table_name='events',
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+    with op.batch_alter_table('events') as batch:
+        batch.drop_column('ends_at')
+        batch.drop_column('starts_at')
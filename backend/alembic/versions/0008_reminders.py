@@ -0,0 +1,84 @@
+"""reminders: scheduled digest and exam alert emails
+
+Plus a partial index on upcoming exams, which the planner scans across all
+users every few minutes.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2025-09-29 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('reminders',
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('kind', sa.Enum('digest', 'event', name='reminderkind'), nullable=False),
+    sa.Column('event_id', postgresql.UUID(as_uuid=True), nullable=True),
+    sa.Column('dedupe_key', sa.String(), nullable=False),
+    sa.Column('due_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('status', sa.Enum('pending', 'sending', 'sent', 'skipped', 'failed', name='reminderstatus'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('provider_message_id', sa.String(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('dedupe_key', name='uq_reminders_dedupe_key')
+    )
+    op.create_index(op.f('ix_reminders_user_id'), 'reminders', ['user_id'], unique=False)
+    op.create_index(
+        'ix_reminders_pending_due_at',
+        'reminders',
+        ['due_at'],
+        unique=False,
+        postgresql_where=sa.text("status = 'pending'"),
+        sqlite_where=sa.text("status = 'pending'"),
+    )
+    op.create_index('ix_reminders_status_locked_until', 'reminders', ['status', 'locked_until'], unique=False)
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_events_exam_starts_at',
+            'events',
+            ['starts_at'],
+            unique=False,
+            if_not_exists=True,
+            postgresql_where=sa.text("type IN ('exam', 'final')"),
+            sqlite_where=sa.text("type IN ('exam', 'final')"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_events_exam_starts_at',
+            table_name='events',
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+    op.drop_index('ix_reminders_status_locked_until', table_name='reminders')
+    op.drop_index('ix_reminders_pending_due_at', table_name='reminders')
+    op.drop_index(op.f('ix_reminders_user_id'), table_name='reminders')
+    op.drop_table('reminders')
+    sa.Enum(name='reminderstatus').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='reminderkind').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,144 @@
+"""courses: course / office-hours directory, user roles, deadline summaries
+
+Postgres also gets pg_trgm and GIN trigram indexes for people and course
+search; other databases fall back to LIKE scans.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2025-10-06 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+USER_ROLES = ('student', 'ta', 'ra', 'lab_instructor', 'teacher')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    is_postgres = bind.dialect.name == 'postgresql'
+
+    # add_column does not create the enum type by itself
+    sa.Enum(*USER_ROLES, name='userrole').create(bind, checkfirst=True)
+    op.add_column('users', sa.Column(
+        'role', sa.Enum(*USER_ROLES, name='userrole'), server_default='student', nullable=False,
+    ))
+    op.create_index(op.f('ix_users_role'), 'users', ['role'], unique=False)
+
+    op.create_table('courses',
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('code', sa.String(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('semester', sa.String(), nullable=False),
+    sa.Column('instructor_id', postgresql.UUID(as_uuid=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['instructor_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('code', 'semester', name='uq_courses_code_semester')
+    )
+    op.create_index(op.f('ix_courses_instructor_id'), 'courses', ['instructor_id'], unique=False)
+    op.create_index('ix_courses_lower_code', 'courses', [sa.text('lower(code)')], unique=False)
+
+    op.create_table('office_hours',
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('course_id', postgresql.UUID(as_uuid=True), nullable=True),
+    sa.Column('day', sa.Enum('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun', name='weekday'), nullable=False),
+    sa.Column('start_time', sa.Time(), nullable=False),
+    sa.Column('end_time', sa.Time(), nullable=False),
+    sa.Column('room', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_office_hours_course_id'), 'office_hours', ['course_id'], unique=False)
+    op.create_index(op.f('ix_office_hours_user_id'), 'office_hours', ['user_id'], unique=False)
+
+    op.create_table('course_deadline_summaries',
+    sa.Column('course_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('deadlines', sa.JSON(), nullable=False),
+    sa.Column('next_deadline_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('next_exam_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('refreshed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('course_id')
+    )
+
+    with op.batch_alter_table('events') as batch:
+        batch.add_column(sa.Column('course_id', postgresql.UUID(as_uuid=True), nullable=True))
+        batch.create_foreign_key(
+            'events_course_id_fkey', 'courses', ['course_id'], ['id'], ondelete='SET NULL'
+        )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_events_course_id_starts_at',
+            'events',
+            ['course_id', 'starts_at'],
+            unique=False,
+            if_not_exists=True,
+            postgresql_where=sa.text('course_id IS NOT NULL'),
+            sqlite_where=sa.text('course_id IS NOT NULL'),
+            postgresql_concurrently=True,
+        )
+        if is_postgres:
+            op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            op.create_index(
+                'ix_users_search_trgm',
+                'users',
+                [sa.text("lower(email || ' ' || coalesce(name, '')) gin_trgm_ops")],
+                unique=False,
+                if_not_exists=True,
+                postgresql_using='gin',
+                postgresql_concurrently=True,
+            )
+            op.create_index(
+                'ix_courses_search_trgm',
+                'courses',
+                [sa.text("lower(code || ' ' || name) gin_trgm_ops")],
+                unique=False,
+                if_not_exists=True,
+                postgresql_using='gin',
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_courses_search_trgm', table_name='courses', if_exists=True,
+                      postgresql_concurrently=True)
+        op.drop_index('ix_users_search_trgm', table_name='users', if_exists=True,
+                      postgresql_concurrently=True)
+        op.drop_index('ix_events_course_id_starts_at', table_name='events', if_exists=True,
+                      postgresql_concurrently=True)
+    with op.batch_alter_table('events') as batch:
+        batch.drop_constraint('events_course_id_fkey', type_='foreignkey')
+        batch.drop_column('course_id')
+
+    op.drop_table('course_deadline_summaries')
+    op.drop_index(op.f('ix_office_hours_user_id'), table_name='office_hours')
+    op.drop_index(op.f('ix_office_hours_course_id'), table_name='office_hours')
+    op.drop_table('office_hours')
+    op.drop_index('ix_courses_lower_code', table_name='courses')
+    op.drop_index(op.f('ix_courses_instructor_id'), table_name='courses')
+    op.drop_table('courses')
+
+    op.drop_index(op.f('ix_users_role'), table_name='users')
+    with op.batch_alter_table('users') as batch:
+        batch.drop_column('role')
+    sa.Enum(name='weekday').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='userrole').drop(op.get_bind(), checkfirst=True)
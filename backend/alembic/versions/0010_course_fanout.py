@@ -0,0 +1,83 @@
+"""course fan-out: enrollments, shared course events and their per-student copies
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2025-10-13 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, Sequence[str], None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('enrollments',
+    sa.Column('course_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('course_id', 'user_id')
+    )
+    op.create_index('ix_enrollments_user_id', 'enrollments', ['user_id'], unique=False)
+
+    # the enum types already exist for event_sync_jobs (0002)
+    op.create_table('course_event_deliveries',
+    sa.Column('event_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('operation', postgresql.ENUM('insert', 'update', 'delete', name='syncoperation', create_type=False), nullable=False),
+    sa.Column('google_event_id', sa.String(), nullable=True),
+    sa.Column('status', postgresql.ENUM('pending', 'in-progress', 'done', 'failed', name='syncjobstatus', create_type=False), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('revision', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('event_id', 'user_id')
+    )
+    op.create_index('ix_course_event_deliveries_status_next_attempt', 'course_event_deliveries', ['status', 'next_attempt_at'], unique=False)
+    op.create_index('ix_course_event_deliveries_user_id', 'course_event_deliveries', ['user_id'], unique=False)
+
+    # constant default: no table rewrite on Postgres
+    op.add_column('events', sa.Column('is_shared', sa.Boolean(), server_default=sa.false(), nullable=False))
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_events_shared_course_id_starts_at',
+            'events',
+            ['course_id', 'starts_at'],
+            unique=False,
+            if_not_exists=True,
+            postgresql_where=sa.text('is_shared'),
+            sqlite_where=sa.text('is_shared'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_events_shared_course_id_starts_at',
+            table_name='events',
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+    with op.batch_alter_table('events') as batch:
+        batch.drop_column('is_shared')
+    op.drop_index('ix_course_event_deliveries_user_id', table_name='course_event_deliveries')
+    op.drop_index('ix_course_event_deliveries_status_next_attempt', table_name='course_event_deliveries')
+    op.drop_table('course_event_deliveries')
+    op.drop_index('ix_enrollments_user_id', table_name='enrollments')
+    op.drop_table('enrollments')
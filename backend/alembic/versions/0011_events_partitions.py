@@ -0,0 +1,233 @@
+"""events.active_until; on Postgres, events range-partitioned by semester on it
+
+active_until is the last instant an event can appear on a calendar (see
+models.event_active_until). On Postgres, `events` is rebuilt as a table
+partitioned on it: one partition per semester from the oldest data up to
+PARTITIONS_AHEAD semesters from now, plus events_default. Later semesters
+are created (and old ones archived) by services/partitions.py.
+
+The rebuild copies every row once while holding an EXCLUSIVE lock on the
+old table, so reads keep working and writes wait until it commits. Run it
+in a quiet window. A partitioned table's primary key must contain the
+partition key, so it becomes (id, active_until). events.id alone is no
+longer unique, so the foreign keys from event_sync_jobs.event_id and
+reminders.event_id are dropped; both already treat a missing event as
+deleted. Other databases just get the column.
+
+Downgrading copies the attached partitions back into a plain table. Rows in
+partitions that were already archived are not brought back.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2025-10-20 00:00:00.000000
+
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, Sequence[str], None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITIONS_AHEAD = 3
+# same naming and trimester boundaries as services/partitions.py
+TERMS = ('spring', 'summer', 'fall')
+TERM_MONTHS = 4
+
+COLUMNS = (
+    'id, user_id, course_id, is_shared, title, description, type, event_date, task_time, '
+    'duration_minutes, starts_at, ends_at, recurrence_rule, exdates, recurrence_until, '
+    'google_event_id, is_synced, created_at, updated_at'
+)
+# same rule as models.event_active_until; endless series get datetime.max
+ACTIVE_UNTIL_SQL = (
+    "CASE WHEN recurrence_rule IS NULL THEN ends_at "
+    "WHEN recurrence_until IS NULL THEN TIMESTAMPTZ '9999-12-31 23:59:59.999999+00' "
+    "ELSE recurrence_until + INTERVAL '1 day' + (ends_at - starts_at) END"
+)
+ACTIVE_FOREVER = datetime.max.replace(tzinfo=timezone.utc)
+
+
+def _semester_start(year: int, term: int) -> datetime:
+    year, term = divmod(year * len(TERMS) + term, len(TERMS))
+    return datetime(year, term * TERM_MONTHS + 1, 1, tzinfo=timezone.utc)
+
+
+def _create_events(partitioned: bool) -> None:
+    op.create_table('events',
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('course_id', postgresql.UUID(as_uuid=True), nullable=True),
+    sa.Column('is_shared', sa.Boolean(), server_default=sa.false(), nullable=False),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('type', postgresql.ENUM('assignment', 'exam', 'final', 'project', 'office-hours', 'reminder', name='eventtype', create_type=False), nullable=False),
+    sa.Column('event_date', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('task_time', sa.Time(), nullable=False),
+    sa.Column('duration_minutes', sa.Integer(), nullable=True),
+    sa.Column('starts_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('ends_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('recurrence_rule', sa.Text(), nullable=True),
+    sa.Column('exdates', sa.JSON(), nullable=True),
+    sa.Column('recurrence_until', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('google_event_id', sa.String(), nullable=True),
+    sa.Column('is_synced', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    *([sa.Column('active_until', sa.DateTime(timezone=True), nullable=False)] if partitioned else []),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], name='events_user_id_fkey'),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], name='events_course_id_fkey', ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint(*(['id', 'active_until'] if partitioned else ['id']), name='events_pkey'),
+    **({'postgresql_partition_by': 'RANGE (active_until)'} if partitioned else {})
+    )
+
+
+def _create_indexes() -> None:
+    # on a partitioned table each index cascades to every partition
+    op.create_index('ix_events_user_id_event_date', 'events', ['user_id', 'event_date'], unique=False)
+    op.create_index('ix_events_user_id_starts_at', 'events', ['user_id', 'starts_at'], unique=False)
+    op.create_index(
+        'ix_events_user_id_period',
+        'events',
+        ['user_id', sa.text('tstzrange(starts_at, ends_at)')],
+        unique=False,
+        postgresql_using='gist',
+    )
+    op.create_index(
+        'ix_events_user_id_recurring',
+        'events',
+        ['user_id', 'recurrence_until'],
+        unique=False,
+        postgresql_where=sa.text('recurrence_rule IS NOT NULL'),
+    )
+    op.create_index(
+        'ix_events_course_id_starts_at',
+        'events',
+        ['course_id', 'starts_at'],
+        unique=False,
+        postgresql_where=sa.text('course_id IS NOT NULL'),
+    )
+    op.create_index(
+        'ix_events_shared_course_id_starts_at',
+        'events',
+        ['course_id', 'starts_at'],
+        unique=False,
+        postgresql_where=sa.text('is_shared'),
+    )
+    op.create_index(
+        'ix_events_exam_starts_at',
+        'events',
+        ['starts_at'],
+        unique=False,
+        postgresql_where=sa.text("type IN ('exam', 'final')"),
+    )
+
+
+def _replace_events(partitioned: bool) -> None:
+    old = 'events_unpartitioned' if partitioned else 'events_partitioned'
+    op.execute('LOCK TABLE events IN EXCLUSIVE MODE')
+    op.rename_table('events', old)
+    op.execute(f'ALTER INDEX events_pkey RENAME TO {old}_pkey')
+    _create_events(partitioned)
+
+
+def _upgrade_postgres(bind) -> None:
+    op.drop_constraint('event_sync_jobs_event_id_fkey', 'event_sync_jobs', type_='foreignkey')
+    op.drop_constraint('reminders_event_id_fkey', 'reminders', type_='foreignkey')
+    _replace_events(partitioned=True)
+
+    oldest = bind.execute(sa.text(f'SELECT min({ACTIVE_UNTIL_SQL}) FROM events_unpartitioned')).scalar()
+    now = datetime.now(timezone.utc)
+    first = oldest.astimezone(timezone.utc) if oldest is not None and oldest < now else now
+    index = first.year * len(TERMS) + (first.month - 1) // TERM_MONTHS
+    last = now.year * len(TERMS) + (now.month - 1) // TERM_MONTHS + PARTITIONS_AHEAD
+    for semester in range(index, last + 1):
+        year, term = divmod(semester, len(TERMS))
+        op.execute(
+            f"CREATE TABLE events_{year}_{TERMS[term]} PARTITION OF events "
+            f"FOR VALUES FROM ('{_semester_start(year, term).isoformat()}') "
+            f"TO ('{_semester_start(year, term + 1).isoformat()}')"
+        )
+    op.execute('CREATE TABLE events_default PARTITION OF events DEFAULT')
+
+    op.execute(
+        f'INSERT INTO events ({COLUMNS}, active_until) '
+        f'SELECT {COLUMNS}, {ACTIVE_UNTIL_SQL} FROM events_unpartitioned'
+    )
+    op.drop_table('events_unpartitioned')
+    # building the indexes after the copy is much cheaper than maintaining them during it
+    _create_indexes()
+
+
+def _backfill_generic(bind) -> None:
+    events = sa.table(
+        'events',
+        sa.column('id'), sa.column('starts_at', sa.DateTime(timezone=True)),
+        sa.column('ends_at', sa.DateTime(timezone=True)), sa.column('recurrence_rule', sa.Text()),
+        sa.column('recurrence_until', sa.DateTime(timezone=True)),
+        sa.column('active_until', sa.DateTime(timezone=True)),
+    )
+    rows = bind.execute(
+        sa.select(events.c.id, events.c.starts_at, events.c.ends_at, events.c.recurrence_rule,
+                  events.c.recurrence_until)
+    ).all()
+    for row in rows:
+        if row.recurrence_rule is None:
+            active_until = row.ends_at
+        elif row.recurrence_until is None:
+            active_until = ACTIVE_FOREVER
+        else:
+            active_until = row.recurrence_until + timedelta(days=1) + (row.ends_at - row.starts_at)
+        bind.execute(events.update().where(events.c.id == row.id).values(active_until=active_until))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        _upgrade_postgres(bind)
+        return
+
+    op.add_column('events', sa.Column('active_until', sa.DateTime(timezone=True), nullable=True))
+    _backfill_generic(bind)
+    with op.batch_alter_table('events') as batch:
+        batch.alter_column('active_until', nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        with op.batch_alter_table('events') as batch:
+            batch.drop_column('active_until')
+        return
+
+    _replace_events(partitioned=False)
+    op.execute(f'INSERT INTO events ({COLUMNS}) SELECT {COLUMNS} FROM events_partitioned')
+    # drops every attached partition with it
+    op.drop_table('events_partitioned')
+    _create_indexes()
+
+    # the foreign keys' old ON DELETE behaviour, applied to what was deleted meanwhile
+    op.execute(
+        'UPDATE event_sync_jobs SET event_id = NULL WHERE event_id IS NOT NULL '
+        'AND NOT EXISTS (SELECT 1 FROM events WHERE events.id = event_sync_jobs.event_id)'
+    )
+    op.execute(
+        'DELETE FROM reminders WHERE event_id IS NOT NULL '
+        'AND NOT EXISTS (SELECT 1 FROM events WHERE events.id = reminders.event_id)'
+    )
+    op.create_foreign_key(
+        'event_sync_jobs_event_id_fkey', 'event_sync_jobs', 'events', ['event_id'], ['id'],
+        ondelete='SET NULL',
+    )
+    op.create_foreign_key(
+        'reminders_event_id_fkey', 'reminders', 'events', ['event_id'], ['id'], ondelete='CASCADE',
+    )
@@ -0,0 +1,67 @@
+"""created_at / updated_at / token_expiry as timestamp with time zone
+
+The models write aware UTC datetimes into these columns, which were plain
+`timestamp`. asyncpg refuses aware values for those, so they become
+`timestamptz` like every other instant in the schema. With the session time
+zone set to UTC, Postgres (12+) changes the type without rewriting the
+tables. Other databases store both the same way and are left alone.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2025-10-27 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, Sequence[str], None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, column, nullable); ALTER on the partitioned events reaches every attached partition
+COLUMNS = (
+    ('users', 'created_at', False),
+    ('users', 'updated_at', False),
+    ('users', 'token_expiry', True),
+    ('events', 'created_at', False),
+    ('events', 'updated_at', False),
+    ('event_sync_jobs', 'created_at', False),
+    ('event_sync_jobs', 'updated_at', False),
+    ('google_events', 'updated_at', False),
+    ('google_watch_channels', 'created_at', False),
+    ('reminders', 'created_at', False),
+    ('reminders', 'updated_at', False),
+    ('courses', 'created_at', False),
+    ('courses', 'updated_at', False),
+    ('office_hours', 'created_at', False),
+    ('enrollments', 'created_at', False),
+)
+
+
+def _retype(timezone: bool) -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # existing values are UTC; this makes the cast read them as such
+    op.execute("SET LOCAL TIME ZONE 'UTC'")
+    for table, column, nullable in COLUMNS:
+        op.alter_column(
+            table, column,
+            type_=sa.DateTime(timezone=timezone),
+            existing_type=sa.DateTime(timezone=not timezone),
+            existing_nullable=nullable,
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _retype(timezone=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _retype(timezone=False)
@@ -0,0 +1,331 @@
+"""
+A local stand-in for the Google endpoints the backend calls.
+
+Covers OAuth (token exchange and refresh), userinfo, calendarList and the
+Calendar v3 events API, including pagination, syncToken deltas,
+events.watch, channels.stop and the multipart batch endpoint. Every
+response is delayed by a configurable latency, and a configurable share of
+requests fails with 503 or 429, so the backend's retry and backoff paths
+are part of what gets measured.
+
+Identities are derived from the strings themselves, so no setup is needed:
+an authorization code is the user's email, and tokens are
+"fake-at:<email>" / "fake-rt:<email>". Run from the backend directory:
+
+    python -m bench.fake_google --port 8900 --latency-ms 60 --error-rate 0.01
+
+and point the backend at it with the env vars from `backend_env()`.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+ACCESS_PREFIX = "fake-at:"
+REFRESH_PREFIX = "fake-rt:"
+PAGE_SIZE = 250
+
+
+@dataclass
+class FaultConfig:
+    latency_ms: float = 50.0
+    jitter_ms: float = 20.0
+    # share of requests answered with 503 / 429 (after the latency)
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    # events already in each calendar on first read
+    events_per_calendar: int = 40
+    seed: int = 299
+
+
+@dataclass
+class _Calendar:
+    events: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # change log for syncToken deltas: (sequence, event id)
+    changes: List[Tuple[int, str]] = field(default_factory=list)
+    sequence: int = 0
+
+    def touch(self, event_id: str) -> None:
+        self.sequence += 1
+        self.changes.append((self.sequence, event_id))
+
+
+def backend_env(base_url: str) -> Dict[str, str]:
+    """Environment that points every Google URL of the backend at `base_url`."""
+    base_url = base_url.rstrip("/")
+    return {
+        "GOOGLE_AUTH_ENDPOINT": f"{base_url}/o/oauth2/auth",
+        "GOOGLE_TOKEN_ENDPOINT": f"{base_url}/token",
+        "GOOGLE_USERINFO_ENDPOINT": f"{base_url}/oauth2/v2/userinfo",
+        "GOOGLE_CALENDAR_LIST_ENDPOINT": f"{base_url}/calendar/v3/users/me/calendarList",
+        "GOOGLE_CALENDAR_API_BASE": f"{base_url}/calendar/v3",
+        "GOOGLE_CALENDAR_BATCH_ENDPOINT": f"{base_url}/batch/calendar/v3",
+    }
+
+
+def _error(status_code: int, reason: str) -> JSONResponse:
+    body = {"error": {"code": status_code, "message": reason, "errors": [{"reason": reason}]}}
+    headers = {"Retry-After": "1"} if status_code == 429 else None
+    return JSONResponse(body, status_code=status_code, headers=headers)
+
+
+def _email(request: Request) -> Optional[str]:
+    auth = request.headers.get("Authorization", "")
+    token = auth.removeprefix("Bearer ").strip()
+    return token[len(ACCESS_PREFIX):] if token.startswith(ACCESS_PREFIX) else None
+
+
+def _stamp(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def create_app(config: Optional[FaultConfig] = None) -> FastAPI:
+    config = config or FaultConfig()
+    app = FastAPI(title="fake google")
+    app.state.config = config
+    app.state.requests = 0
+    calendars: Dict[str, _Calendar] = {}
+    rng = random.Random(config.seed)
+
+    def calendar_for(email: str) -> _Calendar:
+        calendar = calendars.get(email)
+        if calendar is None:
+            calendar = calendars[email] = _Calendar()
+            # the same email always gets the same pre-existing events
+            own = random.Random(f"{config.seed}:{email}")
+            today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+            for n in range(config.events_per_calendar):
+                start = today + timedelta(days=own.randint(-30, 60), hours=own.randint(8, 19))
+                event_id = hashlib.blake2b(f"{email}:{n}".encode(), digest_size=10).hexdigest()
+                calendar.events[event_id] = {
+                    "id": event_id,
+                    "status": "confirmed",
+                    "summary": own.choice(["Lab", "Meeting", "Club", "Seminar", "Study group"]),
+                    "start": {"dateTime": _stamp(start)},
+                    "end": {"dateTime": _stamp(start + timedelta(minutes=own.choice([30, 60, 90])))},
+                    "htmlLink": f"https://calendar.google.com/event?eid={event_id}",
+                }
+                calendar.touch(event_id)
+        return calendar
+
+    @app.middleware("http")
+    async def faults(request: Request, call_next):
+        app.state.requests += 1
+        delay = max(0.0, rng.gauss(config.latency_ms, config.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        roll = rng.random()
+        if roll < config.rate_limit_rate:
+            return _error(429, "rateLimitExceeded")
+        if roll < config.rate_limit_rate + config.error_rate:
+            return _error(503, "backendError")
+        return await call_next(request)
+
+    # OAuth
+
+    @app.get("/o/oauth2/auth")
+    async def authorize(request: Request):
+        return JSONResponse({"note": "pass the user's email as ?code= to /auth/callback"})
+
+    @app.post("/token")
+    async def token(request: Request):
+        form = await request.form()
+        if form.get("grant_type") == "refresh_token":
+            refresh = str(form.get("refresh_token", ""))
+            if not refresh.startswith(REFRESH_PREFIX):
+                return JSONResponse({"error": "invalid_grant"}, status_code=400)
+            email = refresh[len(REFRESH_PREFIX):]
+            return {"access_token": ACCESS_PREFIX + email, "expires_in": 3599, "token_type": "Bearer"}
+        email = str(form.get("code", ""))
+        if "@" not in email:
+            return JSONResponse({"error": "invalid_grant"}, status_code=400)
+        return {
+            "access_token": ACCESS_PREFIX + email,
+            "refresh_token": REFRESH_PREFIX + email,
+            "expires_in": 3599,
+            "token_type": "Bearer",
+        }
+
+    @app.get("/oauth2/v2/userinfo")
+    async def userinfo(request: Request):
+        email = _email(request)
+        if not email:
+            return _error(401, "authError")
+        return {
+            "id": str(int(hashlib.sha1(email.encode()).hexdigest()[:15], 16)),
+            "email": email,
+            "verified_email": True,
+            "name": email.split("@")[0].replace(".", " ").title(),
+        }
+
+    @app.get("/calendar/v3/users/me/calendarList")
+    async def calendar_list(request: Request):
+        email = _email(request)
+        if not email:
+            return _error(401, "authError")
+        return {"items": [{"id": email, "primary": True, "summary": email}]}
+
+    # Calendar events
+
+    def list_events(email: str, params: Dict[str, str]) -> Response:
+        calendar = calendar_for(email)
+        offset = int(params.get("pageToken") or 0)
+        if params.get("syncToken"):
+            since = int(params["syncToken"])
+            if since > calendar.sequence:
+                return _error(410, "fullSyncRequired")
+            changed = dict.fromkeys(eid for seq, eid in calendar.changes if seq > since)
+            items = [calendar.events[eid] for eid in changed]
+        else:
+            items = [e for e in calendar.events.values() if e["status"] != "cancelled"]
+            items.sort(key=lambda e: e["start"].get("dateTime", ""))
+        page_size = int(params.get("maxResults") or PAGE_SIZE)
+        page = items[offset:offset + page_size]
+        body: Dict[str, Any] = {"kind": "calendar#events", "items": page}
+        if offset + page_size < len(items):
+            body["nextPageToken"] = str(offset + page_size)
+        else:
+            body["nextSyncToken"] = str(calendar.sequence)
+        return JSONResponse(body)
+
+    def write_event(email: str, method: str, event_id: Optional[str],
+                    body: Optional[Dict[str, Any]]) -> Tuple[int, Any]:
+        calendar = calendar_for(email)
+        if method == "POST":
+            # like Calendar: a client-supplied id is kept, and reusing one is a 409
+            event_id = (body or {}).get("id") or uuid.uuid4().hex
+            if event_id in calendar.events:
+                return 409, {"error": {"code": 409, "message": "The requested identifier already exists."}}
+            calendar.events[event_id] = {**(body or {}), "id": event_id, "status": "confirmed"}
+            calendar.touch(event_id)
+            return 200, calendar.events[event_id]
+        existing = calendar.events.get(event_id or "")
+        if existing is None or existing["status"] == "cancelled":
+            return 404, {"error": {"code": 404, "message": "Not Found"}}
+        if method == "DELETE":
+            existing["status"] = "cancelled"
+            calendar.touch(event_id)
+            return 204, None
+        existing.update(body or {})
+        calendar.touch(event_id)
+        return 200, existing
+
+    @app.get("/calendar/v3/calendars/{calendar_id}/events")
+    async def events_list(calendar_id: str, request: Request):
+        email = _email(request)
+        if not email:
+            return _error(401, "authError")
+        return list_events(email, dict(request.query_params))
+
+    @app.post("/calendar/v3/calendars/{calendar_id}/events/watch")
+    async def events_watch(calendar_id: str, request: Request):
+        body = await request.json()
+        expiration = datetime.now(timezone.utc) + timedelta(
+            seconds=int(body.get("params", {}).get("ttl", 604800))
+        )
+        return {
+            "kind": "api#channel",
+            "id": body.get("id"),
+            "resourceId": uuid.uuid4().hex,
+            "expiration": str(int(expiration.timestamp() * 1000)),
+        }
+
+    @app.post("/calendar/v3/channels/stop", status_code=204)
+    async def channels_stop():
+        return Response(status_code=204)
+
+    @app.api_route("/calendar/v3/calendars/{calendar_id}/events", methods=["POST"])
+    @app.api_route("/calendar/v3/calendars/{calendar_id}/events/{event_id}",
+                   methods=["PATCH", "PUT", "DELETE"])
+    async def events_write(calendar_id: str, request: Request, event_id: Optional[str] = None):
+        email = _email(request)
+        if not email:
+            return _error(401, "authError")
+        body = await request.json() if request.method != "DELETE" else None
+        status_code, payload = write_event(email, request.method, event_id, body)
+        if payload is None:
+            return Response(status_code=status_code)
+        return JSONResponse(payload, status_code=status_code)
+
+    @app.post("/batch/calendar/v3")
+    async def batch(request: Request):
+        email = _email(request)
+        if not email:
+            return _error(401, "authError")
+        content_type = request.headers.get("Content-Type", "")
+        boundary = content_type.partition("boundary=")[2].strip('"')
+        text = (await request.body()).decode().replace("\r\n", "\n")
+        out_boundary = f"batch_{uuid.uuid4().hex}"
+        parts = []
+        for part in text.split(f"--{boundary}")[1:]:
+            if part.startswith("--"):
+                break
+            outer, _, http_message = part.strip("\n").partition("\n\n")
+            content_id = ""
+            for line in outer.split("\n"):
+                name, _, value = line.partition(":")
+                if name.strip().lower() == "content-id":
+                    content_id = value.strip().strip("<>")
+            request_line, _, rest = http_message.partition("\n")
+            method, path, _ = request_line.split(" ", 2)
+            _, _, raw_body = rest.partition("\n\n")
+            body = json.loads(raw_body) if raw_body.strip() else None
+            event_id = path.rstrip("/").split("/events/")[1] if "/events/" in path else None
+            status_code, payload = write_event(email, method, event_id, body)
+            parts.append("\r\n".join([
+                f"--{out_boundary}",
+                "Content-Type: application/http",
+                f"Content-ID: <response-{content_id}>",
+                "",
+                f"HTTP/1.1 {status_code} {'OK' if status_code < 400 else 'Error'}",
+                "Content-Type: application/json",
+                "",
+                json.dumps(payload) if payload is not None else "",
+            ]))
+        parts.append(f"--{out_boundary}--")
+        return Response(
+            "\r\n".join(parts) + "\r\n",
+            media_type=f"multipart/mixed; boundary={out_boundary}",
+        )
+
+    @app.get("/_stats")
+    async def stats():
+        return {"requests": app.state.requests, "calendars": len(calendars)}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=FaultConfig.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=FaultConfig.jitter_ms)
+    parser.add_argument("--error-rate", type=float, default=FaultConfig.error_rate)
+    parser.add_argument("--rate-limit-rate", type=float, default=FaultConfig.rate_limit_rate)
+    parser.add_argument("--events-per-calendar", type=int, default=FaultConfig.events_per_calendar)
+    parser.add_argument("--seed", type=int, default=FaultConfig.seed)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = FaultConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        events_per_calendar=args.events_per_calendar,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Seed a database with deterministic benchmark users and events.
+
+Users are bench-00000@northsouth.edu, bench-00001@... with tokens the fake
+Google server accepts, and each gets `events_per_user` events spread over
+a semester around today, about one in ten of them a weekly series. The
+same --seed always produces the same rows, so runs on different commits
+measure the same data. Run from the backend directory:
+
+    python -m bench.fixtures --database-url sqlite:////tmp/bench.db --users 500
+"""
+import argparse
+import os
+import random
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List
+
+from bench.fake_google import ACCESS_PREFIX, REFRESH_PREFIX
+
+EMAIL_FORMAT = "bench-{:05d}@northsouth.edu"
+CHUNK_ROWS = 2000
+SEMESTER_DAYS = 120
+
+TITLES = {
+    "assignment": ["Problem set", "Lab report", "Reading response", "Homework"],
+    "exam": ["Quiz", "Midterm"],
+    "final": ["Final exam"],
+    "project": ["Project milestone", "Project demo"],
+    "office-hours": ["Office hours"],
+    "reminder": ["Advising", "Club meeting", "Study group"],
+}
+TYPE_WEIGHTS = {
+    "assignment": 40, "exam": 12, "final": 3, "project": 10, "office-hours": 10, "reminder": 25,
+}
+COURSES = ["CSE115", "CSE173", "CSE215", "CSE225", "CSE299", "MAT120", "PHY107", "ENG103"]
+
+
+def bench_emails(users: int) -> List[str]:
+    return [EMAIL_FORMAT.format(i) for i in range(users)]
+
+
+def _events_for(user_id: uuid.UUID, count: int, rng: random.Random, today: date) -> List[Dict]:
+    from models.models import EventType, event_active_until, event_bounds
+    from services.recurrence import recurrence_until
+
+    first_day = today - timedelta(days=SEMESTER_DAYS // 2)
+    types = list(TYPE_WEIGHTS)
+    weights = list(TYPE_WEIGHTS.values())
+    rows = []
+    for _ in range(count):
+        kind = rng.choices(types, weights)[0]
+        event_date = datetime.combine(
+            first_day + timedelta(days=rng.randrange(SEMESTER_DAYS)), time(), tzinfo=timezone.utc
+        )
+        task_time = time(rng.randint(8, 20), rng.choice([0, 30]))
+        duration = rng.choice([30, 60, 90, 120, 180])
+        rule = None
+        if rng.random() < 0.1:
+            until = (event_date + timedelta(weeks=rng.randint(4, 14))).strftime("%Y%m%d")
+            days = rng.choice(["SU,TU", "MO,WE", "TH", "SA"])
+            rule = f"FREQ=WEEKLY;BYDAY={days};UNTIL={until}"
+        starts_at, ends_at = event_bounds(event_date, task_time, duration)
+        until = recurrence_until(rule, event_date)
+        now = datetime.now(timezone.utc)
+        rows.append({
+            "id": uuid.UUID(int=rng.getrandbits(128), version=4),
+            "user_id": user_id,
+            "course_id": None,
+            "is_shared": False,
+            "title": f"{rng.choice(COURSES)} {rng.choice(TITLES[kind])}",
+            "description": None,
+            "type": EventType(kind),
+            "event_date": event_date,
+            "task_time": task_time,
+            "duration_minutes": duration,
+            "starts_at": starts_at,
+            "ends_at": ends_at,
+            "recurrence_rule": rule,
+            "exdates": None,
+            "recurrence_until": until,
+            "active_until": event_active_until(starts_at, ends_at, rule, until),
+            "google_event_id": None,
+            "is_synced": False,
+            "created_at": now,
+            "updated_at": now,
+        })
+    return rows
+
+
+def seed(database_url: str, users: int, events_per_user: int, seed: int = 299) -> List[str]:
+    """Migrate `database_url` and add the bench users it is missing; returns all their emails."""
+    # database.py reads the URL at import time
+    os.environ["DATABASE_URL"] = database_url
+    from sqlmodel import Session, select
+
+    from database import create_db_engine, run_migrations
+    from models.models import Event, User, UserRole
+
+    run_migrations()
+    engine = create_db_engine()
+    emails = bench_emails(users)
+    with Session(engine) as db:
+        existing = set(db.exec(select(User.email).where(User.email.in_(emails))).all())
+    today = datetime.now(timezone.utc).date()
+    now = datetime.now(timezone.utc)
+
+    user_rows: List[Dict] = []
+    event_rows: List[Dict] = []
+    with engine.begin() as conn:
+        for index, email in enumerate(emails):
+            if email in existing:
+                continue
+            # one generator per user: adding users never changes earlier ones
+            rng = random.Random(f"{seed}:{index}")
+            user_id = uuid.UUID(int=rng.getrandbits(128), version=4)
+            user_rows.append({
+                "user_id": user_id,
+                "email": email,
+                "name": f"Bench User {index}",
+                "picture": None,
+                "role": UserRole.student,
+                "google_id": str(10**15 + index),
+                "calendar_id": email,
+                "google_access_token": ACCESS_PREFIX + email,
+                "google_refresh_token": REFRESH_PREFIX + email,
+                "token_expiry": now + timedelta(hours=1),
+                "created_at": now,
+                "updated_at": now,
+            })
+            event_rows.extend(_events_for(user_id, events_per_user, rng, today))
+            if len(event_rows) >= CHUNK_ROWS:
+                conn.execute(User.__table__.insert(), user_rows)
+                conn.execute(Event.__table__.insert(), event_rows)
+                user_rows, event_rows = [], []
+        if user_rows:
+            conn.execute(User.__table__.insert(), user_rows)
+        if event_rows:
+            conn.execute(Event.__table__.insert(), event_rows)
+    engine.dispose()
+    print(f"Seeded {users - len(existing)} users ({len(existing)} already present)")
+    return emails
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--events-per-user", type=int, default=150)
+    parser.add_argument("--seed", type=int, default=299)
+    args = parser.parse_args()
+    seed(args.database_url, args.users, args.events_per_user, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""
+Load-test the backend against seeded data and a local fake Google API.
+
+Seeds the database (bench/fixtures.py), starts bench/fake_google.py and the
+backend as uvicorn subprocesses, logs the simulated users in, and runs
+the chosen scenarios with a fixed number of concurrent clients. Each
+scenario first runs a warmup that is not measured, then reports requests,
+errors, throughput and p50/p95/p99 latency per endpoint. Results are
+written as JSON together with the git commit, so two runs can be compared:
+
+    python -m bench.run --users 200 --output before.json
+    python -m bench.run --users 200 --output after.json --compare before.json
+
+Scenarios: login_storm, month_view, bulk_create, create_event, google_events.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from bench.fake_google import backend_env
+
+RESULT_SCHEMA = 1
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SCENARIOS = ("login_storm", "month_view", "bulk_create", "create_event", "google_events")
+DEFAULT_SCENARIOS = ("login_storm", "month_view", "bulk_create")
+BULK_SIZE = 50
+
+
+@dataclass
+class Recorder:
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    def add(self, endpoint: str, seconds: float, ok: bool) -> None:
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+
+def _percentile(ordered: List[float], p: float) -> float:
+    # nearest rank, so small samples report a latency that actually happened
+    rank = max(1, round(p / 100 * len(ordered) + 0.5))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict[str, Dict[str, float]]:
+    endpoints = {}
+    for endpoint, samples in sorted(recorder.latencies.items()):
+        ordered = sorted(samples)
+        endpoints[endpoint] = {
+            "requests": len(ordered),
+            "errors": recorder.errors.get(endpoint, 0),
+            "rps": round(len(ordered) / elapsed, 2),
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+            "p50_ms": round(_percentile(ordered, 50) * 1000, 2),
+            "p95_ms": round(_percentile(ordered, 95) * 1000, 2),
+            "p99_ms": round(_percentile(ordered, 99) * 1000, 2),
+        }
+    return endpoints
+
+
+@dataclass
+class Client:
+    """One simulated user: their session cookie and per-URL ETags."""
+    email: str
+    http: httpx.AsyncClient
+    etags: Dict[str, str] = field(default_factory=dict)
+
+
+async def _timed(recorder: Recorder, endpoint: str, call: Awaitable[httpx.Response],
+                 expected: tuple) -> Optional[httpx.Response]:
+    start = time.perf_counter()
+    try:
+        response = await call
+    except httpx.HTTPError:
+        recorder.add(endpoint, time.perf_counter() - start, ok=False)
+        return None
+    recorder.add(endpoint, time.perf_counter() - start, ok=response.status_code in expected)
+    return response
+
+
+# Scenarios: one call is one simulated user action
+
+async def login_storm(client: Client, recorder: Recorder, rng: random.Random) -> None:
+    # the code is the email as far as the fake Google token endpoint is concerned
+    await _timed(
+        recorder, "GET /auth/callback",
+        client.http.get("/auth/callback", params={"code": client.email}), (302,),
+    )
+
+
+def _month(offset: int) -> Dict[str, str]:
+    today = date.today()
+    first = date(today.year, today.month, 1)
+    for _ in range(abs(offset)):
+        first = (first - timedelta(days=1)).replace(day=1) if offset < 0 else \
+            (first + timedelta(days=32)).replace(day=1)
+    start = datetime.combine(first - timedelta(days=7), datetime.min.time(), tzinfo=timezone.utc)
+    return {"start": start.isoformat(), "end": (start + timedelta(days=42)).isoformat()}
+
+
+async def month_view(client: Client, recorder: Recorder, rng: random.Random) -> None:
+    # a calendar tab polling the visible month, sometimes paging to the next/previous one
+    params = _month(rng.choice([0, 0, 0, -1, 1]))
+    key = params["start"]
+    headers = {"If-None-Match": client.etags[key]} if key in client.etags else {}
+    label = "GET /api/events (revalidate)" if headers else "GET /api/events"
+    response = await _timed(
+        recorder, label, client.http.get("/api/events", params=params, headers=headers), (200, 304),
+    )
+    if response is not None and response.headers.get("ETag"):
+        client.etags[key] = response.headers["ETag"]
+
+
+def _new_event(rng: random.Random, add_to_google: bool) -> Dict:
+    day = date.today() + timedelta(days=rng.randrange(1, 90))
+    return {
+        "title": f"Bench {rng.choice(['Quiz', 'Homework', 'Lab', 'Meeting'])}",
+        "type": rng.choice(["assignment", "exam", "reminder"]),
+        "event_date": f"{day.isoformat()}T00:00:00Z",
+        "task_time": f"{rng.randint(8, 20):02d}:00:00",
+        "duration_minutes": 60,
+        "add_to_google": add_to_google,
+    }
+
+
+async def bulk_create(client: Client, recorder: Recorder, rng: random.Random) -> None:
+    events = [_new_event(rng, add_to_google=False) for _ in range(BULK_SIZE)]
+    await _timed(
+        recorder, "POST /api/events/bulk",
+        client.http.post("/api/events/bulk", json={"events": events}), (201,),
+    )
+
+
+async def create_event(client: Client, recorder: Recorder, rng: random.Random) -> None:
+    # queues a Google push, so the sync worker and the fake Google are in the loop
+    await _timed(
+        recorder, "POST /api/events",
+        client.http.post("/api/events", json=_new_event(rng, add_to_google=True)), (200,),
+    )
+
+
+async def google_events(client: Client, recorder: Recorder, rng: random.Random) -> None:
+    await _timed(recorder, "GET /api/google/events", client.http.get("/api/google/events"), (200,))
+
+
+SCENARIO_CALLS: Dict[str, Callable[[Client, Recorder, random.Random], Awaitable[None]]] = {
+    "login_storm": login_storm,
+    "month_view": month_view,
+    "bulk_create": bulk_create,
+    "create_event": create_event,
+    "google_events": google_events,
+}
+
+
+async def _drive(action, clients: List[Client], concurrency: int, seconds: float,
+                 requests: Optional[int], seed: int) -> Dict:
+    recorder = Recorder()
+    deadline = time.perf_counter() + seconds
+    remaining = [requests] if requests else None
+
+    async def worker(worker_id: int) -> None:
+        rng = random.Random(f"{seed}:{worker_id}")
+        while time.perf_counter() < deadline:
+            if remaining is not None:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            await action(rng.choice(clients), recorder, rng)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"elapsed_s": round(elapsed, 3), "endpoints": summarize(recorder, elapsed)}
+
+
+async def _login_all(clients: List[Client], concurrency: int) -> None:
+    recorder = Recorder()
+    gate = asyncio.Semaphore(concurrency)
+
+    async def login(client: Client) -> None:
+        async with gate:
+            await login_storm(client, recorder, random.Random())
+
+    await asyncio.gather(*(login(c) for c in clients))
+    failed = sum(recorder.errors.values())
+    if failed:
+        print(f"warning: {failed} of {len(clients)} logins failed")
+
+
+async def run_scenarios(base_url: str, emails: List[str], args) -> Dict[str, Dict]:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    clients = [
+        Client(email, httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits))
+        for email in emails
+    ]
+    try:
+        # every later scenario needs a session cookie, so each user logs in once
+        await _login_all(clients, args.concurrency)
+
+        results = {}
+        for name in args.scenarios:
+            action = SCENARIO_CALLS[name]
+            if args.warmup:
+                await _drive(action, clients, args.concurrency, args.warmup, None, args.seed + 1)
+            results[name] = await _drive(
+                action, clients, args.concurrency, args.duration, args.requests, args.seed
+            )
+            print_table(name, results[name])
+        return results
+    finally:
+        await asyncio.gather(*(c.http.aclose() for c in clients))
+
+
+def print_table(name: str, result: Dict, baseline: Optional[Dict] = None) -> None:
+    print(f"\n{name} ({result['elapsed_s']}s)")
+    print(f"  {'endpoint':<32}{'reqs':>8}{'errs':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for endpoint, stats in result["endpoints"].items():
+        row = f"  {endpoint:<32}{stats['requests']:>8}{stats['errors']:>6}{stats['rps']:>9}"
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            row += f"{stats[key]:>9}"
+        print(row)
+        before = (baseline or {}).get("endpoints", {}).get(endpoint)
+        if before:
+            deltas = [_delta(stats["rps"], before["rps"])]
+            deltas += [_delta(stats[k], before[k]) for k in ("p50_ms", "p95_ms", "p99_ms")]
+            print(f"  {'  vs baseline':<46}" + "".join(f"{d:>9}" for d in deltas))
+
+
+def _delta(value: float, before: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(value - before) / before * 100:+.1f}%"
+
+
+def compare(results: Dict, baseline_path: str) -> None:
+    baseline = json.loads(Path(baseline_path).read_text())
+    if baseline.get("schema") != RESULT_SCHEMA:
+        sys.exit(f"{baseline_path} uses result schema {baseline.get('schema')}, not {RESULT_SCHEMA}")
+    print(f"\nCompared with {baseline_path} (commit {baseline['meta'].get('commit')}):")
+    for name, result in results["scenarios"].items():
+        print_table(name, result, baseline["scenarios"].get(name))
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"{' '.join(process.args)} exited with {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    sys.exit(f"{url} did not come up within {timeout}s")
+
+
+def start_servers(args):
+    google_port = args.google_port or _free_port()
+    backend_port = args.port or _free_port()
+    google_url = f"http://127.0.0.1:{google_port}"
+    google = subprocess.Popen(
+        [
+            sys.executable, "-m", "bench.fake_google", "--port", str(google_port),
+            "--latency-ms", str(args.google_latency_ms),
+            "--jitter-ms", str(args.google_jitter_ms),
+            "--error-rate", str(args.google_error_rate),
+            "--rate-limit-rate", str(args.google_rate_limit_rate),
+            "--seed", str(args.seed),
+        ],
+        cwd=BACKEND_DIR,
+    )
+    env = {
+        **os.environ,
+        **backend_env(google_url),
+        "DATABASE_URL": args.database_url,
+        "GOOGLE_CLIENT_ID": os.getenv("GOOGLE_CLIENT_ID", "bench-client"),
+        "GOOGLE_CLIENT_SECRET": os.getenv("GOOGLE_CLIENT_SECRET", "bench-secret"),
+        "JWT_SECRET_KEY": os.getenv("JWT_SECRET_KEY") or secrets.token_urlsafe(32),
+        "GOOGLE_REDIRECT_URI": f"http://127.0.0.1:{backend_port}/auth/callback",
+        "MAILER_BACKEND": "stub",
+    }
+    backend = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+            "--port", str(backend_port), "--workers", str(args.workers), "--log-level", "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    _wait_ready(f"{google_url}/_stats", google)
+    _wait_ready(f"http://127.0.0.1:{backend_port}/metrics/db-pool", backend)
+    return google, backend, f"http://127.0.0.1:{backend_port}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--database-url",
+        default=f"sqlite:///{Path(tempfile.gettempdir()) / 'nsu-scheduler-bench.db'}",
+        help="seeded in place; use a dedicated database",
+    )
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--events-per-user", type=int, default=150)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(DEFAULT_SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30, help="seconds per scenario")
+    parser.add_argument("--requests", type=int, help="stop each scenario after this many requests")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds per scenario")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--google-port", type=int)
+    parser.add_argument("--google-latency-ms", type=float, default=60)
+    parser.add_argument("--google-jitter-ms", type=float, default=20)
+    parser.add_argument("--google-error-rate", type=float, default=0.0)
+    parser.add_argument("--google-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=299)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="results JSON of an earlier run")
+    args = parser.parse_args()
+
+    from bench.fixtures import seed
+
+    started = time.perf_counter()
+    emails = seed(args.database_url, args.users, args.events_per_user, args.seed)
+    print(f"Fixtures ready in {time.perf_counter() - started:.1f}s")
+
+    google, backend, base_url = start_servers(args)
+    try:
+        scenarios = asyncio.run(run_scenarios(base_url, emails, args))
+    finally:
+        for process in (backend, google):
+            process.terminate()
+            process.wait(timeout=30)
+
+    results = {
+        "schema": RESULT_SCHEMA,
+        "meta": {
+            "commit": _git("rev-parse", "--short", "HEAD"),
+            "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": args.database_url.split(":", 1)[0],
+            # the URL itself may carry a password
+            "args": {
+                k: v for k, v in vars(args).items()
+                if k not in ("database_url", "output", "compare")
+            },
+        },
+        "scenarios": scenarios,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nWrote {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,11 +6,153 @@ load_dotenv()
 class Settings:
     PROJECT_NAME: str = "CSE299 Project"
     DATABASE_URL: str = os.getenv("DATABASE_URL")  # Neon DB
+    # one pool per process; size it so workers x (size + overflow) stays
+    # under the Neon connection limit
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 15000))
+    DB_ECHO: bool = os.getenv("DB_ECHO", "false").lower() == "true"
     BREVO_API_KEY: str = os.getenv("BREVO_API_KEY")
     Google_CLIENT_ID: str = os.getenv("GOOGLE_CLIENT_ID")
     Google_CLIENT_SECRET: str = os.getenv("GOOGLE_CLIENT_SECRET")
-    JWT_SECRET: str = os.getenv("JWT_SECRET_KEY", "supersecret")
+    # signs the session cookie; required, see main.py
+    JWT_SECRET: str = os.getenv("JWT_SECRET_KEY")
     JWT_ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+    # comma-separated; only these accounts can change anyone's role
+    ADMIN_EMAILS: set = {
+        email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()
+    }
 
-settings = Settings()
\ No newline at end of file
+    # Cookie -> user lookup cache ("memory" per worker, or "redis" shared)
+    USER_CACHE_BACKEND: str = os.getenv("USER_CACHE_BACKEND", "memory")
+    USER_CACHE_REDIS_URL: str = os.getenv("USER_CACHE_REDIS_URL", "redis://localhost:6379/0")
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", 300))
+
+    # GET /api/events: per-user versions behind the ETag ("memory" or "redis",
+    # which multi-worker deployments need) and serialized payloads per worker.
+    # In-memory versions and payloads expire after the TTL, which bounds how
+    # stale another worker's listing can be
+    EVENTS_CACHE_BACKEND: str = os.getenv("EVENTS_CACHE_BACKEND", USER_CACHE_BACKEND)
+    EVENTS_CACHE_MAX_BYTES: int = int(os.getenv("EVENTS_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+    EVENTS_CACHE_TTL_SECONDS: float = float(os.getenv("EVENTS_CACHE_TTL_SECONDS", 10))
+
+    # Google Calendar HTTP client (one pooled client per process)
+    GOOGLE_CALENDAR_API_BASE: str = os.getenv(
+        "GOOGLE_CALENDAR_API_BASE", "https://www.googleapis.com/calendar/v3"
+    )
+    GOOGLE_CALENDAR_BATCH_ENDPOINT: str = os.getenv(
+        "GOOGLE_CALENDAR_BATCH_ENDPOINT", "https://www.googleapis.com/batch/calendar/v3"
+    )
+    GOOGLE_TOKEN_ENDPOINT: str = os.getenv(
+        "GOOGLE_TOKEN_ENDPOINT", "https://oauth2.googleapis.com/token"
+    )
+    # login flow; all Google URLs can point at bench/fake_google.py
+    GOOGLE_AUTH_ENDPOINT: str = os.getenv(
+        "GOOGLE_AUTH_ENDPOINT", "https://accounts.google.com/o/oauth2/auth"
+    )
+    GOOGLE_USERINFO_ENDPOINT: str = os.getenv(
+        "GOOGLE_USERINFO_ENDPOINT", "https://www.googleapis.com/oauth2/v2/userinfo"
+    )
+    GOOGLE_CALENDAR_LIST_ENDPOINT: str = os.getenv(
+        "GOOGLE_CALENDAR_LIST_ENDPOINT", "https://www.googleapis.com/calendar/v3/users/me/calendarList"
+    )
+    GOOGLE_HTTP_TIMEOUT: float = float(os.getenv("GOOGLE_HTTP_TIMEOUT", 10))
+    GOOGLE_HTTP_MAX_RETRIES: int = int(os.getenv("GOOGLE_HTTP_MAX_RETRIES", 3))
+    GOOGLE_HTTP_MAX_CONNECTIONS: int = int(os.getenv("GOOGLE_HTTP_MAX_CONNECTIONS", 100))
+    GOOGLE_HTTP_MAX_KEEPALIVE: int = int(os.getenv("GOOGLE_HTTP_MAX_KEEPALIVE", 20))
+
+    # Google API quota (services/google_quota.py), in calls/second: a project-wide
+    # bucket plus one per user (Calendar allows ~10/s per user by default);
+    # rates halve on a rate-limit answer and creep back up on success
+    GOOGLE_QUOTA_PROJECT_RATE: float = float(os.getenv("GOOGLE_QUOTA_PROJECT_RATE", 100))
+    GOOGLE_QUOTA_USER_RATE: float = float(os.getenv("GOOGLE_QUOTA_USER_RATE", 8))
+    GOOGLE_QUOTA_MAX_USERS: int = int(os.getenv("GOOGLE_QUOTA_MAX_USERS", 10000))
+
+    # Google OAuth access tokens: cached per process and refreshed ahead of expiry
+    # for users seen within GOOGLE_TOKEN_ACTIVE_SECONDS
+    GOOGLE_TOKEN_EXPIRY_MARGIN_SECONDS: int = int(os.getenv("GOOGLE_TOKEN_EXPIRY_MARGIN_SECONDS", 60))
+    GOOGLE_TOKEN_REFRESH_AHEAD_SECONDS: int = int(os.getenv("GOOGLE_TOKEN_REFRESH_AHEAD_SECONDS", 300))
+    GOOGLE_TOKEN_REFRESH_INTERVAL_SECONDS: int = int(
+        os.getenv("GOOGLE_TOKEN_REFRESH_INTERVAL_SECONDS", 60)
+    )
+    GOOGLE_TOKEN_ACTIVE_SECONDS: int = int(os.getenv("GOOGLE_TOKEN_ACTIVE_SECONDS", 1800))
+
+    # Background Google Calendar sync (event_sync_jobs outbox)
+    SYNC_WORKER_ENABLED: bool = os.getenv("SYNC_WORKER_ENABLED", "true").lower() == "true"
+    SYNC_WORKER_CONCURRENCY: int = int(os.getenv("SYNC_WORKER_CONCURRENCY", 8))
+    SYNC_WORKER_BATCH_SIZE: int = int(os.getenv("SYNC_WORKER_BATCH_SIZE", 50))
+    SYNC_WORKER_POLL_SECONDS: float = float(os.getenv("SYNC_WORKER_POLL_SECONDS", 5))
+    SYNC_WORKER_MAX_ATTEMPTS: int = int(os.getenv("SYNC_WORKER_MAX_ATTEMPTS", 8))
+
+    # Local mirror of each user's Google calendar (google_events table)
+    GOOGLE_MIRROR_PAST_DAYS: int = int(os.getenv("GOOGLE_MIRROR_PAST_DAYS", 365))
+    GOOGLE_MIRROR_STALE_SECONDS: int = int(os.getenv("GOOGLE_MIRROR_STALE_SECONDS", 60))
+    # with a live push channel the mirror is only re-read after this long (safety net)
+    GOOGLE_MIRROR_WATCHED_MAX_AGE_SECONDS: int = int(
+        os.getenv("GOOGLE_MIRROR_WATCHED_MAX_AGE_SECONDS", 3600)
+    )
+
+    # Calendar push notifications (events.watch); disabled unless a public
+    # HTTPS address for /api/google/notifications is configured
+    GOOGLE_WEBHOOK_URL: str = os.getenv("GOOGLE_WEBHOOK_URL")
+    GOOGLE_WATCH_TTL_SECONDS: int = int(os.getenv("GOOGLE_WATCH_TTL_SECONDS", 7 * 24 * 3600))
+    GOOGLE_WATCH_RENEW_BEFORE_SECONDS: int = int(
+        os.getenv("GOOGLE_WATCH_RENEW_BEFORE_SECONDS", 24 * 3600)
+    )
+    GOOGLE_WATCH_RENEW_INTERVAL_SECONDS: int = int(
+        os.getenv("GOOGLE_WATCH_RENEW_INTERVAL_SECONDS", 15 * 60)
+    )
+
+    # Course directory: how often every course's deadline summary is rebuilt
+    COURSE_SUMMARY_REFRESH_SECONDS: int = int(os.getenv("COURSE_SUMMARY_REFRESH_SECONDS", 3600))
+
+    # Shared course events -> enrolled students' Google calendars
+    # (course_event_deliveries); the rate is across all students, in calls/second
+    COURSE_FANOUT_ENABLED: bool = os.getenv("COURSE_FANOUT_ENABLED", "true").lower() == "true"
+    COURSE_FANOUT_CONCURRENCY: int = int(os.getenv("COURSE_FANOUT_CONCURRENCY", 16))
+    COURSE_FANOUT_RATE: float = float(os.getenv("COURSE_FANOUT_RATE", 50))
+    COURSE_FANOUT_BATCH_SIZE: int = int(os.getenv("COURSE_FANOUT_BATCH_SIZE", 500))
+    COURSE_FANOUT_POLL_SECONDS: float = float(os.getenv("COURSE_FANOUT_POLL_SECONDS", 5))
+    COURSE_FANOUT_MAX_ATTEMPTS: int = int(os.getenv("COURSE_FANOUT_MAX_ATTEMPTS", 8))
+
+    # events partitions on Postgres (services/partitions.py): one per semester,
+    # created EVENT_PARTITIONS_AHEAD semesters ahead; semesters over for
+    # EVENT_ARCHIVE_AFTER_SEMESTERS are detached into EVENT_ARCHIVE_SCHEMA
+    # (0 keeps every semester attached)
+    EVENT_PARTITIONS_ENABLED: bool = os.getenv("EVENT_PARTITIONS_ENABLED", "true").lower() == "true"
+    EVENT_PARTITIONS_AHEAD: int = int(os.getenv("EVENT_PARTITIONS_AHEAD", 3))
+    EVENT_ARCHIVE_AFTER_SEMESTERS: int = int(os.getenv("EVENT_ARCHIVE_AFTER_SEMESTERS", 6))
+    EVENT_ARCHIVE_SCHEMA: str = os.getenv("EVENT_ARCHIVE_SCHEMA", "events_archive")
+    EVENT_ARCHIVE_TABLESPACE: str = os.getenv("EVENT_ARCHIVE_TABLESPACE", "")
+    EVENT_PARTITION_CHECK_SECONDS: int = int(os.getenv("EVENT_PARTITION_CHECK_SECONDS", 6 * 3600))
+
+    # Prometheus /metrics: per-route latency plus DB / Google / token refresh time
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+    # Reminder emails: daily digest + early exam alerts (services/reminders.py).
+    # Run in-process with REMINDERS_ENABLED or as `python -m services.reminders`
+    REMINDERS_ENABLED: bool = os.getenv("REMINDERS_ENABLED", "false").lower() == "true"
+    REMINDER_TIMEZONE: str = os.getenv("REMINDER_TIMEZONE", "Asia/Dhaka")
+    REMINDER_DIGEST_HOUR: int = int(os.getenv("REMINDER_DIGEST_HOUR", 7))
+    REMINDER_EXAM_LEAD_DAYS: int = int(os.getenv("REMINDER_EXAM_LEAD_DAYS", 2))
+    REMINDER_ASSIGNMENT_LOOKAHEAD_DAYS: int = int(os.getenv("REMINDER_ASSIGNMENT_LOOKAHEAD_DAYS", 7))
+    REMINDER_POLL_SECONDS: float = float(os.getenv("REMINDER_POLL_SECONDS", 30))
+    REMINDER_PLAN_INTERVAL_SECONDS: int = int(os.getenv("REMINDER_PLAN_INTERVAL_SECONDS", 900))
+    REMINDER_CLAIM_LIMIT: int = int(os.getenv("REMINDER_CLAIM_LIMIT", 1000))
+    REMINDER_CONCURRENCY: int = int(os.getenv("REMINDER_CONCURRENCY", 4))
+    REMINDER_MAX_ATTEMPTS: int = int(os.getenv("REMINDER_MAX_ATTEMPTS", 5))
+
+    # Mail delivery: "brevo" (transactional API, batched) or "stub" (log only)
+    MAILER_BACKEND: str = os.getenv("MAILER_BACKEND", "brevo" if os.getenv("BREVO_API_KEY") else "stub")
+    BREVO_API_URL: str = os.getenv("BREVO_API_URL", "https://api.brevo.com/v3/smtp/email")
+    # messageVersions per API call
+    BREVO_BATCH_SIZE: int = int(os.getenv("BREVO_BATCH_SIZE", 100))
+    MAIL_SENDER_EMAIL: str = os.getenv("MAIL_SENDER_EMAIL", "no-reply@northsouth.edu")
+    MAIL_SENDER_NAME: str = os.getenv("MAIL_SENDER_NAME", "NSU Academic Scheduler")
+
+settings = Settings()
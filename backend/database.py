@@ -1,34 +1,246 @@
-import os
-from sqlmodel import SQLModel, create_engine, Session
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlmodel import create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 from dotenv import load_dotenv
-from alembic import command
-from alembic.config import Config
+
+from config import settings
 
 load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_URL = settings.DATABASE_URL
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL is missing in .env file")
 
-# create engine
-engine = create_engine(DATABASE_URL, echo=True)
+
+class PoolMetrics:
+    """Counters for connection checkouts; read by /metrics/db-pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts_total": self.checkouts,
+                "checkout_timeouts_total": self.timeouts,
+                "checkout_wait_seconds_total": round(self.wait_seconds_total, 6),
+                "checkout_wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
+
+async_pool_metrics = PoolMetrics()
+
+
+def _timed_get(pool, metrics: PoolMetrics, do_get):
+    start = time.perf_counter()
+    try:
+        connection = do_get()
+    except Exception:
+        metrics.record(time.perf_counter() - start, timed_out=True)
+        raise
+    metrics.record(time.perf_counter() - start)
+    return connection
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    # class attribute so pools rebuilt by pool.recreate() keep reporting
+    metrics = async_pool_metrics
+
+    def _do_get(self):
+        return _timed_get(self, self.metrics, super()._do_get)
+
+
+def _is_postgres(url: str) -> bool:
+    return make_url(url).get_backend_name() == "postgresql"
+
+
+def _set_statement_timeout(target: Engine) -> None:
+    # SET on connect instead of libpq startup options, which Neon's pooler rejects
+    timeout_ms = settings.DB_STATEMENT_TIMEOUT_MS
+
+    @event.listens_for(target, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"SET statement_timeout = {int(timeout_ms)}")
+        cursor.close()
+
+
+def _pool_options() -> Dict[str, Any]:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _instrument(target: Engine) -> Engine:
+    if settings.METRICS_ENABLED:
+        from services.metrics import instrument_engine
+
+        instrument_engine(target)
+    return target
+
+
+def create_db_engine(url: str = DATABASE_URL) -> Engine:
+    """
+    A sync engine for one-off scripts (bench seeding, tools); the app and its
+    workers only use the async engine.
+    """
+    db_engine = create_engine(url, echo=settings.DB_ECHO)
+    if _is_postgres(url) and settings.DB_STATEMENT_TIMEOUT_MS:
+        _set_statement_timeout(db_engine)
+    return db_engine
+
+
+def async_database_url(url: str = DATABASE_URL) -> str:
+    """Rewrite a libpq-style URL (as Neon hands out) for the asyncpg driver."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    if parsed.get_backend_name() != "postgresql":
+        return url
+    query = dict(parsed.query)
+    # asyncpg spells libpq's sslmode as ssl and does not know channel_binding
+    sslmode = query.pop("sslmode", None)
+    query.pop("channel_binding", None)
+    if sslmode and "ssl" not in query:
+        query["ssl"] = sslmode
+    return parsed.set(drivername="postgresql+asyncpg", query=query).render_as_string(
+        hide_password=False
+    )
 
 
-# Alembic helper
-def run_migrations():
-    """Run Alembic migrations programmatically on startup."""
-    alembic_cfg = Config("alembic.ini")  # points to alembic.ini
+def create_async_db_engine(url: str = DATABASE_URL):
+    """asyncpg-backed engine used by the request handlers and background workers."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    async_url = async_database_url(url)
+    if not _is_postgres(url):
+        db_engine = create_async_engine(async_url, echo=settings.DB_ECHO)
+        _instrument(db_engine.sync_engine)
+        return db_engine
+
+    db_engine = create_async_engine(
+        async_url, echo=settings.DB_ECHO, poolclass=InstrumentedAsyncPool, **_pool_options()
+    )
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        _set_statement_timeout(db_engine.sync_engine)
+    _instrument(db_engine.sync_engine)
+    return db_engine
+
+
+_async_engine = None
+
+
+def get_async_engine():
+    """Created on first use so sync-only tools (alembic, scripts) never load asyncpg."""
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_db_engine()
+    return _async_engine
+
+
+async def dispose_engines() -> None:
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
+
+def _pool_status(pool, metrics: PoolMetrics) -> Dict[str, Any]:
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+        })
+    status.update(metrics.snapshot())
+    return status
+
+
+def pool_status() -> Dict[str, Any]:
+    """In-use counts and checkout wait times for the async pool, once it exists."""
+    status = {}
+    if _async_engine is not None:
+        status["async"] = _pool_status(_async_engine.sync_engine.pool, async_pool_metrics)
+    return status
+
+
+# Alembic helpers
+# the alembic head this code expects; bump it with every new revision
+# (`python -m migrate --check` fails while the two disagree)
+SCHEMA_REVISION = "0012"
+ALEMBIC_INI = Path(__file__).with_name("alembic.ini")
+
+
+def alembic_config():
+    # alembic is only imported by the migration entry points, never by app workers
+    from alembic.config import Config
+
+    alembic_cfg = Config(str(ALEMBIC_INI))
     alembic_cfg.set_main_option("sqlalchemy.url", DATABASE_URL)
-    command.upgrade(alembic_cfg, "head")  # apply all migrations
+    return alembic_cfg
 
 
-# Dependency for FastAPI routes
-def get_session():
-    with Session(engine) as session:
-        yield session
+def run_migrations(revision: str = "head"):
+    """Upgrade the database to `revision`; run once per deploy (`python -m migrate`)."""
+    from alembic import command
+
+    command.upgrade(alembic_config(), revision)
+
 
+async def schema_revision() -> Optional[str]:
+    """The database's alembic revision in a single query; None before the first migration."""
+    try:
+        async with get_async_engine().connect() as conn:
+            return (await conn.execute(text("SELECT version_num FROM alembic_version"))).scalar()
+    except DBAPIError:
+        # no alembic_version table yet
+        return None
 
-# Startup initializer
-def init_db():
-    # Instead of create_all(), we now use Alembic migrations
-    run_migrations()
+
+async def check_schema() -> None:
+    """Refuse to serve against a database that has not been migrated for this code."""
+    found = await schema_revision()
+    # revisions are zero-padded sequence numbers; a newer schema is expected
+    # while a deploy's migration has run but old workers are still up
+    if found is None or found < SCHEMA_REVISION:
+        raise RuntimeError(
+            f"Database schema is at {found or 'no revision'}, this build needs "
+            f"{SCHEMA_REVISION}; run `python -m migrate` first"
+        )
+
+
+def async_session() -> AsyncSession:
+    # objects stay readable after commit, so handlers can return them without a reload
+    return AsyncSession(get_async_engine(), expire_on_commit=False)
+
+
+async def get_async_session():
+    async with async_session() as session:
+        yield session
@@ -1,43 +1,134 @@
+import base64
+from collections import defaultdict
 import json
 from typing import Optional
 import uuid
-from fastapi import Depends, FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import BackgroundTasks, Depends, FastAPI, File, Request, HTTPException, Response, UploadFile
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from urllib.parse import urlencode
+import logging
 import os
 import httpx
 from dotenv import load_dotenv
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from pydantic import BaseModel
-from sqlmodel import SQLModel, create_engine, Session
-from sqlmodel import select
-from datetime import datetime, timezone, timedelta, time
-from models.models import  Event, User, EventType
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
+from sqlmodel.ext.asyncio.session import AsyncSession
+from datetime import date, datetime, timezone, timedelta, time
+from models.models import  Event, User, EventType, event_bounds, event_active_until, Course, OfficeHour, UserRole, Weekday
 from sqlalchemy import Column, ForeignKey, Integer, String, Time, Enum as SAEnum
-from sqlmodel import Session, select
-from google.auth.transport.requests import Request as GoogleRequest
+from sqlalchemy.exc import IntegrityError
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional, List, Dict, Any
 from fastapi import Query
+from database import (
+    async_session, check_schema, dispose_engines, get_async_engine, get_async_session, pool_status,
+)
+from repositories import CourseRepository, EventRepository, UserRepository
+from services.google_calendar import GoogleAPIError, get_calendar_client, close_calendar_client
+from services.auth import (
+    SESSION_COOKIE, CurrentUser, decode_session_token, needs_rotation, secret_problem,
+    set_session_cookie, user_cache, user_from_claims,
+)
+from services.event_cache import (
+    CachedListing, etag_matches, event_payloads, event_versions, listing_etag,
+)
+from services.google_mirror import read_mirror, refresh_if_stale
+from services.ics import calendar_chunks, event_fields, read_vevents, vevent_uid
+from services.google_watch import (
+    NotificationSyncer, WatchChannelRenewer, ensure_channel, verify_notification, watch_enabled,
+)
+from services.course_fanout import CourseFanoutWorker
+from services.course_summaries import CourseSummaryRefresher, upcoming_deadlines
+from services.freebusy import event_conflicts, free_slots, load_busy, merge_intervals
+from services.recurrence import normalize_rule, recurrence_until
+from services.serialization import (
+    STREAM_CHUNK_ROWS, FastJSONResponse, dumps, json_array_response, row_dict,
+)
+from services.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, render as render_metrics,
+)
+from services.partitions import PartitionMaintainer
+from services.reminders import ReminderScheduler
+from services.sync_worker import EventSyncWorker
+from services.tokens import token_manager
+from config import settings
 
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
 
 load_dotenv()  
 
 @app.on_event("startup")
-def on_startup():
-    init_db()
-
-DATABASE_URL = os.getenv("DATABASE_URL")    
-engine = create_engine(DATABASE_URL, echo=True)
+async def on_startup():
+    # migrations run once per deploy (`python -m migrate`); workers only verify
+    await check_schema()
+    if settings.SYNC_WORKER_ENABLED:
+        sync_worker.start()
+    if watch_enabled():
+        watch_renewer.start()
+    # renew Google tokens of active users before they expire
+    token_manager.start()
+    if settings.REMINDERS_ENABLED:
+        reminder_scheduler.start()
+    course_summaries.start()
+    if settings.COURSE_FANOUT_ENABLED:
+        course_fanout.start()
+    if settings.EVENT_PARTITIONS_ENABLED:
+        event_partitions.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await sync_worker.stop()
+    await token_manager.stop()
+    await watch_renewer.stop()
+    await reminder_scheduler.stop()
+    await course_summaries.stop()
+    await course_fanout.stop()
+    await event_partitions.stop()
+    await close_calendar_client()
+    await dispose_engines()
+
+# drains event_sync_jobs in the background so requests never wait on Google
+sync_worker = EventSyncWorker(get_async_engine())
+# Google push notifications keep the google_events mirror fresh without polling
+notification_syncer = NotificationSyncer(get_async_engine())
+watch_renewer = WatchChannelRenewer(get_async_engine())
+# daily digests and exam alerts (can also run as `python -m services.reminders`)
+reminder_scheduler = ReminderScheduler(get_async_engine())
+# rolls passed deadlines off the course directory's summaries
+course_summaries = CourseSummaryRefresher(get_async_engine())
+# pushes shared course events to enrolled students' Google calendars
+course_fanout = CourseFanoutWorker(get_async_engine())
+# semester partitions of events on Postgres (also `python -m services.partitions`)
+event_partitions = PartitionMaintainer(get_async_engine())
+
+
+# shared auth dependency: the signed session cookie is verified in memory, so
+# authenticated requests need no users lookup at all
+async def current_user(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_session),
+) -> CurrentUser:
+    token = request.cookies.get(SESSION_COOKIE)
+    claims = decode_session_token(token) if token else None
+    if not claims:
+        raise HTTPException(401, "Not logged in")
 
-def get_session():
-    with Session(engine) as session:
-        yield session
-def init_db():
-    SQLModel.metadata.create_all(engine)
+    user = user_from_claims(claims)
+    if needs_rotation(claims):
+        # refresh the profile fields carried in the token while rotating it
+        cached = await user_cache.get(str(user.user_id))
+        if cached is None:
+            db_user = await UserRepository(db).get(user.user_id)
+            if not db_user:
+                raise HTTPException(404, "User not found")
+            cached = CurrentUser.from_user(db_user)
+            await user_cache.set(str(user.user_id), cached)
+        user = cached
+        set_session_cookie(response, user)
+    return user
     
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
@@ -46,10 +137,19 @@ GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI")
 if not all([GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, GOOGLE_REDIRECT_URI]):
     raise RuntimeError("Missing required Google OAuth environment variables")
 
-GOOGLE_AUTH_ENDPOINT = "https://accounts.google.com/o/oauth2/auth"
-GOOGLE_TOKEN_ENDPOINT = "https://oauth2.googleapis.com/token"
-GOOGLE_USERINFO_ENDPOINT = "https://www.googleapis.com/oauth2/v2/userinfo"
-CALENDAR_LIST_ENDPOINT = "https://www.googleapis.com/calendar/v3/users/me/calendarList"
+# the session cookie is the only credential: anyone who knows the key can forge one
+problem = secret_problem()
+if problem:
+    raise RuntimeError(problem)
+
+# rows per multi-row INSERT when importing .ics files
+IMPORT_CHUNK_ROWS = 1000
+IMPORT_READ_BYTES = 64 * 1024
+IMPORT_MAX_ERRORS = 20
+
+# bounds for /api/freebusy so one query cannot scan a whole department's year
+FREEBUSY_MAX_DAYS = 62
+FREEBUSY_MAX_USERS = 50
 
 
 app.add_middleware(
@@ -58,7 +158,11 @@ app.add_middleware(
     allow_credentials=True, 
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+# outermost, so the timings include every other middleware
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 
 class UserResponse(BaseModel):
@@ -75,6 +179,50 @@ class EventCreate(BaseModel):
     task_time: time
     duration_minutes: Optional[int] = 60
     add_to_google: Optional[bool] = False
+    # RRULE subset, e.g. "FREQ=WEEKLY;BYDAY=SU,TU;UNTIL=20251220"; see services/recurrence.py
+    recurrence: Optional[str] = None
+    exdates: Optional[List[date]] = None
+    course_id: Optional[uuid.UUID] = None
+
+    @field_validator("recurrence")
+    @classmethod
+    def _check_recurrence(cls, value: Optional[str]) -> Optional[str]:
+        return normalize_rule(value) if value else None
+
+    @model_validator(mode="after")
+    def _check_dates(self):
+        # dates past the end of the calendar are a 422 here, not a 500 in to_event
+        starts_at, ends_at = event_bounds(self.event_date, self.task_time, self.duration_minutes)
+        until = recurrence_until(self.recurrence, self.event_date)
+        event_active_until(starts_at, ends_at, self.recurrence, until)
+        return self
+
+    def to_event(self, user_id: uuid.UUID) -> Event:
+        starts_at, ends_at = event_bounds(self.event_date, self.task_time, self.duration_minutes)
+        until = recurrence_until(self.recurrence, self.event_date)
+        exdates = None
+        if self.recurrence and self.exdates:
+            exdates = sorted({d.isoformat() for d in self.exdates})
+        return Event(
+            user_id=user_id,
+            course_id=self.course_id,
+            title=self.title,
+            description=self.description,
+            type=self.type,
+            event_date=self.event_date,
+            task_time=self.task_time,
+            duration_minutes=self.duration_minutes,
+            recurrence_rule=self.recurrence,
+            exdates=exdates,
+            recurrence_until=until,
+            starts_at=starts_at,
+            ends_at=ends_at,
+            active_until=event_active_until(starts_at, ends_at, self.recurrence, until),
+        )
+
+
+class EventBulkCreate(BaseModel):
+    events: List[EventCreate] = Field(..., min_length=1, max_length=5000)
 
 
 class EventRead(BaseModel):
@@ -85,7 +233,88 @@ class EventRead(BaseModel):
     event_date: datetime
     task_time: time
     duration_minutes: int
+    starts_at: datetime
+    ends_at: datetime
     is_synced: bool
+    recurrence_rule: Optional[str] = None
+    exdates: Optional[List[date]] = None
+    # set on generated occurrences: the id of the recurring event they belong to
+    series_id: Optional[uuid.UUID] = None
+    course_id: Optional[uuid.UUID] = None
+    # a course event posted by its staff; read-only for enrolled students
+    is_shared: bool = False
+
+
+class CourseCreate(BaseModel):
+    code: str = Field(..., min_length=2, max_length=20)
+    name: str = Field(..., min_length=1, max_length=200)
+    semester: str = Field(..., min_length=1, max_length=40)
+    # defaults to the user creating the course
+    instructor_email: Optional[str] = None
+
+    @field_validator("code")
+    @classmethod
+    def _normalize_code(cls, value: str) -> str:
+        # "cse 115" and "CSE115" are the same course
+        return "".join(value.split()).upper()
+
+
+class OfficeHourCreate(BaseModel):
+    day: Weekday
+    start_time: time
+    end_time: time
+    room: Optional[str] = None
+    course_id: Optional[uuid.UUID] = None
+
+    @model_validator(mode="after")
+    def _check_times(self):
+        if self.end_time <= self.start_time:
+            raise ValueError("end_time must be after start_time")
+        return self
+
+
+class RoleUpdate(BaseModel):
+    role: UserRole
+
+
+# roles allowed to manage courses and office hours
+STAFF_ROLES = {UserRole.ta.value, UserRole.ra.value, UserRole.lab_instructor.value, UserRole.teacher.value}
+
+
+# EventRead's fields, for serializing trusted rows without validating each one
+EVENT_READ_FIELDS = tuple(EventRead.model_fields)
+
+
+class Conflict(BaseModel):
+    title: str
+    start: datetime
+    end: datetime
+    source: str  # "local" | "google"
+
+
+class EventCreated(EventRead):
+    # existing events the new one overlaps; the event is saved regardless
+    conflicts: List[Conflict] = []
+
+
+# connection pool usage, for sizing workers against the database connection limit
+@app.get("/metrics/db-pool")
+def db_pool_metrics():
+    return pool_status()
+
+
+# Google quota scheduler: adaptive rates, queued calls, throttles (services/google_quota.py)
+@app.get("/metrics/google-quota")
+def google_quota_metrics():
+    return get_calendar_client().quota.snapshot()
+
+
+# Prometheus scrape target (services/metrics.py)
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(404, "Metrics are disabled")
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -96,20 +325,35 @@ async def home():
 
 # in response to frontend request for current user
 @app.get("/api/me")
-def get_current_user(request: Request):
-    email = request.cookies.get("email")
-    if not email:
-        raise HTTPException(401, "Not logged in")
-    with Session(engine) as session:
-        user = session.exec(select(User).where(User.email == email)).first()
-        if not user:
-            raise HTTPException(404, "User not found")
-        return {
-            "id": str(user.user_id),
-            "name": user.name,
-            "email": user.email,
-            "role": "student", 
-        }
+def get_current_user(user: CurrentUser = Depends(current_user)):
+    return {
+        "id": str(user.user_id),
+        "name": user.name,
+        "email": user.email,
+        "role": user.role,
+    }
+
+
+@app.put("/api/users/{user_id}/role")
+async def set_user_role(
+    user_id: uuid.UUID,
+    payload: RoleUpdate,
+    response: Response,
+    user: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    # roles gate course management, so nobody assigns their own
+    _require_admin(user)
+    db_user = await UserRepository(db).set_role(user_id, payload.role)
+    if not db_user:
+        raise HTTPException(404, "User not found")
+    target = CurrentUser.from_user(db_user)
+    # the next session rotation picks the new role up from the database
+    await user_cache.delete(str(target.user_id))
+    if target.user_id == user.user_id:
+        # the role travels in the session token, so re-issue it now
+        set_session_cookie(response, target)
+    return {"user_id": target.user_id, "role": target.role}
 
 
 @app.get("/login")
@@ -123,7 +367,7 @@ def login():
         "prompt": "consent",
         "hd": "northsouth.edu",
     }
-    url = f"{GOOGLE_AUTH_ENDPOINT}?{urlencode(query_params)}"
+    url = f"{settings.GOOGLE_AUTH_ENDPOINT}?{urlencode(query_params)}"
     return RedirectResponse(url)
 
 @app.get("/logout")
@@ -133,12 +377,12 @@ def logout():
 
     resp = RedirectResponse(url=login_url, status_code=302)
     # clear the cookie by setting empty value and expired date
-    resp.delete_cookie(key="email")
+    resp.delete_cookie(key=SESSION_COOKIE)
     return resp
 
 # gets all the permissions and user info, calendar list
 @app.get("/auth/callback")
-async def auth_callback(request: Request):
+async def auth_callback(request: Request, db: AsyncSession = Depends(get_async_session)):
     code = request.query_params.get("code")
     if not code:
         raise HTTPException(status_code=400, detail="Authorization code not found")
@@ -151,179 +395,602 @@ async def auth_callback(request: Request):
         "grant_type": "authorization_code",
     }
 
-    async with httpx.AsyncClient() as client:
-        token_response = await client.post(GOOGLE_TOKEN_ENDPOINT, data=data)
-        token_data = token_response.json()
-        access_token = token_data.get("access_token")
-        refresh_token = token_data.get("refresh_token")
-        expires_in = token_data.get("expires_in")  # seconds
-
-        if not access_token:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Failed to retrieve access token: {token_data}",
-            )
-
-        headers = {"Authorization": f"Bearer {access_token}"}
-        userinfo_response = await client.get(GOOGLE_USERINFO_ENDPOINT, headers=headers)
-        userinfo = userinfo_response.json()
-        email = userinfo.get("email")
-
-        # ✅ Check domain restriction
-        if not email or not email.endswith("@northsouth.edu"):
-            return HTMLResponse(
-                "<h2>Access denied</h2><p>You must login with a northsouth.edu email.</p>",
-                status_code=403,
-            )
-            
-        calendar_response = await client.get(CALENDAR_LIST_ENDPOINT, headers=headers)
-        calendar_data = calendar_response.json()
-        primary_calendar_id = None
-        items = calendar_data.get("items", [])
-        for cal in items:
-            if cal.get("primary"):
-                primary_calendar_id = cal["id"]
-                break
-        if not primary_calendar_id and items:
-            primary_calendar_id = items[0]["id"]
-
-        with Session(engine) as session:
-            statement = select(User).where(User.email == email)
-            db_user = session.exec(statement).first()
-
-            expiry_time = None
-            if expires_in:
-                expiry_time = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
+    # the process-wide client: pooled connections, retries and the Google quota scheduler
+    client = get_calendar_client()
+    try:
+        # an authorization code is single-use: a retry after a lost response
+        # could only fail with invalid_grant, so send the exchange once
+        token_data = (
+            await client.request("POST", settings.GOOGLE_TOKEN_ENDPOINT, retries=0, data=data)
+        ).json()
+    except GoogleAPIError as e:
+        if e.status_code >= 500 or e.is_rate_limited:
+            raise HTTPException(502, "Google sign-in is unavailable, try again")
+        # a rejected code (expired, already used): report what Google said
+        token_data = e.payload
+    except (httpx.TransportError, ValueError):
+        raise HTTPException(502, "Google sign-in is unavailable, try again")
+    if not isinstance(token_data, dict):
+        token_data = {"error": token_data}
+    access_token = token_data.get("access_token")
+    refresh_token = token_data.get("refresh_token")
+    expires_in = token_data.get("expires_in")  # seconds
+
+    if not access_token:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Failed to retrieve access token: {token_data}",
+        )
 
-            if not db_user:
-                # new user
-                db_user = User(
-                    email=email,
-                    google_id=userinfo.get("id"),
-                    google_access_token=access_token,
-                    google_refresh_token=refresh_token,
-                    token_expiry=expiry_time,
-                    calendar_id=primary_calendar_id
-            )
-                session.add(db_user)
-            else:
-                # existing user -> update tokens
-                db_user.google_access_token = access_token
-                if refresh_token:  # Google may not return it every time
-                    db_user.google_refresh_token = refresh_token
-                db_user.token_expiry = expiry_time
-                db_user.calendar_id = primary_calendar_id
-
-
-            session.commit()
-            session.refresh(db_user)
-        
-        frontend_url = os.getenv("FRONTEND_URL", "http://localhost:5173")
-        next_url = request.query_params.get("next") or f"{frontend_url}/"
-
-        resp = RedirectResponse(next_url, status_code=302)
-        resp.set_cookie(
-            key="email",
-            value=email,
-            httponly=True,
-            samesite="lax",  # allow cross-site navigation
-            secure=False     # only use True in production with HTTPS
+    try:
+        userinfo = (
+            await client.request("GET", settings.GOOGLE_USERINFO_ENDPOINT, access_token)
+        ).json()
+    except (GoogleAPIError, httpx.TransportError, ValueError):
+        # the token was just issued, so this is Google failing, not the user
+        raise HTTPException(502, "Could not read the Google profile, try again")
+    email = userinfo.get("email") if isinstance(userinfo, dict) else None
+
+    # ✅ Check domain restriction
+    if not email or not email.endswith("@northsouth.edu"):
+        return HTMLResponse(
+            "<h2>Access denied</h2><p>You must login with a northsouth.edu email.</p>",
+            status_code=403,
         )
+        
+    try:
+        calendar_data = (
+            await client.request("GET", settings.GOOGLE_CALENDAR_LIST_ENDPOINT, access_token)
+        ).json()
+    except (GoogleAPIError, httpx.TransportError, ValueError):
+        calendar_data = {}
+    primary_calendar_id = None
+    items = calendar_data.get("items", [])
+    for cal in items:
+        if cal.get("primary"):
+            primary_calendar_id = cal["id"]
+            break
+    if not primary_calendar_id and items:
+        primary_calendar_id = items[0]["id"]
+
+    expiry_time = None
+    if expires_in:
+        expiry_time = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
+
+    db_user = await UserRepository(db).save_google_login(
+        email=email,
+        google_id=userinfo.get("id"),
+        access_token=access_token,
+        refresh_token=refresh_token,
+        token_expiry=expiry_time,
+        calendar_id=primary_calendar_id,
+    )
+    current = CurrentUser.from_user(db_user)
 
-        return resp
+    # tokens / calendar changed -> drop the cached identity for this user
+    await user_cache.delete(str(current.user_id))
+    token_manager.store(current.user_id, access_token, expiry_time)
+    
+    frontend_url = os.getenv("FRONTEND_URL", "http://localhost:5173")
+    next_url = request.query_params.get("next") or f"{frontend_url}/"
+
+    resp = RedirectResponse(next_url, status_code=302)
+    set_session_cookie(resp, current)
+
+    return resp
+
+async def _check_courses(db: AsyncSession, course_ids: List[Optional[uuid.UUID]]) -> None:
+    wanted = {c for c in course_ids if c is not None}
+    missing = wanted - await CourseRepository(db).existing_ids(list(wanted))
+    if missing:
+        raise HTTPException(422, f"Unknown course id(s): {', '.join(sorted(map(str, missing)))}")
 
 # creating event both in local DB and Google Calendar
-@app.post("/api/events", response_model=EventRead)
-def create_event(
+@app.post("/api/events", response_model=EventCreated)
+async def create_event(
     event: EventCreate,
-    request: Request,
-    db: Session = Depends(get_session)
+    user: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session)
 ):
-    email = request.cookies.get("email")
-    if not email:
-        raise HTTPException(401, "Not logged in")
+    await _check_courses(db, [event.course_id])
+    # create DB event
+    new_event = event.to_event(user.user_id)
+    # warn about clashes with local and mirrored Google events
+    conflicts = await event_conflicts(db, new_event)
+    # queue the Google push in the same transaction; the sync worker fills in
+    # google_event_id / is_synced once Google accepts it
+    push_to_google = event.add_to_google and user.has_google
+    await EventRepository(db).create(new_event, push_to_google)
+
+    if push_to_google:
+        sync_worker.notify()
+    return EventCreated(
+        **EventRead.model_validate(new_event, from_attributes=True).model_dump(),
+        conflicts=[
+            Conflict(title=c.title, start=c.start, end=c.end, source=c.source) for c in conflicts
+        ],
+    )
 
-    user = db.exec(select(User).where(User.email == email)).first()
-    if not user:
-        raise HTTPException(404, "User not found")
+# bulk import (e.g. a whole semester of exams/assignments) in one round-trip
+@app.post("/api/events/bulk", response_model=list[EventRead], status_code=201)
+async def create_events_bulk(
+    payload: EventBulkCreate,
+    response: Response,
+    user: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session)
+):
+    await _check_courses(db, [item.course_id for item in payload.events])
+    rows = [item.to_event(user.user_id).model_dump() for item in payload.events]
+    # a single multi-row INSERT ... RETURNING instead of one INSERT per event
+    created, queued = await EventRepository(db).create_many(
+        rows, [item.add_to_google and user.has_google for item in payload.events]
+    )
 
-    # create DB event
-    new_event = Event(
-        user_id=user.user_id,
-        title=event.title,
-        description=event.description,
-        type=event.type,
-        event_date=event.event_date,
-        task_time=event.task_time,
-        duration_minutes=event.duration_minutes,
+    if queued:
+        sync_worker.notify()
+    return _json_list([row_dict(e, EVENT_READ_FIELDS) for e in created], response, 201)
+
+async def _ics_feed(user_id: uuid.UUID):
+    # the request's session is closed before the body is streamed, so the
+    # export reads through its own
+    async with async_session() as db:
+        async for chunk in calendar_chunks(EventRepository(db).stream_for_user(user_id)):
+            yield chunk
+
+
+# whole calendar as iCalendar, streamed from a server-side cursor
+@app.get("/api/events.ics")
+async def export_events_ics(response: Response, user: CurrentUser = Depends(current_user)):
+    return _with_headers(
+        StreamingResponse(
+            _ics_feed(user.user_id),
+            media_type="text/calendar; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="events.ics"'},
+        ),
+        response,
     )
-    db.add(new_event)
-    db.commit()
-    db.refresh(new_event)
-
-    # push to Google Calendar if requested
-    if event.add_to_google and (user.google_access_token or user.google_refresh_token):
-        try:
-            creds = refresh_google_token(user, db)
-            if not creds:
-                creds = Credentials(
-                token=user.google_access_token,
-                refresh_token=user.google_refresh_token,
-                token_uri="https://oauth2.googleapis.com/token",
-                client_id=GOOGLE_CLIENT_ID,
-                client_secret=GOOGLE_CLIENT_SECRET
-                )
-            
-            service = build("calendar", "v3", credentials=creds)
-
-            start_dt = datetime.combine(
-                event.event_date.date(), event.task_time
-            )
-            end_dt = start_dt + timedelta(minutes=event.duration_minutes or 60)
-
-            g_event = {
-                "summary": event.title,
-                "description": event.description,
-                "start": {"dateTime": start_dt.isoformat(), "timeZone": "UTC"},
-                "end": {"dateTime": end_dt.isoformat(), "timeZone": "UTC"},
-            }
-
-            created = service.events().insert(
-                calendarId=user.calendar_id or "primary", body=g_event
-            ).execute()
-
-            new_event.google_event_id = created["id"]
-            new_event.is_synced = True
-            db.commit()
-            db.refresh(new_event)
-        except Exception as e:
-            print(f"Google Calendar sync failed: {e}")
-    return new_event
+
+
+async def _upload_chunks(upload: UploadFile):
+    while chunk := await upload.read(IMPORT_READ_BYTES):
+        yield chunk
+
+
+@app.post("/api/events/import")
+async def import_events(
+    files: List[UploadFile] = File(..., description=".ics files"),
+    type: EventType = Query(EventType.reminder, description="for events without a known CATEGORIES"),
+    add_to_google: bool = Query(False),
+    user: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
+) -> Dict[str, Any]:
+    """
+    Bulk import of iCalendar files.
+
+    Uploads are parsed incrementally and inserted IMPORT_CHUNK_ROWS at a time
+    with multi-row INSERTs, so memory stays bounded however large the file.
+    VEVENTs that cannot be stored (e.g. an RRULE outside the supported
+    subset) are skipped and reported.
+    """
+    repository = EventRepository(db)
+    push = add_to_google and user.has_google
+    imported = skipped = 0
+    errors: List[str] = []
+    rows: List[Dict[str, Any]] = []
+
+    async def flush():
+        nonlocal imported, rows
+        if rows:
+            created, _ = await repository.create_many(rows, [push] * len(rows))
+            imported += len(created)
+            rows = []
+
+    for upload in files:
+        async for vevent in read_vevents(_upload_chunks(upload)):
+            try:
+                item = EventCreate(**event_fields(vevent, type), add_to_google=push)
+                row = item.to_event(user.user_id).model_dump()
+            except (ValueError, OverflowError) as e:
+                skipped += 1
+                if len(errors) < IMPORT_MAX_ERRORS:
+                    reason = e.errors()[0]["msg"] if isinstance(e, ValidationError) else str(e)
+                    errors.append(f"{upload.filename} {vevent_uid(vevent)}: {reason}")
+                continue
+            rows.append(row)
+            if len(rows) >= IMPORT_CHUNK_ROWS:
+                await flush()
+    await flush()
+
+    if push and imported:
+        sync_worker.notify()
+    return {"imported": imported, "skipped": skipped, "errors": errors}
+
+
+def _encode_cursor(event: Event) -> str:
+    raw = json.dumps([_as_aware(event.starts_at).isoformat(), str(event.id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        starts_at, event_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return _as_aware(datetime.fromisoformat(starts_at)), uuid.UUID(event_id)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+
+
+def _with_headers(result: Response, response: Response) -> Response:
+    # a returned Response bypasses the injected one, so carry over what the
+    # dependencies set on it (the rotated session cookie)
+    result.headers.raw.extend(response.headers.raw)
+    return result
+
+
+def _json_list(rows: List[Dict[str, Any]], response: Response, status_code: int = 200) -> Response:
+    # long lists go out as a chunked array instead of one large buffer
+    if len(rows) > STREAM_CHUNK_ROWS:
+        return _with_headers(json_array_response(rows, status_code), response)
+    return _with_headers(FastJSONResponse(rows, status_code=status_code), response)
+
 
 @app.get("/api/events", response_model=list[EventRead])
-def get_events(request: Request, db: Session = Depends(get_session)):
-    email = request.cookies.get("email")
-    if not email:
-        raise HTTPException(401, "Not logged in")
+async def get_events(
+    request: Request,
+    response: Response,
+    start: Optional[datetime] = Query(None, description="only events on/after this instant"),
+    end: Optional[datetime] = Query(None, description="only events before this instant"),
+    type: Optional[EventType] = Query(None),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    limit: int = Query(500, ge=1, le=1000),
+    user: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Lists the user's events overlapping [start, end), ordered by (starts_at, id).
+
+    start/end (FullCalendar sends these for the visible range) become a
+    tstzrange overlap answered by the GiST index on (user_id,
+    tstzrange(starts_at, ends_at)), so this stays an index scan however long
+    the history is. Recurring
+    events are returned as their individual occurrences in the range, each
+    with `series_id` set. When more rows remain, the X-Next-Cursor header
+    holds the cursor for the next page.
+
+    Responses carry an ETag derived from the user's events version: a
+    matching If-None-Match gets 304 without any database access, and
+    repeated views are served from the serialized payload cache.
+    """
+    query = (
+        _as_aware(start).isoformat() if start else None,
+        _as_aware(end).isoformat() if end else None,
+        type.value if type else None,
+        cursor,
+        limit,
+    )
+    version = await event_versions.get(user.user_id)
+    etag = listing_etag(user.user_id, version, query)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Cookie"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return _with_headers(Response(status_code=304, headers=headers), response)
+
+    cache_key = (user.user_id, version, query)
+    listing = event_payloads.get(cache_key)
+    if listing is None:
+        events = await EventRepository(db).list_for_user(
+            user.user_id,
+            start=start,
+            end=end,
+            type=type,
+            after=_decode_cursor(cursor) if cursor else None,
+            limit=limit + 1,
+        )
+        next_cursor = None
+        if len(events) > limit:
+            events = events[:limit]
+            next_cursor = _encode_cursor(events[-1])
+        body = dumps([row_dict(e, EVENT_READ_FIELDS) for e in events])
+        listing = CachedListing(body, next_cursor)
+        event_payloads.set(cache_key, listing)
+
+    if listing.next_cursor:
+        headers["X-Next-Cursor"] = listing.next_cursor
+    return _with_headers(
+        Response(listing.body, media_type="application/json", headers=headers), response
+    )
 
-    user = db.exec(select(User).where(User.email == email)).first()
-    if not user:
-        raise HTTPException(404, "User not found")
 
-    events = db.exec(select(Event).where(Event.user_id == user.user_id)).all()
-    return events
+@app.get("/api/freebusy")
+async def get_freebusy(
+    start: datetime = Query(..., description="window start (ISO 8601)"),
+    end: datetime = Query(..., description="window end (ISO 8601)"),
+    users: Optional[str] = Query(None, description="comma-separated emails; defaults to you"),
+    min_minutes: int = Query(30, ge=1, le=24 * 60, description="shortest free slot to report"),
+    user: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
+) -> Dict[str, Any]:
+    """
+    Busy blocks per user and the slots in [start, end) where all of them are free.
 
+    Combines local events (recurring ones expanded) with each user's Google
+    mirror. Only times are returned for other users, never event details.
+    """
+    start, end = _as_aware(start), _as_aware(end)
+    if end <= start:
+        raise HTTPException(422, "end must be after start")
+    if end - start > timedelta(days=FREEBUSY_MAX_DAYS):
+        raise HTTPException(422, f"window is limited to {FREEBUSY_MAX_DAYS} days")
+
+    emails = [e.strip().lower() for e in users.split(",") if e.strip()] if users else [user.email]
+    if len(emails) > FREEBUSY_MAX_USERS:
+        raise HTTPException(422, f"at most {FREEBUSY_MAX_USERS} users per query")
+    found = {u.email.lower(): u for u in await UserRepository(db).get_many_by_email(emails)}
+    busy = await load_busy(db, [u.user_id for u in found.values()], start, end)
+
+    calendars = {}
+    all_busy = []
+    for email, member in found.items():
+        intervals = merge_intervals((b.start, b.end) for b in busy.get(member.user_id, []))
+        all_busy.extend(intervals)
+        calendars[email] = {"busy": [{"start": s, "end": e} for s, e in intervals]}
+
+    free = free_slots(all_busy, start, end, timedelta(minutes=min_minutes))
+    return {
+        "start": start,
+        "end": end,
+        "calendars": calendars,
+        "free": [{"start": s, "end": e} for s, e in free],
+        "unknown": [email for email in emails if email not in found],
+    }
+
+
+def _require_admin(user: CurrentUser) -> None:
+    if user.email.lower() not in settings.ADMIN_EMAILS:
+        raise HTTPException(403, "Only administrators can change roles")
+
+
+def _require_staff(user: CurrentUser) -> None:
+    if user.role not in STAFF_ROLES:
+        raise HTTPException(403, "Only faculty and TAs can manage courses")
+
+
+def _person(user: User) -> Dict[str, Any]:
+    return {"user_id": user.user_id, "name": user.name, "email": user.email, "role": user.role}
+
+
+def _office_hour(office_hour: OfficeHour) -> Dict[str, Any]:
+    return {
+        "id": office_hour.id,
+        "course_id": office_hour.course_id,
+        "day": office_hour.day,
+        "start_time": office_hour.start_time,
+        "end_time": office_hour.end_time,
+        "room": office_hour.room,
+    }
+
+
+def _course(course: Course) -> Dict[str, Any]:
+    return {"id": course.id, "code": course.code, "name": course.name, "semester": course.semester}
+
+
+@app.post("/api/courses", status_code=201)
+async def create_course(
+    payload: CourseCreate,
+    user: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    _require_staff(user)
+    instructor_id = user.user_id
+    if payload.instructor_email:
+        instructor = await UserRepository(db).get_by_email(payload.instructor_email.strip().lower())
+        if not instructor:
+            raise HTTPException(422, "Unknown instructor email")
+        instructor_id = instructor.user_id
+    course = Course(
+        code=payload.code, name=payload.name, semester=payload.semester, instructor_id=instructor_id
+    )
+    try:
+        await CourseRepository(db).create(course)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(409, f"{payload.code} already exists for {payload.semester}")
+    return _course(course)
+
+
+# declared before /api/courses/{code} so "autocomplete" is not taken for a code
+@app.get("/api/courses/autocomplete", response_class=FastJSONResponse)
+async def autocomplete_courses(
+    q: str = Query(..., min_length=1, max_length=50),
+    limit: int = Query(10, ge=1, le=25),
+    user: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    return [_course(c) for c in await CourseRepository(db).autocomplete(q, limit)]
+
+
+@app.get("/api/courses/{code}", response_class=FastJSONResponse)
+async def get_course(
+    code: str,
+    user: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """Every section of a course code: instructor, office hours and upcoming deadlines."""
+    sections = await CourseRepository(db).by_code("".join(code.split()))
+    if not sections:
+        raise HTTPException(404, "Course not found")
+    return [
+        {
+            **_course(detail.course),
+            "instructor": _person(detail.instructor) if detail.instructor else None,
+            "office_hours": [
+                {**_office_hour(oh), "holder": _person(holder)} for oh, holder in detail.office_hours
+            ],
+            "upcoming_deadlines": upcoming_deadlines(detail.summary),
+            "next_exam_at": detail.summary.next_exam_at if detail.summary else None,
+        }
+        for detail in sections
+    ]
+
+
+@app.post("/api/courses/{course_id}/enrollment", status_code=201)
+async def enroll(
+    course_id: uuid.UUID,
+    user: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """Subscribe to the course's shared events (and their Google copies)."""
+    if not await CourseRepository(db).get(course_id):
+        raise HTTPException(404, "Course not found")
+    db_user = await UserRepository(db).get(user.user_id)
+    enrolled = await CourseRepository(db).enroll(course_id, db_user)
+    if enrolled:
+        course_fanout.notify()
+    return {"course_id": course_id, "enrolled": True}
+
+
+@app.delete("/api/courses/{course_id}/enrollment", status_code=204)
+async def unenroll(
+    course_id: uuid.UUID,
+    user: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    if not await CourseRepository(db).unenroll(course_id, user.user_id):
+        raise HTTPException(404, "Not enrolled in this course")
+    course_fanout.notify()
+
+
+@app.get("/api/me/courses", response_class=FastJSONResponse)
+async def my_courses(
+    user: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    return [_course(c) for c in await CourseRepository(db).enrolled_courses(user.user_id)]
+
+
+async def _own_course(db: AsyncSession, course_id: uuid.UUID, user: CurrentUser) -> Course:
+    _require_staff(user)
+    course = await CourseRepository(db).get(course_id)
+    if not course:
+        raise HTTPException(404, "Course not found")
+    if course.instructor_id != user.user_id:
+        raise HTTPException(403, "Only the course's instructor can post its events")
+    return course
+
+
+async def _own_shared_event(
+    db: AsyncSession, course_id: uuid.UUID, event_id: uuid.UUID, user: CurrentUser
+) -> Event:
+    """The course's shared event, if `user` teaches the course or posted the event."""
+    _require_staff(user)
+    course = await CourseRepository(db).get(course_id)
+    event = await db.get(Event, event_id)
+    if course is None or event is None or not event.is_shared or event.course_id != course_id:
+        raise HTTPException(404, "Course event not found")
+    if user.user_id not in (course.instructor_id, event.user_id):
+        raise HTTPException(403, "Only the course's instructor or the event's author can change it")
+    return event
+
+
+# the fields of a shared event that an edit replaces
+SHARED_EVENT_FIELDS = (
+    "title", "description", "type", "event_date", "task_time", "duration_minutes",
+    "recurrence_rule", "exdates", "recurrence_until",
+)
+
+
+@app.post("/api/courses/{course_id}/events", response_model=EventRead, status_code=201)
+async def post_course_event(
+    course_id: uuid.UUID,
+    event: EventCreate,
+    user: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Post an event for everyone enrolled: one shared row that all of them
+    read, copied into their Google calendars in the background.
+    """
+    await _own_course(db, course_id, user)
+    new_event = event.model_copy(update={"course_id": course_id}).to_event(user.user_id)
+    new_event.is_shared = True
+    push_to_google = event.add_to_google and user.has_google
+    await EventRepository(db).create(new_event, push_to_google)
+
+    course_fanout.notify()
+    if push_to_google:
+        sync_worker.notify()
+    return EventRead.model_validate(new_event, from_attributes=True)
+
+
+@app.put("/api/courses/{course_id}/events/{event_id}", response_model=EventRead)
+async def update_course_event(
+    course_id: uuid.UUID,
+    event_id: uuid.UUID,
+    payload: EventCreate,
+    user: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    event = await _own_shared_event(db, course_id, event_id, user)
+    replacement = payload.to_event(event.user_id)
+    await EventRepository(db).update_shared(
+        event, {name: getattr(replacement, name) for name in SHARED_EVENT_FIELDS}
+    )
+    course_fanout.notify()
+    sync_worker.notify()
+    return EventRead.model_validate(event, from_attributes=True)
 
-@app.get("/profile", response_class=HTMLResponse)
-async def profile(request: Request):
-    email = request.cookies.get("email")
-    if not email:
-        raise HTTPException(401, "Not logged in")
 
-    with Session(engine) as session:
-        user = session.exec(select(User).where(User.email == email)).first()
-        if not user:
-            raise HTTPException(401, "User not found")
+@app.delete("/api/courses/{course_id}/events/{event_id}", status_code=204)
+async def cancel_course_event(
+    course_id: uuid.UUID,
+    event_id: uuid.UUID,
+    user: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """Cancel a shared event; every student's Google copy is removed."""
+    await EventRepository(db).cancel_shared(await _own_shared_event(db, course_id, event_id, user))
+    course_fanout.notify()
+    sync_worker.notify()
+
+
+@app.post("/api/office-hours", status_code=201)
+async def create_office_hour(
+    payload: OfficeHourCreate,
+    user: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    _require_staff(user)
+    await _check_courses(db, [payload.course_id])
+    office_hour = await CourseRepository(db).add_office_hour(
+        OfficeHour(user_id=user.user_id, **payload.model_dump())
+    )
+    return _office_hour(office_hour)
+
+
+@app.get("/api/search", response_class=FastJSONResponse)
+async def search_directory(
+    q: str = Query(..., min_length=2, max_length=100),
+    role: Optional[UserRole] = None,
+    limit: int = Query(10, ge=1, le=50),
+    user: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """Courses (with upcoming deadlines) and people (with office hours) matching `q`."""
+    courses = await CourseRepository(db).search(q, limit)
+    people = await UserRepository(db).search(q, role, limit)
+    hours: Dict[uuid.UUID, List[Dict[str, Any]]] = defaultdict(list)
+    for office_hour in await CourseRepository(db).office_hours_for([p.user_id for p in people]):
+        hours[office_hour.user_id].append(_office_hour(office_hour))
+    return {
+        "courses": [
+            {**_course(course), "upcoming_deadlines": upcoming_deadlines(summary)}
+            for course, summary in courses
+        ],
+        "people": [{**_person(p), "office_hours": hours[p.user_id]} for p in people],
+    }
+
+
+@app.get("/profile", response_class=HTMLResponse)
+async def profile(user: CurrentUser = Depends(current_user)):
+    email = user.email
 
     return f"""
     <!DOCTYPE html>
@@ -367,109 +1034,84 @@ async def profile(request: Request):
     </html>
     """
 
-def refresh_google_token(user: User, db: Session):
-    if user.google_refresh_token:
-        creds = Credentials(
-            token=user.google_access_token,
-            refresh_token=user.google_refresh_token,
-            token_uri="https://oauth2.googleapis.com/token",
-            client_id=GOOGLE_CLIENT_ID,
-            client_secret=GOOGLE_CLIENT_SECRET
-        )
-        
-        if creds.expired:
-            creds.refresh(GoogleRequest())
-            user.google_access_token = creds.token
-            user.token_expiry = creds.expiry
-            db.commit()
-        
-        return creds
-    return None
-
 
-def fetch_google_events(access_token, refresh_token):
-    creds = Credentials(
-        token=access_token,
-        refresh_token=refresh_token,
-        token_uri="https://oauth2.googleapis.com/token",
-        client_id=GOOGLE_CLIENT_ID,
-        client_secret=GOOGLE_CLIENT_SECRET,
-        scopes=["https://www.googleapis.com/auth/calendar"]
-    )
-
-    service = build("calendar", "v3", credentials=creds)
-
-    now = datetime.utcnow().isoformat() + "Z"
-    future = (datetime.utcnow() + timedelta(days=30)).isoformat() + "Z"
-
-    events_result = service.events().list(
-        calendarId="primary",
-        timeMin=now,
-        timeMax=future,
-        singleEvents=True,
-        orderBy="startTime"
-    ).execute()
-
-    return events_result.get("items", [])
-
-
-
-@app.get("/api/google/events")
-def list_google_events(
-    request: Request,
-    db: Session = Depends(get_session),
+@app.get("/api/google/events", response_class=FastJSONResponse)
+async def list_google_events(
+    response: Response,
+    current: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
     time_min: Optional[str] = Query(None, description="ISO string, e.g. 2025-01-01T00:00:00Z"),
     time_max: Optional[str] = Query(None, description="ISO string, e.g. 2025-01-31T23:59:59Z"),
 ) -> List[Dict[str, Any]]:
     """
     Returns normalized Google Calendar events for the current user between time_min and time_max.
     """
-    email = request.cookies.get("email")
-    if not email:
-        raise HTTPException(401, "Not logged in")
-
-    user = db.exec(select(User).where(User.email == email)).first()
+    if not current.has_google:
+        return []
+    # token columns are deliberately not cached, so load the row here
+    user = await UserRepository(db).get(current.user_id)
     if not user:
         raise HTTPException(404, "User not found")
 
-    creds = refresh_google_token(user, db)
-    if not creds:
+    access_token = await token_manager.get_access_token(user)
+    if not access_token:
         # User hasn’t connected Google or no refresh token
         return []
 
-    service = build("calendar", "v3", credentials=creds)
-
     # Defaults: show next 31 days if caller doesn’t pass range
-    from datetime import datetime, timedelta, timezone
     now = datetime.now(timezone.utc)
-    if not time_min:
-        time_min = now.replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
-    if not time_max:
-        time_max = (now + timedelta(days=31)).isoformat()
-
-    items = service.events().list(
-        calendarId=user.calendar_id or "primary",
-        timeMin=time_min,
-        timeMax=time_max,
-        singleEvents=True,
-        orderBy="startTime",
-    ).execute().get("items", [])
-
-    # Normalize fields for the frontend
-    normalized = []
-    for ev in items:
-        start = ev.get("start", {})
-        end = ev.get("end", {})
-        start_dt = start.get("dateTime") or start.get("date")  # all-day events have 'date'
-        end_dt = end.get("dateTime") or end.get("date")
-
-        normalized.append({
-            "id": ev.get("id"),
-            "title": ev.get("summary") or "(No title)",
-            "start": start_dt,       # ISO string
-            "end": end_dt,           # ISO string
-            "htmlLink": ev.get("htmlLink"),
-            "isAllDay": "date" in start,
-          # you can add more fields as needed
-        })
-    return normalized
+    try:
+        start = _parse_iso(time_min) if time_min else now.replace(hour=0, minute=0, second=0, microsecond=0)
+        end = _parse_iso(time_max) if time_max else now + timedelta(days=31)
+    except ValueError:
+        raise HTTPException(422, "time_min/time_max must be ISO 8601 timestamps")
+
+    # serve from the local mirror; only a small syncToken delta goes to Google,
+    # and only when the mirror is older than GOOGLE_MIRROR_STALE_SECONDS
+    try:
+        await refresh_if_stale(db, user, access_token)
+        await ensure_channel(db, user, access_token)
+    except Exception:
+        # a Google hiccup should not blank the calendar: fall back to the last
+        # mirror, on a clean transaction (a failed statement aborts it on Postgres)
+        logger.warning("Google Calendar mirror refresh failed", exc_info=True)
+        await db.rollback()
+
+    return _json_list(await read_mirror(db, current.user_id, start, end), response)
+
+
+# receives Calendar push notifications (events.watch channels)
+@app.post("/api/google/notifications", status_code=204)
+async def google_notification(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_session),
+):
+    channel_id = request.headers.get("X-Goog-Channel-ID")
+    if not channel_id:
+        raise HTTPException(400, "Missing X-Goog-Channel-ID")
+
+    channel = await verify_notification(
+        db,
+        channel_id,
+        request.headers.get("X-Goog-Resource-ID"),
+        request.headers.get("X-Goog-Channel-Token"),
+    )
+    if channel is None:
+        raise HTTPException(403, "Unknown channel")
+
+    # "sync" is the handshake sent right after the channel is created
+    if request.headers.get("X-Goog-Resource-State") != "sync":
+        background_tasks.add_task(notification_syncer.resync, channel.user_id)
+    return Response(status_code=204)
+
+
+def _parse_iso(value: str) -> datetime:
+    return _as_aware(datetime.fromisoformat(value.replace("Z", "+00:00")))
+
+
+def _as_aware(value: datetime) -> datetime:
+    # naive query timestamps are taken as UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
@@ -0,0 +1,51 @@
+"""
+Apply database migrations; run once per deploy, before the app workers start.
+
+Workers no longer touch the schema: at startup they only read the alembic
+revision (one query) and refuse to serve if it is older than
+database.SCHEMA_REVISION. Run from the backend directory:
+
+    python -m migrate            # upgrade to head
+    python -m migrate 0006       # upgrade to a specific revision
+    python -m migrate --check    # exit 1 unless the database is at head
+"""
+import argparse
+import asyncio
+import sys
+
+
+async def _current_revision():
+    from database import dispose_engines, schema_revision
+
+    try:
+        return await schema_revision()
+    finally:
+        await dispose_engines()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("revision", nargs="?", default="head")
+    parser.add_argument(
+        "--check", action="store_true", help="only report whether the database is at head"
+    )
+    args = parser.parse_args()
+
+    from alembic.script import ScriptDirectory
+
+    from database import SCHEMA_REVISION, alembic_config, run_migrations
+
+    head = ScriptDirectory.from_config(alembic_config()).get_current_head()
+    if head != SCHEMA_REVISION:
+        sys.exit(f"database.SCHEMA_REVISION is {SCHEMA_REVISION} but the alembic head is {head}")
+
+    if args.check:
+        current = asyncio.run(_current_revision())
+        print(f"Database at {current or 'no revision'}, head is {head}")
+        sys.exit(0 if current == head else 1)
+
+    run_migrations(args.revision)
+
+
+if __name__ == "__main__":
+    main()
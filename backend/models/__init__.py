@@ -1 +1,9 @@
-from .models import User, Event, EventType
+from .models import (
+    User, Event, EventType, event_bounds, event_active_until,
+    EventSyncJob, SyncJobStatus, SyncOperation,
+    GoogleEvent, GoogleCalendarSyncState, GoogleWatchChannel,
+    Reminder, ReminderKind, ReminderStatus,
+    UserRole, Course, Weekday, OfficeHour, CourseDeadlineSummary,
+    Enrollment, CourseEventDelivery,
+    course_search_text, user_search_text,
+)
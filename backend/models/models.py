@@ -18,11 +18,12 @@ class SQLModelBase(SQLModel):
 Base = declarative_base()
 
 import uuid
-from datetime import datetime, time, timezone
-from typing import List, Optional
+from datetime import datetime, time, timedelta, timezone
+from typing import List, Optional, Tuple
 
 from sqlalchemy import (
-    Column, Integer, String, Enum as SAEnum, ForeignKey, Time, DateTime, Text
+    Column, Integer, String, Enum as SAEnum, ForeignKey, Time, DateTime, Text, Index,
+    UniqueConstraint, JSON, Boolean, PrimaryKeyConstraint, text, false, func, literal_column,
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship, declarative_base
@@ -45,8 +46,87 @@ class EventType(str, enum.Enum):
     office_hours = "office-hours"
     reminder = "reminder"
 
+def event_bounds(event_date: datetime, task_time: time,
+                 duration_minutes: Optional[int]) -> Tuple[datetime, datetime]:
+    """starts_at/ends_at of an event: the UTC day of event_date at task_time."""
+    try:
+        if event_date.tzinfo is not None:
+            event_date = event_date.astimezone(timezone.utc)
+        starts_at = datetime.combine(event_date.date(), task_time, tzinfo=timezone.utc)
+        return starts_at, starts_at + timedelta(minutes=duration_minutes or 60)
+    except OverflowError:
+        raise ValueError("event ends after the last representable date") from None
+
+
+# active_until of an endless series; an ordinary far-future instant (not
+# Postgres 'infinity'), so it round-trips through every driver
+ACTIVE_FOREVER = datetime.max.replace(tzinfo=timezone.utc)
+
+
+def event_active_until(starts_at: datetime, ends_at: datetime, recurrence_rule: Optional[str],
+                       recurrence_until: Optional[datetime]) -> datetime:
+    """
+    The last instant an event can appear on a calendar: ends_at for a single
+    event, the end of the last occurrence for a series.
+    """
+    if not recurrence_rule:
+        return ends_at
+    if recurrence_until is None:
+        return ACTIVE_FOREVER
+    # recurrence_until is the last occurrence's event_date; its UTC day
+    # (see event_bounds) starts at most a day later
+    try:
+        return recurrence_until + timedelta(days=1) + (ends_at - starts_at)
+    except OverflowError:
+        raise ValueError("series ends after the last representable date") from None
+
+
 class Event(SQLModel, table=True):
     __tablename__ = 'events' 
+    __table_args__ = (
+        # month/range views: bounded range scan per user (alembic 0005)
+        Index("ix_events_user_id_event_date", "user_id", "event_date"),
+        # ordered listing / keyset pagination on (starts_at, id) (alembic 0007)
+        Index("ix_events_user_id_starts_at", "user_id", "starts_at"),
+        # overlap queries: user_id = ? AND tstzrange(starts_at, ends_at) && ? (alembic 0007)
+        Index(
+            "ix_events_user_id_period",
+            "user_id",
+            func.tstzrange(text("starts_at"), text("ends_at")),
+            postgresql_using="gist",
+        ).ddl_if(dialect="postgresql"),
+        # recurring series are fetched separately from single events (alembic 0006)
+        Index(
+            "ix_events_user_id_recurring",
+            "user_id",
+            "recurrence_until",
+            postgresql_where=text("recurrence_rule IS NOT NULL"),
+            sqlite_where=text("recurrence_rule IS NOT NULL"),
+        ),
+        # course deadline summaries (alembic 0009)
+        Index(
+            "ix_events_course_id_starts_at",
+            "course_id",
+            "starts_at",
+            postgresql_where=text("course_id IS NOT NULL"),
+            sqlite_where=text("course_id IS NOT NULL"),
+        ),
+        # shared course events read by every enrolled student (alembic 0010)
+        Index(
+            "ix_events_shared_course_id_starts_at",
+            "course_id",
+            "starts_at",
+            postgresql_where=text("is_shared"),
+            sqlite_where=text("is_shared"),
+        ),
+        # reminder planning: upcoming exams across all users (alembic 0008)
+        Index(
+            "ix_events_exam_starts_at",
+            "starts_at",
+            postgresql_where=text("type IN ('exam', 'final')"),
+            sqlite_where=text("type IN ('exam', 'final')"),
+        ),
+    )
 
     id: uuid.UUID = Field(
         default_factory=uuid.uuid4,
@@ -55,6 +135,18 @@ class Event(SQLModel, table=True):
 
     # Link to the user who created/owns the event
     user_id: uuid.UUID = Field(foreign_key="users.user_id", nullable=False)
+    # set when the event belongs to a course (its exams, assignments, ...)
+    course_id: Optional[uuid.UUID] = Field(
+        default=None,
+        sa_column=Column(
+            UUID(as_uuid=True), ForeignKey("courses.id", ondelete="SET NULL"), nullable=True
+        ),
+    )
+    # posted by course staff for everyone enrolled in course_id: one row is
+    # read by all of them and fanned out to their Google calendars
+    is_shared: bool = Field(
+        default=False, sa_column=Column(Boolean, nullable=False, default=False, server_default=false())
+    )
 
     # Event details
     title: str = Field(sa_column=Column(String, nullable=False))
@@ -69,21 +161,63 @@ class Event(SQLModel, table=True):
     event_date: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
     task_time: time = Field(sa_column=Column(Time, nullable=False))
     duration_minutes: Optional[int] = Field(default=60)
+    # event_date + task_time + duration as real instants (see event_bounds);
+    # every range/overlap filter uses these instead of recombining in Python
+    starts_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+    ends_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+
+    # Recurrence: a row with a rule is a series whose occurrences are generated
+    # on read (services/recurrence.py); event_date is the first occurrence
+    recurrence_rule: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+    # skipped occurrence dates, ISO "YYYY-MM-DD"
+    exdates: Optional[List[str]] = Field(default=None, sa_column=Column(JSON, nullable=True))
+    # event_date of the last occurrence; NULL for single events and endless series
+    recurrence_until: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+    # see event_active_until; ACTIVE_FOREVER for endless series. On Postgres
+    # this is the range partition key (one partition per semester, alembic
+    # 0011, maintained by services/partitions.py), and window queries filter
+    # on active_until > start so semesters that ended earlier are skipped.
+    # The primary key there is (id, active_until); the mapper keeps id alone.
+    active_until: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
 
     # Google Calendar integration
     google_event_id: Optional[str] = Field(default=None)
     is_synced: bool = Field(default=False)
 
     # Timestamps
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
+    updated_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
 
     # Relations
     user: "User" = Relationship(back_populates="events")   
 
 
+class UserRole(str, enum.Enum):
+    student = "student"
+    ta = "ta"
+    ra = "ra"
+    lab_instructor = "lab_instructor"
+    teacher = "teacher"
+
+
 class User(SQLModel, table=True):
     __tablename__ = "users"
+    __table_args__ = (
+        # people search: trigram match on email / name (alembic 0009)
+        Index(
+            "ix_users_search_trgm",
+            text("lower(email || ' ' || coalesce(name, '')) gin_trgm_ops"),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
     user_id: uuid.UUID = Field(
         default_factory=uuid.uuid4,
         sa_column=Column(UUID(as_uuid=True), primary_key=True, nullable=False),
@@ -91,16 +225,444 @@ class User(SQLModel, table=True):
     email: str = Field(index=True, nullable=False, unique=True)
     name: Optional[str] = Field(default=None)
     picture: Optional[str] = Field(default=None)
+    # TAs, RAs, lab instructors and teachers can manage courses and office hours
+    role: UserRole = Field(
+        default=UserRole.student,
+        sa_column=Column(
+            SAEnum(UserRole, values_callable=lambda obj: [e.value for e in obj]),
+            nullable=False,
+            default=UserRole.student,
+            server_default=UserRole.student.value,
+            index=True,
+        ),
+    )
     
     # Google Calendar integration
     google_id: Optional[str] = Field(default=None, index=True)
     calendar_id: Optional[str] = Field(default=None)  # Primary calendar ID
     google_access_token: Optional[str] = Field(default=None, sa_column=Column(Text))
     google_refresh_token: Optional[str] = Field(default=None, sa_column=Column(Text))
-    token_expiry: Optional[datetime] = Field(default=None)
+    token_expiry: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
     
     # Timestamps
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
+    updated_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
 
     events: List["Event"] = Relationship(back_populates="user")   
+
+
+class SyncOperation(str, enum.Enum):
+    insert = "insert"
+    update = "update"
+    delete = "delete"
+
+
+class SyncJobStatus(str, enum.Enum):
+    pending = "pending"
+    in_progress = "in-progress"
+    done = "done"
+    failed = "failed"
+
+
+class EventSyncJob(SQLModel, table=True):
+    """Outbox row: a pending push of one local `Event` change to Google Calendar."""
+    __tablename__ = "event_sync_jobs"
+    __table_args__ = (
+        # the worker polls "pending and due" jobs in next_attempt_at order
+        Index("ix_event_sync_jobs_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id: uuid.UUID = Field(
+        default_factory=uuid.uuid4,
+        sa_column=Column(UUID(as_uuid=True), primary_key=True, nullable=False),
+    )
+    # no foreign key: events is partitioned on Postgres, so events.id alone is
+    # not unique there (alembic 0011); the worker treats a missing event as deleted
+    event_id: Optional[uuid.UUID] = Field(
+        default=None, sa_column=Column(UUID(as_uuid=True), nullable=True)
+    )
+    user_id: uuid.UUID = Field(foreign_key="users.user_id", nullable=False, index=True)
+    operation: SyncOperation = Field(
+        sa_column=Column(
+            SAEnum(SyncOperation, values_callable=lambda obj: [e.value for e in obj]),
+            nullable=False,
+        )
+    )
+    # kept on the job so deletes still work after the local row is gone
+    google_event_id: Optional[str] = Field(default=None)
+
+    status: SyncJobStatus = Field(
+        default=SyncJobStatus.pending,
+        sa_column=Column(
+            SAEnum(SyncJobStatus, values_callable=lambda obj: [e.value for e in obj]),
+            nullable=False,
+            default=SyncJobStatus.pending,
+        ),
+    )
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
+    locked_until: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+    last_error: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
+    updated_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
+
+
+class GoogleEvent(SQLModel, table=True):
+    """Local mirror of one event in a user's Google calendar."""
+    __tablename__ = "google_events"
+    __table_args__ = (
+        UniqueConstraint("user_id", "google_event_id", name="uq_google_events_user_event"),
+        Index("ix_google_events_user_starts_at", "user_id", "starts_at"),
+    )
+
+    id: uuid.UUID = Field(
+        default_factory=uuid.uuid4,
+        sa_column=Column(UUID(as_uuid=True), primary_key=True, nullable=False),
+    )
+    user_id: uuid.UUID = Field(foreign_key="users.user_id", nullable=False)
+    google_event_id: str = Field(nullable=False)
+
+    title: str = Field(sa_column=Column(String, nullable=False))
+    # ISO strings exactly as Google sent them ('date' for all-day events)
+    start: str = Field(sa_column=Column(String, nullable=False))
+    end: str = Field(sa_column=Column(String, nullable=False))
+    # parsed bounds used for range queries
+    starts_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+    ends_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+    is_all_day: bool = Field(default=False)
+    html_link: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+
+    updated_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
+
+
+class GoogleCalendarSyncState(SQLModel, table=True):
+    """Per-user incremental sync cursor for the google_events mirror."""
+    __tablename__ = "google_calendar_sync_state"
+
+    user_id: uuid.UUID = Field(
+        sa_column=Column(
+            UUID(as_uuid=True), ForeignKey("users.user_id"), primary_key=True, nullable=False
+        ),
+    )
+    calendar_id: str = Field(nullable=False)
+    sync_token: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+    last_synced_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+    # set while a push channel is open, so reads can skip staleness checks
+    watch_expires_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+
+
+class GoogleWatchChannel(SQLModel, table=True):
+    """An open Calendar `events.watch` push channel for one user."""
+    __tablename__ = "google_watch_channels"
+
+    # channel id we chose when registering; Google echoes it in X-Goog-Channel-ID
+    id: str = Field(sa_column=Column(String, primary_key=True, nullable=False))
+    user_id: uuid.UUID = Field(foreign_key="users.user_id", nullable=False, index=True)
+    calendar_id: str = Field(nullable=False)
+    resource_id: str = Field(nullable=False)
+    # shared secret echoed back in X-Goog-Channel-Token
+    token: str = Field(nullable=False)
+    expiration: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False, index=True)
+    )
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
+
+
+class ReminderKind(str, enum.Enum):
+    digest = "digest"  # daily summary email
+    event = "event"    # early alert for one exam/final
+
+
+class ReminderStatus(str, enum.Enum):
+    pending = "pending"
+    sending = "sending"
+    sent = "sent"
+    skipped = "skipped"  # nothing to report
+    failed = "failed"
+
+
+class Reminder(SQLModel, table=True):
+    """
+    One scheduled email. `dedupe_key` is unique, so planning the same digest
+    or alert twice is a no-op, and a row leaves `sending` only once.
+    """
+    __tablename__ = "reminders"
+    __table_args__ = (
+        UniqueConstraint("dedupe_key", name="uq_reminders_dedupe_key"),
+        # the scheduler's per-tick query: pending and due, oldest first
+        Index(
+            "ix_reminders_pending_due_at",
+            "due_at",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+        # stale 'sending' rows left behind by a crashed worker
+        Index("ix_reminders_status_locked_until", "status", "locked_until"),
+    )
+
+    id: uuid.UUID = Field(
+        default_factory=uuid.uuid4,
+        sa_column=Column(UUID(as_uuid=True), primary_key=True, nullable=False),
+    )
+    user_id: uuid.UUID = Field(foreign_key="users.user_id", nullable=False, index=True)
+    kind: ReminderKind = Field(
+        sa_column=Column(
+            SAEnum(ReminderKind, values_callable=lambda obj: [e.value for e in obj]),
+            nullable=False,
+        )
+    )
+    # no foreign key (events is partitioned, alembic 0011): an exam alert whose
+    # event is gone renders nothing and is skipped
+    event_id: Optional[uuid.UUID] = Field(
+        default=None, sa_column=Column(UUID(as_uuid=True), nullable=True)
+    )
+    dedupe_key: str = Field(sa_column=Column(String, nullable=False))
+    due_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+
+    status: ReminderStatus = Field(
+        default=ReminderStatus.pending,
+        sa_column=Column(
+            SAEnum(ReminderStatus, values_callable=lambda obj: [e.value for e in obj]),
+            nullable=False,
+            default=ReminderStatus.pending,
+        ),
+    )
+    attempts: int = Field(default=0)
+    locked_until: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+    sent_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+    provider_message_id: Optional[str] = Field(default=None)
+    last_error: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
+    updated_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
+
+
+def user_search_text():
+    # the expressions behind the trigram indexes; queries must use exactly these
+    return literal_column("lower(users.email || ' ' || coalesce(users.name, ''))", String)
+
+
+def course_search_text():
+    return literal_column("lower(courses.code || ' ' || courses.name)", String)
+
+
+class Course(SQLModel, table=True):
+    __tablename__ = "courses"
+    __table_args__ = (
+        UniqueConstraint("code", "semester", name="uq_courses_code_semester"),
+        # exact lookups ("CSE115"), case-insensitive
+        Index("ix_courses_lower_code", func.lower(text("code"))),
+        # autocomplete / search: prefix and fuzzy match on code + name (alembic 0009)
+        Index(
+            "ix_courses_search_trgm",
+            text("lower(code || ' ' || name) gin_trgm_ops"),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
+
+    id: uuid.UUID = Field(
+        default_factory=uuid.uuid4,
+        sa_column=Column(UUID(as_uuid=True), primary_key=True, nullable=False),
+    )
+    code: str = Field(sa_column=Column(String, nullable=False))  # e.g. CSE115
+    name: str = Field(sa_column=Column(String, nullable=False))
+    semester: str = Field(sa_column=Column(String, nullable=False))  # e.g. Spring 2025
+    instructor_id: Optional[uuid.UUID] = Field(
+        default=None, foreign_key="users.user_id", nullable=True, index=True
+    )
+
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
+    updated_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
+
+
+class Weekday(str, enum.Enum):
+    mon = "mon"
+    tue = "tue"
+    wed = "wed"
+    thu = "thu"
+    fri = "fri"
+    sat = "sat"
+    sun = "sun"
+
+
+class OfficeHour(SQLModel, table=True):
+    __tablename__ = "office_hours"
+
+    id: uuid.UUID = Field(
+        default_factory=uuid.uuid4,
+        sa_column=Column(UUID(as_uuid=True), primary_key=True, nullable=False),
+    )
+    # the TA / instructor holding the hour
+    user_id: uuid.UUID = Field(foreign_key="users.user_id", nullable=False, index=True)
+    course_id: Optional[uuid.UUID] = Field(
+        default=None,
+        sa_column=Column(
+            UUID(as_uuid=True), ForeignKey("courses.id", ondelete="CASCADE"),
+            nullable=True, index=True,
+        ),
+    )
+    day: Weekday = Field(
+        sa_column=Column(
+            SAEnum(Weekday, values_callable=lambda obj: [e.value for e in obj]),
+            nullable=False,
+        )
+    )
+    start_time: time = Field(sa_column=Column(Time, nullable=False))
+    end_time: time = Field(sa_column=Column(Time, nullable=False))
+    room: Optional[str] = Field(default=None)
+
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
+
+
+class CourseDeadlineSummary(SQLModel, table=True):
+    """
+    Upcoming deadlines of a course, deduplicated across students' copies.
+
+    Rebuilt by services/course_summaries.py when course events are written
+    and periodically, so course pages never scan events.
+    """
+    __tablename__ = "course_deadline_summaries"
+
+    course_id: uuid.UUID = Field(
+        sa_column=Column(
+            UUID(as_uuid=True), ForeignKey("courses.id", ondelete="CASCADE"), primary_key=True
+        ),
+    )
+    # [{"title", "type", "starts_at"}], soonest first
+    deadlines: List[dict] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+    next_deadline_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+    next_exam_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+    refreshed_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False)
+    )
+
+
+class Enrollment(SQLModel, table=True):
+    """A student subscribed to a course's shared events."""
+    __tablename__ = "enrollments"
+    __table_args__ = (
+        PrimaryKeyConstraint("course_id", "user_id"),
+        # "my courses", resolved on every events read
+        Index("ix_enrollments_user_id", "user_id"),
+    )
+
+    course_id: uuid.UUID = Field(
+        sa_column=Column(UUID(as_uuid=True), ForeignKey("courses.id", ondelete="CASCADE"), nullable=False),
+    )
+    user_id: uuid.UUID = Field(
+        sa_column=Column(UUID(as_uuid=True), ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False),
+    )
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
+
+
+class CourseEventDelivery(SQLModel, table=True):
+    """
+    The copy of one shared event in one subscriber's Google calendar.
+
+    `operation` is what still has to happen to that copy (insert and update
+    both mean "make it match the event"; the worker PATCHes when a copy
+    exists). Edits and cancellations re-queue every row of the event in a
+    single UPDATE, and services/course_fanout.py drains them. No foreign key to events: a
+    cancelled event's rows must outlive it until the copies are deleted.
+    """
+    __tablename__ = "course_event_deliveries"
+    __table_args__ = (
+        PrimaryKeyConstraint("event_id", "user_id"),
+        # the worker's poll: due rows in next_attempt_at order
+        Index("ix_course_event_deliveries_status_next_attempt", "status", "next_attempt_at"),
+        # re-queueing on unenroll
+        Index("ix_course_event_deliveries_user_id", "user_id"),
+    )
+
+    event_id: uuid.UUID = Field(sa_column=Column(UUID(as_uuid=True), nullable=False))
+    user_id: uuid.UUID = Field(
+        sa_column=Column(UUID(as_uuid=True), ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False),
+    )
+    operation: SyncOperation = Field(
+        sa_column=Column(
+            SAEnum(SyncOperation, values_callable=lambda obj: [e.value for e in obj]),
+            nullable=False,
+        )
+    )
+    google_event_id: Optional[str] = Field(default=None)
+
+    status: SyncJobStatus = Field(
+        default=SyncJobStatus.pending,
+        sa_column=Column(
+            SAEnum(SyncJobStatus, values_callable=lambda obj: [e.value for e in obj]),
+            nullable=False,
+            default=SyncJobStatus.pending,
+        ),
+    )
+    attempts: int = Field(default=0)
+    # bumped on every re-queue; a worker that claimed an older revision
+    # leaves the row pending instead of marking it done
+    revision: int = Field(default=0)
+    next_attempt_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
+    locked_until: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+    last_error: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+    updated_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
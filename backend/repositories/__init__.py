@@ -0,0 +1,3 @@
+from .courses import CourseDetail, CourseRepository
+from .events import EventRepository
+from .users import UserRepository
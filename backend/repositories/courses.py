@@ -0,0 +1,182 @@
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.models import (
+    Course, CourseDeadlineSummary, Enrollment, Event, OfficeHour, SyncOperation, User,
+    course_search_text,
+)
+from repositories.search import escape_like, similarity, trigram_match
+from services.course_fanout import queue_deliveries, requeue_user
+from services.event_cache import event_versions
+
+
+@dataclass
+class CourseDetail:
+    course: Course
+    instructor: Optional[User]
+    summary: Optional[CourseDeadlineSummary]
+    office_hours: List[Tuple[OfficeHour, User]] = field(default_factory=list)
+
+
+class CourseRepository:
+    """Async data access for `courses`, `office_hours` and their summaries."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create(self, course: Course) -> Course:
+        self.db.add(course)
+        await self.db.commit()
+        return course
+
+    async def add_office_hour(self, office_hour: OfficeHour) -> OfficeHour:
+        self.db.add(office_hour)
+        await self.db.commit()
+        return office_hour
+
+    async def get(self, course_id: uuid.UUID) -> Optional[Course]:
+        return await self.db.get(Course, course_id)
+
+    async def enroll(self, course_id: uuid.UUID, user: User) -> bool:
+        """
+        Subscribe `user` to the course's shared events; their upcoming ones are
+        queued for the user's Google calendar. False if already enrolled.
+        """
+        if await self.db.get(Enrollment, (course_id, user.user_id)):
+            return False
+        self.db.add(Enrollment(course_id=course_id, user_id=user.user_id))
+        if user.google_access_token or user.google_refresh_token:
+            now = datetime.now(timezone.utc)
+            upcoming = (
+                await self.db.exec(
+                    select(Event.id).where(
+                        Event.course_id == course_id,
+                        Event.is_shared,
+                        Event.user_id != user.user_id,
+                        Event.active_until > now,
+                        or_(
+                            and_(Event.recurrence_rule.is_(None), Event.ends_at > now),
+                            and_(Event.recurrence_rule.is_not(None),
+                                 or_(Event.recurrence_until.is_(None), Event.recurrence_until >= now)),
+                        ),
+                    )
+                )
+            ).all()
+            await queue_deliveries(self.db, ((event_id, user.user_id) for event_id in upcoming))
+        await self.db.commit()
+        await event_versions.bump(user.user_id)
+        return True
+
+    async def unenroll(self, course_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+        """Unsubscribe; copies already in the user's Google calendar are queued for deletion."""
+        enrollment = await self.db.get(Enrollment, (course_id, user_id))
+        if enrollment is None:
+            return False
+        await self.db.delete(enrollment)
+        shared = (
+            await self.db.exec(select(Event.id).where(Event.course_id == course_id, Event.is_shared))
+        ).all()
+        await requeue_user(self.db, user_id, shared, SyncOperation.delete)
+        await self.db.commit()
+        await event_versions.bump(user_id)
+        return True
+
+    async def enrolled_courses(self, user_id: uuid.UUID) -> List[Course]:
+        rows = await self.db.exec(
+            select(Course)
+            .join(Enrollment, Enrollment.course_id == Course.id)
+            .where(Enrollment.user_id == user_id)
+            .order_by(Course.code)
+        )
+        return list(rows.all())
+
+    async def existing_ids(self, course_ids: Sequence[uuid.UUID]) -> set:
+        if not course_ids:
+            return set()
+        return set((await self.db.exec(select(Course.id).where(Course.id.in_(course_ids)))).all())
+
+    async def by_code(self, code: str) -> List[CourseDetail]:
+        """
+        Every section/semester of `code` with its instructor, summary and
+        office hours, in one query: the course's own hours plus its
+        instructor's general ones.
+        """
+        instructor = aliased(User)
+        holder = aliased(User)
+        rows = (
+            await self.db.exec(
+                select(Course, instructor, CourseDeadlineSummary, OfficeHour, holder)
+                .outerjoin(instructor, instructor.user_id == Course.instructor_id)
+                .outerjoin(CourseDeadlineSummary, CourseDeadlineSummary.course_id == Course.id)
+                .outerjoin(
+                    OfficeHour,
+                    or_(
+                        OfficeHour.course_id == Course.id,
+                        and_(
+                            OfficeHour.user_id == Course.instructor_id,
+                            OfficeHour.course_id.is_(None),
+                        ),
+                    ),
+                )
+                .outerjoin(holder, holder.user_id == OfficeHour.user_id)
+                .where(func.lower(Course.code) == code.lower())
+                .order_by(Course.created_at.desc(), OfficeHour.day, OfficeHour.start_time)
+            )
+        ).all()
+
+        details = {}
+        for course, teacher, summary, office_hour, person in rows:
+            detail = details.get(course.id)
+            if detail is None:
+                detail = details[course.id] = CourseDetail(course, teacher, summary)
+            if office_hour is not None:
+                detail.office_hours.append((office_hour, person))
+        return list(details.values())
+
+    async def autocomplete(self, prefix: str, limit: int = 10) -> List[Course]:
+        """Courses whose code or a word of their name starts with `prefix`."""
+        term = escape_like(prefix.strip().lower())
+        search = course_search_text()
+        starts = search.like(f"{term}%", escape="\\")
+        rows = await self.db.exec(
+            select(Course)
+            .where(or_(starts, search.like(f"% {term}%", escape="\\")))
+            # code matches first, then the shortest (closest) codes
+            .order_by(case((starts, 0), else_=1), func.length(Course.code), Course.code,
+                      Course.created_at.desc())
+            .limit(limit)
+        )
+        return list(rows.all())
+
+    async def search(self, query: str, limit: int = 20) -> List[Tuple[Course, Optional[CourseDeadlineSummary]]]:
+        """Substring and (on Postgres) fuzzy matches on code + name, best first."""
+        term = query.strip().lower()
+        search = course_search_text()
+        rows = await self.db.exec(
+            select(Course, CourseDeadlineSummary)
+            .outerjoin(CourseDeadlineSummary, CourseDeadlineSummary.course_id == Course.id)
+            .where(or_(
+                search.like(f"%{escape_like(term)}%", escape="\\"),
+                trigram_match(search, term),
+            ))
+            .order_by(similarity(search, term).desc(), Course.code, Course.created_at.desc())
+            .limit(limit)
+        )
+        return list(rows.all())
+
+    async def office_hours_for(self, user_ids: Sequence[uuid.UUID]) -> List[OfficeHour]:
+        if not user_ids:
+            return []
+        rows = await self.db.exec(
+            select(OfficeHour)
+            .where(OfficeHour.user_id.in_(user_ids))
+            .order_by(OfficeHour.day, OfficeHour.start_time)
+        )
+        return list(rows.all())
@@ -0,0 +1,317 @@
+import heapq
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import Boolean, DateTime, and_, insert, literal, null, or_, true, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.elements import Null
+from sqlalchemy.sql.expression import FunctionElement
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.models import (
+    Enrollment, Event, EventSyncJob, EventType, SyncOperation, event_active_until, event_bounds,
+)
+from services.course_fanout import queue_course_event, requeue_event
+from services.course_summaries import refresh_course_summaries
+from services.event_cache import event_versions
+from services.recurrence import Occurrence, as_utc, expand, sort_key
+
+# (starts_at, id) of the last row on the previous page
+EventCursor = Tuple[datetime, uuid.UUID]
+# an occurrence can end this long after its series' recurrence_until
+SERIES_SLACK = timedelta(days=2)
+
+
+class _PeriodOverlaps(FunctionElement):
+    type = Boolean()
+    inherit_cache = True
+    name = "period_overlaps"
+
+
+@compiles(_PeriodOverlaps)
+def _compile_period_overlaps(element, compiler, **kw):
+    starts, ends, lo, hi = element.clauses
+    clauses = []
+    if not isinstance(hi, Null):
+        clauses.append(starts < hi)
+    if not isinstance(lo, Null):
+        clauses.append(ends > lo)
+    return f"({compiler.process(and_(true(), *clauses), **kw)})"
+
+
+@compiles(_PeriodOverlaps, "postgresql")
+def _compile_period_overlaps_pg(element, compiler, **kw):
+    starts, ends, lo, hi = (compiler.process(c, **kw) for c in element.clauses)
+    return f"(tstzrange({starts}, {ends}) && tstzrange({lo}, {hi}))"
+
+
+def _instant(value: Optional[datetime]):
+    return null() if value is None else literal(value, DateTime(timezone=True))
+
+
+def period_overlaps(starts, ends, lo: Optional[datetime], hi: Optional[datetime]):
+    """
+    [starts, ends) overlaps [lo, hi); a missing lo/hi leaves that side open.
+
+    On Postgres this renders as tstzrange(starts, ends) && tstzrange(lo, hi),
+    which the GiST index ix_events_user_id_period answers; elsewhere it is
+    the plain comparison.
+    """
+    return _PeriodOverlaps(starts, ends, _instant(lo), _instant(hi))
+
+
+def _visible_to(user_id: uuid.UUID, course_ids: Sequence[uuid.UUID]):
+    # the user's own rows plus the shared events of the courses they are in
+    if not course_ids:
+        return Event.user_id == user_id
+    return or_(Event.user_id == user_id, and_(Event.is_shared, Event.course_id.in_(course_ids)))
+
+
+def _active_after(start: datetime):
+    # implied by the overlap filters, but spelled on the partition key so
+    # Postgres prunes every semester that was over before `start`
+    return Event.active_until > start
+
+
+class EventRepository:
+    """Async data access for `events` and the sync jobs queued alongside them."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create(self, event: Event, push_to_google: bool = False) -> Event:
+        """Insert one event; the Google push is queued in the same transaction."""
+        self.db.add(event)
+        if push_to_google:
+            self.db.add(EventSyncJob(
+                event_id=event.id,
+                user_id=event.user_id,
+                operation=SyncOperation.insert,
+            ))
+        if event.is_shared:
+            # subscribers' Google copies, pushed by services/course_fanout.py
+            await queue_course_event(self.db, event)
+        await self.db.commit()
+        # invalidates cached listings / ETags of GET /api/events
+        await self._bump_readers(event)
+        if event.course_id:
+            await refresh_course_summaries(self.db, [event.course_id])
+        return event
+
+    async def update_shared(self, event: Event, fields: Dict[str, Any]) -> Event:
+        """
+        Apply `fields` to a shared event and re-queue every subscriber's copy
+        (and the poster's own, if it was pushed).
+        """
+        for name, value in fields.items():
+            setattr(event, name, value)
+        event.starts_at, event.ends_at = event_bounds(
+            event.event_date, event.task_time, event.duration_minutes
+        )
+        # may move the row to another partition on Postgres
+        event.active_until = event_active_until(
+            event.starts_at, event.ends_at, event.recurrence_rule, event.recurrence_until
+        )
+        event.updated_at = datetime.now(timezone.utc)
+        if event.google_event_id:
+            self.db.add(EventSyncJob(
+                event_id=event.id, user_id=event.user_id, operation=SyncOperation.update,
+            ))
+        await requeue_event(self.db, event.id, SyncOperation.update)
+        await self.db.commit()
+        await self._bump_readers(event)
+        await refresh_course_summaries(self.db, [event.course_id])
+        return event
+
+    async def cancel_shared(self, event: Event) -> None:
+        """Delete a shared event; subscribers' copies are deleted by the fan-out."""
+        readers = await self._readers(event)
+        course_id = event.course_id
+        if event.google_event_id:
+            self.db.add(EventSyncJob(
+                event_id=None, user_id=event.user_id, operation=SyncOperation.delete,
+                google_event_id=event.google_event_id,
+            ))
+        await requeue_event(self.db, event.id, SyncOperation.delete)
+        await self.db.delete(event)
+        await self.db.commit()
+        await event_versions.bump_many(readers)
+        await refresh_course_summaries(self.db, [course_id])
+
+    async def _readers(self, event: Event) -> List[uuid.UUID]:
+        readers = [event.user_id]
+        if event.is_shared:
+            readers += (
+                await self.db.exec(
+                    select(Enrollment.user_id).where(Enrollment.course_id == event.course_id)
+                )
+            ).all()
+        return readers
+
+    async def _bump_readers(self, event: Event) -> None:
+        await event_versions.bump_many(await self._readers(event))
+
+    async def enrolled_course_ids(self, user_id: uuid.UUID) -> List[uuid.UUID]:
+        return list(
+            (await self.db.exec(select(Enrollment.course_id).where(Enrollment.user_id == user_id))).all()
+        )
+
+    async def create_many(
+        self, rows: List[Dict[str, Any]], push_to_google: List[bool]
+    ) -> Tuple[List[Event], int]:
+        """
+        Insert `rows` with a single multi-row INSERT ... RETURNING and queue a
+        sync job for every row whose `push_to_google` flag is set.
+
+        Returns the created events (in input order) and the number of jobs queued.
+        """
+        created = (
+            await self.db.scalars(
+                insert(Event).returning(Event, sort_by_parameter_order=True), rows
+            )
+        ).all()
+
+        jobs = [
+            EventSyncJob(
+                event_id=row["id"],
+                user_id=row["user_id"],
+                operation=SyncOperation.insert,
+            ).model_dump()
+            for row, push in zip(rows, push_to_google)
+            if push
+        ]
+        if jobs:
+            # the worker pushes these to Google as multipart batches of up to 50
+            await self.db.execute(insert(EventSyncJob), jobs)
+        await self.db.commit()
+        for user_id in {row["user_id"] for row in rows}:
+            await event_versions.bump(user_id)
+        course_ids = {row["course_id"] for row in rows if row.get("course_id")}
+        if course_ids:
+            await refresh_course_summaries(self.db, list(course_ids))
+        return created, len(jobs)
+
+    async def list_for_user(
+        self,
+        user_id: uuid.UUID,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        type: Optional[EventType] = None,
+        after: Optional[EventCursor] = None,
+        limit: int = 500,
+    ) -> List[Union[Event, Occurrence]]:
+        """
+        The user's events overlapping [start, end), ordered by (starts_at, id),
+        at most `limit` rows.
+
+        Single events come straight from the index; recurring series
+        overlapping the window are expanded in memory and merged in, so
+        occurrences are never stored. Shared events of the user's courses are
+        read from their one source row.
+        """
+        visible = _visible_to(user_id, await self.enrolled_course_ids(user_id))
+        singles = select(Event).where(visible, Event.recurrence_rule.is_(None))
+        if start or end:
+            singles = singles.where(period_overlaps(Event.starts_at, Event.ends_at, start, end))
+        if start:
+            singles = singles.where(_active_after(start))
+        if type:
+            singles = singles.where(Event.type == type)
+        if after:
+            # keyset pagination: continue strictly after the last row already sent
+            singles = singles.where(tuple_(Event.starts_at, Event.id) > tuple_(*after))
+        single_rows = (
+            await self.db.exec(singles.order_by(Event.starts_at, Event.id).limit(limit))
+        ).all()
+
+        # occurrences starting after the cursor all end after it as well
+        lower = max(filter(None, [start, after[0] if after else None]), key=as_utc, default=None)
+        series_rows = await self._series(
+            visible, lower, end, Event.type == type if type else None
+        )
+        if not series_rows:
+            return list(single_rows)
+
+        occurrences = expand(series_rows, lower, end)
+        if after:
+            after_key = (as_utc(after[0]), after[1])
+            occurrences = (o for o in occurrences if sort_key(o) > after_key)
+        return list(islice(heapq.merge(single_rows, occurrences, key=sort_key), limit))
+
+    async def stream_for_user(self, user_id: uuid.UUID,
+                              batch_size: int = 500) -> AsyncIterator[Event]:
+        """
+        Every event row of the user (series as stored, not expanded), read
+        through a server-side cursor `batch_size` rows at a time.
+        """
+        rows = await self.db.stream_scalars(
+            select(Event)
+            .where(_visible_to(user_id, await self.enrolled_course_ids(user_id)))
+            .order_by(Event.starts_at, Event.id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for event in rows:
+            yield event
+
+    async def in_window(
+        self, user_ids: Sequence[uuid.UUID], start: datetime, end: datetime
+    ) -> List[Union[Event, Occurrence]]:
+        """
+        Every event and occurrence of `user_ids` overlapping [start, end), owned
+        ones only; see shared_in_window for their courses' shared events.
+        """
+        return await self._window(Event.user_id.in_(user_ids), start, end)
+
+    async def shared_in_window(
+        self, user_ids: Sequence[uuid.UUID], start: datetime, end: datetime
+    ) -> List[Tuple[uuid.UUID, Union[Event, Occurrence]]]:
+        """(reader, event) for the shared events of `user_ids`' courses in [start, end)."""
+        readers: Dict[uuid.UUID, List[uuid.UUID]] = defaultdict(list)
+        enrollments = await self.db.exec(
+            select(Enrollment.course_id, Enrollment.user_id).where(Enrollment.user_id.in_(user_ids))
+        )
+        for course_id, user_id in enrollments.all():
+            readers[course_id].append(user_id)
+        if not readers:
+            return []
+        shared = and_(Event.is_shared, Event.course_id.in_(list(readers)))
+        return [
+            (user_id, event)
+            for event in await self._window(shared, start, end)
+            # the poster already has the row as their own
+            for user_id in readers[event.course_id] if user_id != event.user_id
+        ]
+
+    async def _window(self, visible, start: datetime,
+                      end: datetime) -> List[Union[Event, Occurrence]]:
+        singles = (
+            await self.db.exec(
+                select(Event).where(
+                    visible,
+                    Event.recurrence_rule.is_(None),
+                    period_overlaps(Event.starts_at, Event.ends_at, start, end),
+                    _active_after(start),
+                )
+            )
+        ).all()
+        series_rows = await self._series(visible, start, end)
+        return list(singles) + list(expand(series_rows, start, end))
+
+    async def _series(self, visible, start: Optional[datetime],
+                      end: Optional[datetime], extra=None) -> List[Event]:
+        query = select(Event).where(visible, Event.recurrence_rule.is_not(None))
+        if start:
+            # recurrence_until is the last occurrence's event_date, not its end
+            query = query.where(or_(
+                Event.recurrence_until.is_(None),
+                Event.recurrence_until >= start - SERIES_SLACK,
+            ), _active_after(start))
+        if end:
+            query = query.where(Event.starts_at < end)
+        if extra is not None:
+            query = query.where(extra)
+        return list((await self.db.exec(query)).all())
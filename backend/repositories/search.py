@@ -0,0 +1,53 @@
+from sqlalchemy import Boolean, Float, literal
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+
+class _TrigramMatch(FunctionElement):
+    type = Boolean()
+    inherit_cache = True
+    name = "trigram_match"
+
+
+@compiles(_TrigramMatch)
+def _compile_trigram_match(element, compiler, **kw):
+    # without pg_trgm there is no fuzzy match; the LIKE filters still apply
+    return "(1 = 0)"
+
+
+@compiles(_TrigramMatch, "postgresql")
+def _compile_trigram_match_pg(element, compiler, **kw):
+    text, query = (compiler.process(c, **kw) for c in element.clauses)
+    return f"({text} % {query})"
+
+
+class _Similarity(FunctionElement):
+    type = Float()
+    inherit_cache = True
+    name = "trigram_similarity"
+
+
+@compiles(_Similarity)
+def _compile_similarity(element, compiler, **kw):
+    # a bare integer in ORDER BY would be read as a column position
+    return "CAST(0 AS REAL)"
+
+
+@compiles(_Similarity, "postgresql")
+def _compile_similarity_pg(element, compiler, **kw):
+    text, query = (compiler.process(c, **kw) for c in element.clauses)
+    return f"similarity({text}, {query})"
+
+
+def trigram_match(text, query: str):
+    """`text % query` (pg_trgm, answered by the GIN trigram indexes); false elsewhere."""
+    return _TrigramMatch(text, literal(query))
+
+
+def similarity(text, query: str):
+    """pg_trgm similarity for ranking; a constant elsewhere."""
+    return _Similarity(text, literal(query))
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
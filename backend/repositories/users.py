@@ -0,0 +1,82 @@
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence
+
+from sqlalchemy import or_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.models import User, UserRole, user_search_text
+from repositories.search import escape_like, similarity, trigram_match
+
+
+class UserRepository:
+    """Async data access for `users`."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get(self, user_id: uuid.UUID) -> Optional[User]:
+        return await self.db.get(User, user_id)
+
+    async def get_by_email(self, email: str) -> Optional[User]:
+        return (await self.db.exec(select(User).where(User.email == email))).first()
+
+    async def get_many_by_email(self, emails: Sequence[str]) -> List[User]:
+        return list((await self.db.exec(select(User).where(User.email.in_(emails)))).all())
+
+    async def search(self, query: Optional[str], role: Optional[UserRole] = None,
+                     limit: int = 20) -> List[User]:
+        """People by email / name (substring, fuzzy on Postgres), optionally of one role."""
+        statement = select(User)
+        if role is not None:
+            statement = statement.where(User.role == role)
+        if query and query.strip():
+            term = query.strip().lower()
+            search = user_search_text()
+            statement = statement.where(or_(
+                search.like(f"%{escape_like(term)}%", escape="\\"),
+                trigram_match(search, term),
+            )).order_by(similarity(search, term).desc(), User.email)
+        else:
+            statement = statement.order_by(User.email)
+        return list((await self.db.exec(statement.limit(limit))).all())
+
+    async def set_role(self, user_id: uuid.UUID, role: UserRole) -> Optional[User]:
+        user = await self.get(user_id)
+        if user is None:
+            return None
+        user.role = role
+        user.updated_at = datetime.now(timezone.utc)
+        await self.db.commit()
+        return user
+
+    async def save_google_login(
+        self,
+        email: str,
+        google_id: Optional[str],
+        access_token: str,
+        refresh_token: Optional[str],
+        token_expiry: Optional[datetime],
+        calendar_id: Optional[str],
+    ) -> User:
+        """Create the user on first login, otherwise store the fresh tokens."""
+        user = await self.get_by_email(email)
+        if user is None:
+            user = User(
+                email=email,
+                google_id=google_id,
+                google_access_token=access_token,
+                google_refresh_token=refresh_token,
+                token_expiry=token_expiry,
+                calendar_id=calendar_id,
+            )
+            self.db.add(user)
+        else:
+            user.google_access_token = access_token
+            if refresh_token:  # Google may not return it every time
+                user.google_refresh_token = refresh_token
+            user.token_expiry = token_expiry
+            user.calendar_id = calendar_id
+        await self.db.commit()
+        return user
@@ -0,0 +1,175 @@
+import json
+import threading
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from cachetools import TTLCache
+from fastapi import Response
+from jose import JWTError, jwt
+
+from config import settings
+from models.models import User
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """Identity of the logged-in user; plain data, safe to cache across requests."""
+    user_id: uuid.UUID
+    email: str
+    name: Optional[str]
+    picture: Optional[str]
+    calendar_id: Optional[str]
+    has_google: bool
+    role: str = "student"
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(
+            user_id=user.user_id,
+            email=user.email,
+            name=user.name,
+            picture=user.picture,
+            calendar_id=user.calendar_id,
+            has_google=bool(user.google_access_token or user.google_refresh_token),
+            role=user.role.value if user.role else "student",
+        )
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        data["user_id"] = str(self.user_id)
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "CurrentUser":
+        data = json.loads(raw)
+        data["user_id"] = uuid.UUID(data["user_id"])
+        return cls(**data)
+
+
+SESSION_COOKIE = "session"
+# HS256 keys shorter than the hash (32 bytes) are guessable offline from one cookie
+MIN_SECRET_LENGTH = 32
+WEAK_SECRETS = {"supersecret", "secret", "changeme"}
+SESSION_TTL = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+
+def secret_problem() -> Optional[str]:
+    """Why JWT_SECRET_KEY cannot sign sessions, or None if it can."""
+    secret = settings.JWT_SECRET
+    if not secret:
+        return "JWT_SECRET_KEY is not set"
+    if secret.lower() in WEAK_SECRETS or len(secret) < MIN_SECRET_LENGTH:
+        return f"JWT_SECRET_KEY must be a random string of at least {MIN_SECRET_LENGTH} characters"
+    return None
+
+
+def create_session_token(user: CurrentUser) -> str:
+    """Signed, self-contained session: verifying it needs no database access."""
+    now = datetime.now(timezone.utc)
+    claims = {
+        "sub": str(user.user_id),
+        "email": user.email,
+        "name": user.name,
+        "picture": user.picture,
+        "cal": user.calendar_id,
+        "g": user.has_google,
+        "role": user.role,
+        "iat": int(now.timestamp()),
+        "exp": int((now + SESSION_TTL).timestamp()),
+    }
+    return jwt.encode(claims, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+
+
+def decode_session_token(token: str) -> Optional[Dict[str, Any]]:
+    """Return the verified claims, or None if the token is forged or expired."""
+    try:
+        return jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+    except JWTError:
+        return None
+
+
+def user_from_claims(claims: Dict[str, Any]) -> CurrentUser:
+    return CurrentUser(
+        user_id=uuid.UUID(claims["sub"]),
+        email=claims["email"],
+        name=claims.get("name"),
+        picture=claims.get("picture"),
+        calendar_id=claims.get("cal"),
+        has_google=bool(claims.get("g")),
+        # sessions issued before roles existed
+        role=claims.get("role", "student"),
+    )
+
+
+def needs_rotation(claims: Dict[str, Any]) -> bool:
+    # re-issue once less than half of the lifetime is left (sliding session)
+    remaining = claims["exp"] - datetime.now(timezone.utc).timestamp()
+    return remaining < SESSION_TTL.total_seconds() / 2
+
+
+def set_session_cookie(response: Response, user: CurrentUser) -> None:
+    response.set_cookie(
+        key=SESSION_COOKIE,
+        value=create_session_token(user),
+        max_age=int(SESSION_TTL.total_seconds()),
+        httponly=True,
+        samesite="lax",  # allow cross-site navigation
+        secure=False     # only use True in production with HTTPS
+    )
+
+
+class InProcessUserCache:
+    """Bounded LRU with TTL, local to this worker process."""
+
+    def __init__(self, maxsize: int, ttl: int):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # TTLCache is not thread-safe and sync endpoints run in a threadpool
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[CurrentUser]:
+        with self._lock:
+            return self._cache.get(key)
+
+    async def set(self, key: str, value: CurrentUser) -> None:
+        with self._lock:
+            self._cache[key] = value
+
+    async def delete(self, key: str) -> None:
+        with self._lock:
+            self._cache.pop(key, None)
+
+
+class RedisUserCache:
+    """Shared cache for multi-worker deployments (needs the `redis` package)."""
+
+    def __init__(self, url: str, ttl: int, prefix: str = "user-session:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("USER_CACHE_BACKEND=redis requires the 'redis' package") from e
+        self._redis = redis.from_url(url)
+        self._ttl = ttl
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Optional[CurrentUser]:
+        raw = await self._redis.get(self._prefix + key)
+        return CurrentUser.from_json(raw) if raw else None
+
+    async def set(self, key: str, value: CurrentUser) -> None:
+        await self._redis.set(self._prefix + key, value.to_json(), ex=self._ttl)
+
+    async def delete(self, key: str) -> None:
+        await self._redis.delete(self._prefix + key)
+
+
+def build_user_cache():
+    if settings.USER_CACHE_BACKEND == "redis":
+        return RedisUserCache(settings.USER_CACHE_REDIS_URL, settings.USER_CACHE_TTL_SECONDS)
+    return InProcessUserCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS)
+
+
+# user id -> CurrentUser, used when a session token is rotated;
+# invalidated by auth_callback on login
+user_cache = build_user_cache()
@@ -0,0 +1,407 @@
+"""
+Fan-out of shared course events to enrolled students' Google calendars.
+
+A shared event is one `events` row (is_shared, course_id) that every
+student enrolled in the course reads; only the Google copies are per
+student. Each copy is tracked by a `course_event_deliveries` row. Posting
+an event queues its rows with one multi-row upsert, and an edit or
+cancellation re-queues them with a single UPDATE, so the cost of a change
+does not grow with round-trips per student.
+
+CourseFanoutWorker claims due rows (FOR UPDATE SKIP LOCKED, with a lease
+so rows of a crashed worker are picked up again) and groups them per
+student. Each student's changes go out as one call or one batch request,
+under the fan-out's own token bucket (COURSE_FANOUT_RATE) so a large
+course cannot take the whole background share of the Google quota. Results are written back with
+executemany UPDATEs. Progress is kept per row, so after a failure or
+restart the worker resumes where it stopped.
+"""
+import asyncio
+import random
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, bindparam, case, literal, or_, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from models.models import (
+    CourseEventDelivery, Enrollment, Event, SyncJobStatus, SyncOperation, User,
+)
+from services.google_calendar import (
+    BatchOperation,
+    GoogleAPIError,
+    GoogleCalendarClient,
+    get_calendar_client,
+    google_event_body,
+)
+from services.google_quota import TokenBucket, background, user_quota
+from services.tokens import token_manager
+
+# a claimed row whose worker died is picked up again after this long
+DELIVERY_LEASE = timedelta(minutes=5)
+MAX_BACKOFF_SECONDS = 3600
+
+_deliveries = CourseEventDelivery.__table__
+
+
+def _backoff(attempts: int) -> timedelta:
+    seconds = min(2 ** attempts, MAX_BACKOFF_SECONDS)
+    return timedelta(seconds=seconds * random.uniform(0.5, 1.0))
+
+
+def has_google():
+    # only students who connected Google get copies
+    return or_(User.google_access_token.is_not(None), User.google_refresh_token.is_not(None))
+
+
+def _upsert(dialect: str):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"course fan-out is not supported on {dialect}")
+    stmt = insert(_deliveries)
+    return stmt.on_conflict_do_update(
+        index_elements=["event_id", "user_id"],
+        set_=_requeued(stmt.excluded.operation, stmt.excluded.next_attempt_at),
+    )
+
+
+def _pending():
+    # typed, so the enum's value ("pending") is bound rather than inferred
+    return literal(SyncJobStatus.pending, _deliveries.c.status.type)
+
+
+def _requeued(operation, now) -> Dict[str, Any]:
+    # a row being pushed right now stays claimed; its worker sees the new
+    # revision when recording and leaves the row pending for another pass
+    return {
+        "operation": operation,
+        "status": case(
+            (_deliveries.c.status == SyncJobStatus.in_progress, _deliveries.c.status),
+            else_=_pending(),
+        ),
+        "revision": _deliveries.c.revision + 1,
+        "attempts": 0,
+        "next_attempt_at": now,
+        "last_error": None,
+        "updated_at": now,
+    }
+
+
+async def queue_deliveries(db: AsyncSession, pairs: Iterable[Tuple[uuid.UUID, uuid.UUID]],
+                           operation: SyncOperation = SyncOperation.insert) -> int:
+    """
+    Queue (event_id, user_id) copies in one statement; an existing row is
+    re-queued with `operation`. The caller commits.
+    """
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            "event_id": event_id,
+            "user_id": user_id,
+            "operation": operation,
+            "status": SyncJobStatus.pending,
+            "attempts": 0,
+            "revision": 0,
+            "next_attempt_at": now,
+            "updated_at": now,
+        }
+        for event_id, user_id in pairs
+    ]
+    if rows:
+        await db.execute(_upsert(db.bind.dialect.name), rows)
+    return len(rows)
+
+
+async def queue_course_event(db: AsyncSession, event: Event) -> int:
+    """Queue copies of a newly shared event for every subscriber with Google. The caller commits."""
+    subscribers = (
+        await db.exec(
+            select(Enrollment.user_id)
+            .join(User, User.user_id == Enrollment.user_id)
+            .where(Enrollment.course_id == event.course_id, Enrollment.user_id != event.user_id,
+                   has_google())
+        )
+    ).all()
+    return await queue_deliveries(db, ((event.id, user_id) for user_id in subscribers))
+
+
+async def requeue_event(db: AsyncSession, event_id: uuid.UUID,
+                        operation: SyncOperation = SyncOperation.update) -> int:
+    """Re-queue every copy of an edited (update) or cancelled (delete) event. The caller commits."""
+    now = datetime.now(timezone.utc)
+    statement = update(_deliveries).where(_deliveries.c.event_id == event_id)
+    if operation != SyncOperation.delete:
+        # copies of students who left the course stay deleted
+        statement = statement.where(_deliveries.c.operation != SyncOperation.delete)
+    result = await db.execute(statement.values(**_requeued(operation, now)))
+    return result.rowcount
+
+
+async def requeue_user(db: AsyncSession, user_id: uuid.UUID, event_ids: Sequence[uuid.UUID],
+                       operation: SyncOperation) -> int:
+    """Re-queue one student's copies, e.g. deletes on leaving a course. The caller commits."""
+    if not event_ids:
+        return 0
+    now = datetime.now(timezone.utc)
+    result = await db.execute(
+        update(_deliveries)
+        .where(_deliveries.c.user_id == user_id, _deliveries.c.event_id.in_(event_ids))
+        .values(**_requeued(operation, now))
+    )
+    return result.rowcount
+
+
+@dataclass
+class _Outcome:
+    row: CourseEventDelivery
+    status: SyncJobStatus
+    google_event_id: Optional[str]
+    attempts: int
+    next_attempt_at: datetime
+    last_error: Optional[str] = None
+
+
+class CourseFanoutWorker:
+    """Drains `course_event_deliveries` into students' Google calendars."""
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        concurrency: int = settings.COURSE_FANOUT_CONCURRENCY,
+        rate: float = settings.COURSE_FANOUT_RATE,
+        batch_size: int = settings.COURSE_FANOUT_BATCH_SIZE,
+        poll_interval: float = settings.COURSE_FANOUT_POLL_SECONDS,
+        max_attempts: int = settings.COURSE_FANOUT_MAX_ATTEMPTS,
+    ):
+        self.engine = engine
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.limiter = TokenBucket(rate)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            with background():
+                self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def notify(self) -> None:
+        """Wake the worker right away instead of waiting for the next poll."""
+        self._wakeup.set()
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                print(f"Course fan-out failed: {e}")
+                claimed = 0
+            if not claimed:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def run_once(self, now: Optional[datetime] = None) -> int:
+        """Claim, push and record one batch of due copies; returns how many were claimed."""
+        now = now or datetime.now(timezone.utc)
+        async with AsyncSession(self.engine, expire_on_commit=False) as db:
+            claimed = await self._claim(db, now)
+            if not claimed:
+                return 0
+            event_ids = list({row.event_id for row in claimed})
+            user_ids = list({row.user_id for row in claimed})
+            events = {
+                e.id: e for e in (await db.exec(select(Event).where(Event.id.in_(event_ids)))).all()
+            }
+            users = {
+                u.user_id: u
+                for u in (await db.exec(select(User).where(User.user_id.in_(user_ids)))).all()
+            }
+
+        per_user: Dict[uuid.UUID, List[CourseEventDelivery]] = defaultdict(list)
+        for row in claimed:
+            per_user[row.user_id].append(row)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def push(user_id: uuid.UUID, rows: List[CourseEventDelivery]) -> List[_Outcome]:
+            async with semaphore:
+                return await self._push(users.get(user_id), rows, events)
+
+        results = await asyncio.gather(*(push(u, rows) for u, rows in per_user.items()))
+        async with AsyncSession(self.engine) as db:
+            await self._record(db, [outcome for outcomes in results for outcome in outcomes])
+        return len(claimed)
+
+    async def _claim(self, db: AsyncSession, now: datetime) -> List[CourseEventDelivery]:
+        rows = (
+            await db.exec(
+                select(CourseEventDelivery)
+                .where(or_(
+                    and_(CourseEventDelivery.status == SyncJobStatus.pending,
+                         CourseEventDelivery.next_attempt_at <= now),
+                    and_(CourseEventDelivery.status == SyncJobStatus.in_progress,
+                         CourseEventDelivery.locked_until < now),
+                ))
+                .order_by(CourseEventDelivery.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+        ).all()
+        for row in rows:
+            row.status = SyncJobStatus.in_progress
+            row.locked_until = now + DELIVERY_LEASE
+            row.updated_at = now
+        await db.commit()
+        return list(rows)
+
+    @staticmethod
+    def _operation(calendar_id: str, row: CourseEventDelivery,
+                   event: Optional[Event]) -> Optional[BatchOperation]:
+        path = GoogleCalendarClient.events_path
+        if row.operation == SyncOperation.delete or event is None:
+            # nothing to delete if the copy was never created
+            if not row.google_event_id:
+                return None
+            return BatchOperation("DELETE", path(calendar_id, row.google_event_id))
+        if row.google_event_id:
+            return BatchOperation(
+                "PATCH", path(calendar_id, row.google_event_id), google_event_body(event)
+            )
+        return BatchOperation("POST", path(calendar_id), google_event_body(event))
+
+    async def _push(self, user: Optional[User], rows: List[CourseEventDelivery],
+                    events: Dict[uuid.UUID, Event]) -> List[_Outcome]:
+        """One student's claimed copies, as a single call or batch request."""
+        outcomes: List[_Outcome] = []
+        pending: List[Tuple[CourseEventDelivery, BatchOperation]] = []
+        calendar_id = (user.calendar_id if user else None) or "primary"
+        for row in rows:
+            operation = self._operation(calendar_id, row, events.get(row.event_id))
+            if operation is None:
+                outcomes.append(self._done(row, None))
+            else:
+                pending.append((row, operation))
+        if not pending:
+            return outcomes
+
+        try:
+            access_token = await token_manager.get_access_token(user) if user else None
+            access_token = access_token or (user.google_access_token if user else None)
+            if not access_token:
+                raise RuntimeError("user has no Google credentials")
+            await self.limiter.acquire(len(pending))
+            with user_quota(user.user_id):
+                results = await get_calendar_client().send(access_token, [op for _, op in pending])
+        except GoogleAPIError as e:
+            if not e.is_rate_limited:
+                return outcomes + [self._failed(row, e) for row, _ in pending]
+            delay = e.retry_after or _backoff(1).total_seconds()
+            self.limiter.pause(delay)
+            return outcomes + [self._deferred(row, e, delay) for row, _ in pending]
+        except Exception as e:
+            return outcomes + [self._failed(row, e) for row, _ in pending]
+
+        for (row, operation), result in zip(pending, results):
+            if result.ok:
+                google_id = None if operation.method == "DELETE" else (
+                    row.google_event_id or result.payload["id"]
+                )
+                outcomes.append(self._done(row, google_id))
+            elif result.status_code in (404, 410):
+                if operation.method == "DELETE":
+                    outcomes.append(self._done(row, None))
+                else:
+                    # the student deleted their copy: create it again
+                    outcomes.append(_Outcome(row, SyncJobStatus.pending, None, row.attempts,
+                                             datetime.now(timezone.utc)))
+            elif result.error().is_rate_limited:
+                self.limiter.pause(_backoff(1).total_seconds())
+                outcomes.append(self._deferred(row, result.error(), _backoff(1).total_seconds()))
+            else:
+                outcomes.append(self._failed(row, result.error()))
+        return outcomes
+
+    @staticmethod
+    def _done(row: CourseEventDelivery, google_event_id: Optional[str]) -> _Outcome:
+        return _Outcome(row, SyncJobStatus.done, google_event_id, row.attempts,
+                        datetime.now(timezone.utc))
+
+    def _failed(self, row: CourseEventDelivery, error: Exception) -> _Outcome:
+        attempts = row.attempts + 1
+        permanent = (
+            isinstance(error, GoogleAPIError)
+            and 400 <= error.status_code < 500
+            and error.status_code != 401
+        )
+        status = (
+            SyncJobStatus.failed if permanent or attempts >= self.max_attempts
+            else SyncJobStatus.pending
+        )
+        return _Outcome(row, status, row.google_event_id, attempts,
+                        datetime.now(timezone.utc) + _backoff(attempts), str(error)[:2000])
+
+    @staticmethod
+    def _deferred(row: CourseEventDelivery, error: Exception, delay: float) -> _Outcome:
+        # rate limiting is not the row's fault, so it does not use up an attempt
+        return _Outcome(row, SyncJobStatus.pending, row.google_event_id, row.attempts,
+                        datetime.now(timezone.utc) + timedelta(seconds=delay), str(error)[:2000])
+
+    @staticmethod
+    async def _record(db: AsyncSession, outcomes: List[_Outcome]) -> None:
+        if not outcomes:
+            return
+        now = datetime.now(timezone.utc)
+        current = _deliveries.c.revision == bindparam("b_revision")
+        statement = (
+            update(_deliveries)
+            .where(_deliveries.c.event_id == bindparam("b_event_id"),
+                   _deliveries.c.user_id == bindparam("b_user_id"))
+            .values(
+                # the copy's id is kept even if the row was re-queued meanwhile,
+                # so the next pass PATCHes it instead of creating a duplicate
+                google_event_id=bindparam("b_google_event_id"),
+                status=case(
+                    (current, bindparam("b_status", type_=_deliveries.c.status.type)),
+                    else_=_pending(),
+                ),
+                attempts=case((current, bindparam("b_attempts")), else_=0),
+                next_attempt_at=case((current, bindparam("b_next_attempt_at")), else_=now),
+                last_error=bindparam("b_last_error"),
+                locked_until=None,
+                updated_at=now,
+            )
+        )
+        # one executemany for the whole batch
+        await db.execute(statement, [
+            {
+                "b_event_id": o.row.event_id,
+                "b_user_id": o.row.user_id,
+                "b_revision": o.row.revision,
+                "b_google_event_id": o.google_event_id,
+                "b_status": o.status,
+                "b_attempts": o.attempts,
+                "b_next_attempt_at": o.next_attempt_at,
+                "b_last_error": o.last_error,
+            }
+            for o in outcomes
+        ])
+        await db.commit()
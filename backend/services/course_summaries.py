@@ -0,0 +1,155 @@
+"""
+Per-course upcoming-deadline summaries (course_deadline_summaries).
+
+Every student keeps their own copy of a course's exams and assignments, so
+the summary deduplicates them by (title, type, start) and keeps the soonest
+SUMMARY_SIZE. Course pages and search read only the summary row.
+
+Summaries are rebuilt for the affected courses whenever course events are
+inserted, and for all courses every COURSE_SUMMARY_REFRESH_SECONDS so that
+passed deadlines drop off.
+"""
+import asyncio
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from models.models import Course, CourseDeadlineSummary, Event, EventType
+from services.recurrence import as_utc
+
+SUMMARY_SIZE = 10
+DEADLINE_TYPES = (EventType.assignment, EventType.project, EventType.exam, EventType.final)
+EXAM_TYPES = (EventType.exam, EventType.final)
+
+
+def _upsert(dialect: str):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"course summaries are not supported on {dialect}")
+    stmt = insert(CourseDeadlineSummary.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=["course_id"],
+        set_={
+            "deadlines": stmt.excluded.deadlines,
+            "next_deadline_at": stmt.excluded.next_deadline_at,
+            "next_exam_at": stmt.excluded.next_exam_at,
+            "refreshed_at": stmt.excluded.refreshed_at,
+        },
+    )
+
+
+async def refresh_course_summaries(
+    db: AsyncSession,
+    course_ids: Optional[Sequence[uuid.UUID]] = None,
+    now: Optional[datetime] = None,
+) -> None:
+    """Rebuild the summaries of `course_ids` (all courses when None) and commit."""
+    now = now or datetime.now(timezone.utc)
+    if course_ids is None:
+        course_ids = list((await db.exec(select(Course.id))).all())
+    if not course_ids:
+        return
+
+    upcoming = (
+        Event.course_id.in_(course_ids),
+        Event.recurrence_rule.is_(None),
+        Event.starts_at >= now,
+        # the partition key: past semesters are not scanned
+        Event.active_until > now,
+    )
+    distinct = (
+        select(Event.course_id, Event.title, Event.type, Event.starts_at)
+        .where(*upcoming, Event.type.in_(DEADLINE_TYPES))
+        .distinct()
+        .subquery()
+    )
+    ranked = select(
+        distinct,
+        func.row_number()
+        .over(partition_by=distinct.c.course_id, order_by=(distinct.c.starts_at, distinct.c.title))
+        .label("rank"),
+    ).subquery()
+    rows = (
+        await db.exec(
+            select(ranked.c.course_id, ranked.c.title, ranked.c.type, ranked.c.starts_at)
+            .where(ranked.c.rank <= SUMMARY_SIZE)
+            .order_by(ranked.c.course_id, ranked.c.rank)
+        )
+    ).all()
+    next_exams = dict(
+        (
+            await db.exec(
+                select(Event.course_id, func.min(Event.starts_at))
+                .where(*upcoming, Event.type.in_(EXAM_TYPES))
+                .group_by(Event.course_id)
+            )
+        ).all()
+    )
+
+    deadlines: Dict[uuid.UUID, List[dict]] = defaultdict(list)
+    for course_id, title, event_type, starts_at in rows:
+        deadlines[course_id].append({
+            "title": title,
+            "type": EventType(event_type).value,
+            "starts_at": as_utc(starts_at).isoformat(),
+        })
+
+    summaries = []
+    for course_id in course_ids:
+        items = deadlines.get(course_id, [])
+        summaries.append({
+            "course_id": course_id,
+            "deadlines": items,
+            "next_deadline_at": datetime.fromisoformat(items[0]["starts_at"]) if items else None,
+            "next_exam_at": next_exams.get(course_id),
+            "refreshed_at": now,
+        })
+    await db.execute(_upsert(db.bind.dialect.name), summaries)
+    await db.commit()
+
+
+def upcoming_deadlines(summary: Optional[CourseDeadlineSummary]) -> List[dict]:
+    """The summary's deadlines that have not passed since it was built."""
+    if summary is None:
+        return []
+    now = datetime.now(timezone.utc)
+    return [d for d in summary.deadlines if datetime.fromisoformat(d["starts_at"]) >= now]
+
+
+class CourseSummaryRefresher:
+    """Rebuilds every course summary periodically so passed deadlines roll off."""
+
+    def __init__(self, engine: AsyncEngine,
+                 interval: float = settings.COURSE_SUMMARY_REFRESH_SECONDS):
+        self.engine = engine
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                async with AsyncSession(self.engine) as db:
+                    await refresh_course_summaries(db)
+            except Exception as e:
+                print(f"Course summary refresh failed: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,144 @@
+"""
+Conditional GET and payload caching for GET /api/events.
+
+Every user's events collection has a version that changes on each write
+(EventRepository inserts, the sync worker writing google_event_id back, a
+shared course event changing for everyone enrolled).
+The ETag of a listing is derived from that version and the query, so a
+poll whose If-None-Match still matches is answered with 304 before any
+database work. Serialized listings are kept in a byte-bounded LRU keyed by
+(user, version, query); a new version simply makes old entries unreachable.
+
+Versions come from one strictly increasing counter, so a version that was
+evicted (or lost in a restart) is never handed out again for other data.
+The in-memory versions only see writes made by their own process, so they
+expire after EVENTS_CACHE_TTL_SECONDS: with several workers, a listing can
+be that much out of date. The redis backend shares versions between
+workers and has no such delay.
+"""
+import hashlib
+import itertools
+import os
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+
+from cachetools import TTLCache
+
+from config import settings
+
+
+class InProcessEventVersions:
+    """user id -> version, local to this worker process; expires after `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        # a write handled by another worker is picked up once the version expires
+        self._versions = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        # a restart must not reuse the versions handed out before it
+        self._boot = os.urandom(4).hex()
+        self._clock = itertools.count(1)
+
+    async def get(self, user_id: uuid.UUID) -> str:
+        with self._lock:
+            version = self._versions.get(user_id)
+            if version is None:
+                version = self._versions[user_id] = f"{self._boot}.{next(self._clock)}"
+            return version
+
+    async def bump(self, user_id: uuid.UUID) -> None:
+        with self._lock:
+            self._versions[user_id] = f"{self._boot}.{next(self._clock)}"
+
+    async def bump_many(self, user_ids: Iterable[uuid.UUID]) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                self._versions[user_id] = f"{self._boot}.{next(self._clock)}"
+
+
+class RedisEventVersions:
+    """Versions shared by every worker (needs the `redis` package)."""
+
+    def __init__(self, url: str, prefix: str = "events-version:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("EVENTS_CACHE_BACKEND=redis requires the 'redis' package") from e
+        self._redis = redis.from_url(url)
+        self._prefix = prefix
+        self._clock_key = prefix + "clock"
+
+    async def get(self, user_id: uuid.UUID) -> str:
+        key = self._prefix + str(user_id)
+        version = await self._redis.get(key)
+        if version is None:
+            await self._redis.set(key, await self._redis.incr(self._clock_key), nx=True)
+            version = await self._redis.get(key)
+        return version.decode() if isinstance(version, bytes) else str(version)
+
+    async def bump(self, user_id: uuid.UUID) -> None:
+        await self._redis.set(self._prefix + str(user_id), await self._redis.incr(self._clock_key))
+
+    async def bump_many(self, user_ids: Iterable[uuid.UUID]) -> None:
+        # e.g. every student of a course: one INCRBY and one pipelined round-trip
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        last = await self._redis.incrby(self._clock_key, len(user_ids))
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for offset, user_id in enumerate(user_ids):
+                pipe.set(self._prefix + str(user_id), last - offset)
+            await pipe.execute()
+
+
+def build_event_versions():
+    if settings.EVENTS_CACHE_BACKEND == "redis":
+        return RedisEventVersions(settings.USER_CACHE_REDIS_URL)
+    return InProcessEventVersions(settings.USER_CACHE_SIZE, settings.EVENTS_CACHE_TTL_SECONDS)
+
+
+@dataclass(frozen=True)
+class CachedListing:
+    body: bytes
+    next_cursor: Optional[str]
+
+
+class PayloadCache:
+    """Serialized listings, LRU-evicted past `max_bytes` and expired after `ttl` seconds."""
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self._cache = TTLCache(maxsize=max_bytes, ttl=ttl, getsizeof=lambda item: len(item.body))
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[CachedListing]:
+        with self._lock:
+            return self._cache.get(key)
+
+    def set(self, key: Tuple, value: CachedListing) -> None:
+        if len(value.body) > self._cache.maxsize:
+            return
+        with self._lock:
+            self._cache[key] = value
+
+
+def listing_etag(user_id: uuid.UUID, version: str, query: Tuple) -> str:
+    digest = hashlib.blake2b(repr((str(user_id), version, query)).encode(), digest_size=12)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison against an If-None-Match header (RFC 9110 13.1.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(",")
+    )
+
+
+# bumped by every write to a user's events; read by GET /api/events
+event_versions = build_event_versions()
+event_payloads = PayloadCache(settings.EVENTS_CACHE_MAX_BYTES, settings.EVENTS_CACHE_TTL_SECONDS)
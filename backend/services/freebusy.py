@@ -0,0 +1,154 @@
+"""
+Free/busy over local events and the Google mirror.
+
+Busy blocks of each user are loaded with overlap queries on events and
+google_events, turned into intervals and answered with sort + sweep, so
+every query here is O(n log n) in the number of blocks.
+"""
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.models import Event, GoogleEvent
+from repositories.events import EventRepository
+from services.recurrence import as_utc, expand
+
+Interval = Tuple[datetime, datetime]
+
+# how far ahead a new recurring event is checked for clashes (about a semester)
+CONFLICT_HORIZON = timedelta(days=120)
+
+
+@dataclass(frozen=True)
+class BusyBlock:
+    start: datetime
+    end: datetime
+    title: str
+    source: str  # "local" | "google"
+    id: str
+
+
+def event_interval(event) -> Interval:
+    """[start, end) of a local event or occurrence."""
+    return as_utc(event.starts_at), as_utc(event.ends_at)
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Sorted, non-overlapping union of `intervals` (touching ones are joined)."""
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def free_slots(busy: Iterable[Interval], start: datetime, end: datetime,
+               min_length: timedelta = timedelta(0)) -> List[Interval]:
+    """Gaps of at least `min_length` inside [start, end) not covered by `busy`."""
+    slots = []
+    cursor = start
+    for busy_start, busy_end in merge_intervals(busy):
+        if busy_end <= cursor:
+            continue
+        if busy_start >= end:
+            break
+        if busy_start - cursor >= min_length and busy_start > cursor:
+            slots.append((cursor, busy_start))
+        cursor = max(cursor, busy_end)
+    if end - cursor >= min_length and end > cursor:
+        slots.append((cursor, end))
+    return slots
+
+
+def find_conflicts(candidates: Sequence[Interval],
+                   blocks: Sequence[BusyBlock]) -> List[Tuple[Interval, BusyBlock]]:
+    """
+    Every (candidate, block) pair that overlaps.
+
+    Both sides are sorted by start and swept once; blocks that end before the
+    current candidate starts are dropped from the active list for good.
+    """
+    candidates = sorted(candidates)
+    blocks = sorted(blocks, key=lambda b: (b.start, b.end))
+    conflicts = []
+    active: List[BusyBlock] = []
+    i = 0
+    for start, end in candidates:
+        while i < len(blocks) and blocks[i].start < end:
+            active.append(blocks[i])
+            i += 1
+        active = [b for b in active if b.end > start]
+        conflicts.extend(((start, end), b) for b in active if b.start < end)
+    return conflicts
+
+
+async def load_busy(
+    db: AsyncSession,
+    user_ids: Sequence[uuid.UUID],
+    start: datetime,
+    end: datetime,
+    exclude_event: Optional[uuid.UUID] = None,
+) -> Dict[uuid.UUID, List[BusyBlock]]:
+    """Busy blocks overlapping [start, end) for each user, sorted by start."""
+    busy: Dict[uuid.UUID, List[BusyBlock]] = defaultdict(list)
+
+    repository = EventRepository(db)
+    owned = [(event.user_id, event) for event in await repository.in_window(user_ids, start, end)]
+    shared = await repository.shared_in_window(user_ids, start, end)
+    for user_id, event in owned + shared:
+        if exclude_event in (event.id, getattr(event, "series_id", None)):
+            continue
+        block_start, block_end = event_interval(event)
+        busy[user_id].append(
+            BusyBlock(block_start, block_end, event.title, "local", str(event.id))
+        )
+
+    google_rows = (
+        await db.exec(
+            select(GoogleEvent).where(
+                GoogleEvent.user_id.in_(user_ids),
+                GoogleEvent.starts_at < end,
+                GoogleEvent.ends_at > start,
+                # all-day entries (holidays, "OOO" notes) are not time blocks
+                GoogleEvent.is_all_day.is_(False),
+            )
+        )
+    ).all()
+    for row in google_rows:
+        busy[row.user_id].append(
+            BusyBlock(as_utc(row.starts_at), as_utc(row.ends_at), row.title, "google", row.google_event_id)
+        )
+
+    for blocks in busy.values():
+        blocks.sort(key=lambda b: (b.start, b.end))
+    return busy
+
+
+async def event_conflicts(db: AsyncSession, event: Event) -> List[BusyBlock]:
+    """Existing busy blocks of the event's owner that the (unsaved) `event` overlaps."""
+    if event.recurrence_rule:
+        first = as_utc(event.starts_at)
+        candidates = [event_interval(o) for o in expand([event], first, first + CONFLICT_HORIZON)]
+    else:
+        candidates = [event_interval(event)]
+    if not candidates:
+        return []
+
+    start = min(c[0] for c in candidates)
+    end = max(c[1] for c in candidates)
+    busy = await load_busy(db, [event.user_id], start, end, exclude_event=event.id)
+    seen = set()
+    conflicts = []
+    for _, block in find_conflicts(candidates, busy.get(event.user_id, [])):
+        if (block.source, block.id) not in seen:
+            seen.add((block.source, block.id))
+            conflicts.append(block)
+    return conflicts
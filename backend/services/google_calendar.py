@@ -0,0 +1,457 @@
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlparse
+
+import httpx
+
+from config import settings
+from services.google_quota import QuotaScheduler, current_quota_user
+from services.metrics import observe_google, span
+from services.recurrence import google_recurrence
+
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded"}
+USER_RATE_LIMIT_REASON = "userRateLimitExceeded"
+# Google rejects batch requests with more than 50 calls
+MAX_BATCH_SIZE = 50
+
+
+def _utc_wall_time(value: datetime) -> str:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat()
+
+
+def google_event_body(event: Any) -> Dict[str, Any]:
+    """Build the Calendar `events` resource for a local `Event` row."""
+    body = {
+        "summary": event.title,
+        "description": event.description,
+        "start": {"dateTime": _utc_wall_time(event.starts_at), "timeZone": "UTC"},
+        "end": {"dateTime": _utc_wall_time(event.ends_at), "timeZone": "UTC"},
+    }
+    recurrence = google_recurrence(event)
+    if recurrence:
+        # a series is pushed once; Google expands the instances itself
+        body["recurrence"] = recurrence
+    return body
+
+
+def google_event_id(event_id: uuid.UUID) -> str:
+    """
+    The Calendar id an insert of local event `event_id` is sent with.
+
+    Being derived from our id, a re-sent insert (a transport retry, or a job
+    retried after its response was lost) gets a 409 instead of creating a
+    duplicate. Calendar ids must be base32hex (0-9, a-v); hex digits are a
+    subset of it.
+    """
+    return event_id.hex
+
+
+class GoogleAPIError(Exception):
+    """Raised when Google answers with a non-2xx status after all retries."""
+
+    def __init__(self, status_code: int, payload: Any, retry_after: Optional[float] = None):
+        super().__init__(f"Google API error {status_code}: {payload}")
+        self.status_code = status_code
+        self.payload = payload
+        self.retry_after = retry_after
+
+    def _reasons(self) -> List[str]:
+        if not isinstance(self.payload, dict):
+            return []
+        error = self.payload.get("error")
+        if not isinstance(error, dict):
+            return []
+        return [err.get("reason") for err in error.get("errors", [])]
+
+    @property
+    def is_rate_limited(self) -> bool:
+        if self.status_code == 429:
+            return True
+        return self.status_code == 403 and any(r in RATE_LIMIT_REASONS for r in self._reasons())
+
+    @property
+    def is_user_rate_limited(self) -> bool:
+        """Google blamed this user's quota rather than the project's."""
+        return self.is_rate_limited and USER_RATE_LIMIT_REASON in self._reasons()
+
+
+@dataclass
+class BatchOperation:
+    method: str
+    path: str  # relative to the Calendar API base, e.g. "/calendars/primary/events"
+    body: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class BatchResult:
+    status_code: int
+    payload: Any
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def error(self) -> GoogleAPIError:
+        return GoogleAPIError(self.status_code, self.payload)
+
+
+def _encode_batch(boundary: str, api_path: str, operations: List[BatchOperation]) -> bytes:
+    parts = []
+    for index, op in enumerate(operations):
+        lines = [
+            f"--{boundary}",
+            "Content-Type: application/http",
+            f"Content-ID: <item{index}>",
+            "",
+            f"{op.method} {api_path}{op.path} HTTP/1.1",
+        ]
+        if op.body is not None:
+            lines += ["Content-Type: application/json", "", json.dumps(op.body)]
+        else:
+            lines += [""]
+        parts.append("\r\n".join(lines))
+    parts.append(f"--{boundary}--")
+    return ("\r\n".join(parts) + "\r\n").encode()
+
+
+def _decode_batch(response: httpx.Response, count: int) -> List[BatchResult]:
+    content_type = response.headers.get("Content-Type", "")
+    boundary = None
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "boundary":
+            boundary = value.strip('"')
+    if not boundary:
+        raise GoogleAPIError(response.status_code, "batch response without multipart boundary")
+
+    results: List[Optional[BatchResult]] = [None] * count
+    text = response.text.replace("\r\n", "\n")
+    for part in text.split(f"--{boundary}")[1:]:
+        if part.startswith("--"):
+            break
+        # outer part headers, then the embedded HTTP response (status line, headers, body)
+        outer_headers, _, http_message = part.strip("\n").partition("\n\n")
+        content_id = None
+        for line in outer_headers.split("\n"):
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-id":
+                content_id = value.strip().strip("<>")
+        status_line, _, rest = http_message.partition("\n")
+        _, _, body = rest.partition("\n\n")
+        status_code = int(status_line.split()[1])
+        try:
+            payload = json.loads(body) if body.strip() else None
+        except ValueError:
+            payload = body
+        # Google answers with "response-itemN" for a request tagged "itemN"
+        if content_id and content_id.startswith("response-item"):
+            index = int(content_id[len("response-item"):])
+            if 0 <= index < count:
+                results[index] = BatchResult(status_code, payload)
+
+    return [
+        result if result is not None else BatchResult(500, "missing from batch response")
+        for result in results
+    ]
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return None
+
+
+def _payload(response: httpx.Response) -> Any:
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+class GoogleCalendarClient:
+    """
+    Thin async wrapper over the Calendar v3 REST API.
+
+    One instance (and therefore one keep-alive connection pool) is shared by
+    the whole process; the user's access token is passed per call.
+    """
+
+    def __init__(
+        self,
+        base_url: str = settings.GOOGLE_CALENDAR_API_BASE,
+        batch_endpoint: str = settings.GOOGLE_CALENDAR_BATCH_ENDPOINT,
+        token_endpoint: str = settings.GOOGLE_TOKEN_ENDPOINT,
+        timeout: float = settings.GOOGLE_HTTP_TIMEOUT,
+        max_retries: int = settings.GOOGLE_HTTP_MAX_RETRIES,
+        max_connections: int = settings.GOOGLE_HTTP_MAX_CONNECTIONS,
+        max_keepalive: int = settings.GOOGLE_HTTP_MAX_KEEPALIVE,
+        quota: Optional[QuotaScheduler] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.quota = quota or QuotaScheduler()
+        self.batch_endpoint = batch_endpoint
+        self.token_endpoint = token_endpoint
+        self.max_retries = max_retries
+        self.http = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+            ),
+        )
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        access_token: Optional[str] = None,
+        calls: int = 1,
+        retries: Optional[int] = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """
+        Send a request, retrying transport errors, 429 and 5xx with backoff.
+
+        `retries` overrides `max_retries`; pass 0 for calls that must not be
+        repeated, such as redeeming a single-use authorization code.
+
+        Every attempt first waits for quota: `calls` tokens (the number of
+        API calls inside a batch) from the bucket of the user set by
+        `user_quota` (if any), and from the project's.
+        """
+        headers = dict(kwargs.pop("headers", None) or {})
+        if access_token:
+            headers["Authorization"] = f"Bearer {access_token}"
+
+        max_retries = self.max_retries if retries is None else retries
+        user_key = current_quota_user()
+        endpoint = self._endpoint_label(url)
+        attempt = 0
+        while True:
+            with span("google_quota"):
+                await self.quota.acquire(user_key, calls)
+            start = time.perf_counter()
+            try:
+                response = await self.http.request(method, url, headers=headers, **kwargs)
+            except httpx.TransportError:
+                observe_google(endpoint, "error", time.perf_counter() - start)
+                if attempt >= max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            observe_google(endpoint, str(response.status_code), time.perf_counter() - start)
+            if response.status_code < 400:
+                self.quota.succeeded(user_key)
+                return response
+
+            error = GoogleAPIError(response.status_code, _payload(response), _retry_after(response))
+            held = error.is_rate_limited and self.quota.rate_limited(
+                user_key, error.is_user_rate_limited, error.retry_after
+            )
+            retryable = response.status_code in RETRYABLE_STATUS or error.is_rate_limited
+            if not retryable or attempt >= max_retries:
+                raise error
+            if not held:
+                # a paused user bucket already delays the next attempt
+                await asyncio.sleep(error.retry_after or self._backoff(attempt))
+            attempt += 1
+
+    def _endpoint_label(self, url: str) -> str:
+        if url == self.token_endpoint:
+            return "token"
+        if url == self.batch_endpoint:
+            return "batch"
+        return "calendar"
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        # exponential backoff with full jitter: 0..(0.5s, 1s, 2s, ...)
+        return random.uniform(0, 0.5 * (2 ** attempt))
+
+    @staticmethod
+    def events_path(calendar_id: str, event_id: Optional[str] = None) -> str:
+        path = f"/calendars/{quote(calendar_id, safe='')}/events"
+        if event_id:
+            path += f"/{quote(event_id, safe='')}"
+        return path
+
+    def _events_url(self, calendar_id: str, event_id: Optional[str] = None) -> str:
+        return self.base_url + self.events_path(calendar_id, event_id)
+
+    async def batch(
+        self, access_token: str, operations: List[BatchOperation]
+    ) -> List[BatchResult]:
+        """
+        Send calls through the HTTP batch endpoint, MAX_BATCH_SIZE per round-trip.
+
+        Results come back in the same order as `operations`; a failing item
+        does not fail the others, so callers must check `BatchResult.ok`.
+        """
+        api_path = urlparse(self.base_url).path
+        results: List[BatchResult] = []
+        for start in range(0, len(operations), MAX_BATCH_SIZE):
+            chunk = operations[start:start + MAX_BATCH_SIZE]
+            boundary = f"batch_{uuid.uuid4().hex}"
+            response = await self.request(
+                "POST",
+                self.batch_endpoint,
+                access_token,
+                calls=len(chunk),
+                content=_encode_batch(boundary, api_path, chunk),
+                headers={"Content-Type": f"multipart/mixed; boundary={boundary}"},
+            )
+            decoded = _decode_batch(response, len(chunk))
+            # items are throttled individually inside a successful batch response
+            throttled = [r.error() for r in decoded if not r.ok and r.error().is_rate_limited]
+            if throttled:
+                self.quota.rate_limited(
+                    current_quota_user(), all(e.is_user_rate_limited for e in throttled), None
+                )
+            results.extend(decoded)
+        return results
+
+    async def send(
+        self, access_token: str, operations: List[BatchOperation]
+    ) -> List[BatchResult]:
+        """
+        `operations` for one user: a plain request for a single call (cheaper
+        without the multipart envelope), the batch endpoint otherwise.
+
+        Only rate limiting is raised; other failures come back as results.
+        """
+        if not operations:
+            return []
+        if len(operations) > 1:
+            return await self.batch(access_token, operations)
+
+        op = operations[0]
+        try:
+            response = await self.request(
+                op.method, self.base_url + op.path, access_token, json=op.body
+            )
+        except GoogleAPIError as e:
+            if e.is_rate_limited:
+                raise
+            return [BatchResult(e.status_code, e.payload)]
+        payload = response.json() if response.content else None
+        return [BatchResult(response.status_code, payload)]
+
+    async def list_events(
+        self, access_token: str, calendar_id: str, **params: Any
+    ) -> Dict[str, Any]:
+        """Return one page of `events.list`; pass `pageToken` to continue."""
+        params = {k: v for k, v in params.items() if v is not None}
+        response = await self.request(
+            "GET", self._events_url(calendar_id), access_token, params=params
+        )
+        return response.json()
+
+    async def sync_events(
+        self, access_token: str, calendar_id: str, **params: Any
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Read every page of `events.list` and return `(items, nextSyncToken)`.
+
+        Pass `syncToken` for an incremental read; Google answers 410 when the
+        token has expired and a full sync is needed.
+        """
+        items: List[Dict[str, Any]] = []
+        page_token = None
+        while True:
+            page = await self.list_events(
+                access_token, calendar_id, pageToken=page_token, **params
+            )
+            items.extend(page.get("items", []))
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                return items, page.get("nextSyncToken")
+
+    async def watch_events(
+        self,
+        access_token: str,
+        calendar_id: str,
+        channel_id: str,
+        address: str,
+        token: str,
+        ttl_seconds: int,
+    ) -> Dict[str, Any]:
+        """Open a push channel (`events.watch`); returns `resourceId` and `expiration` (ms)."""
+        response = await self.request(
+            "POST",
+            self._events_url(calendar_id) + "/watch",
+            access_token,
+            json={
+                "id": channel_id,
+                "type": "web_hook",
+                "address": address,
+                "token": token,
+                "params": {"ttl": str(ttl_seconds)},
+            },
+        )
+        return response.json()
+
+    async def stop_channel(self, access_token: str, channel_id: str, resource_id: str) -> None:
+        try:
+            await self.request(
+                "POST",
+                f"{self.base_url}/channels/stop",
+                access_token,
+                json={"id": channel_id, "resourceId": resource_id},
+            )
+        except GoogleAPIError as e:
+            # channel already expired or unknown -> nothing to stop
+            if e.status_code != 404:
+                raise
+
+    async def refresh_access_token(
+        self, refresh_token: str, client_id: str, client_secret: str
+    ) -> Dict[str, Any]:
+        """Exchange a refresh token for a new access token (`access_token`, `expires_in`)."""
+        response = await self.request(
+            "POST",
+            self.token_endpoint,
+            data={
+                "grant_type": "refresh_token",
+                "refresh_token": refresh_token,
+                "client_id": client_id,
+                "client_secret": client_secret,
+            },
+        )
+        return response.json()
+
+
+_client: Optional[GoogleCalendarClient] = None
+
+
+def get_calendar_client() -> GoogleCalendarClient:
+    """Process-wide client; created lazily so it binds to the running event loop."""
+    global _client
+    if _client is None:
+        _client = GoogleCalendarClient()
+    return _client
+
+
+async def close_calendar_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,188 @@
+import asyncio
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlmodel import delete, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from models.models import GoogleCalendarSyncState, GoogleEvent, User
+from services.google_calendar import GoogleAPIError, get_calendar_client
+from services.google_quota import user_quota
+
+
+# one in-flight sync per user; concurrent page loads wait for it instead of
+# starting their own
+_sync_locks: Dict[uuid.UUID, asyncio.Lock] = {}
+
+
+def _lock_for(user_id: uuid.UUID) -> asyncio.Lock:
+    lock = _sync_locks.get(user_id)
+    if lock is None:
+        lock = _sync_locks[user_id] = asyncio.Lock()
+    return lock
+
+
+def parse_google_time(value: Dict[str, Any]) -> Tuple[Optional[str], Optional[datetime]]:
+    """Return the raw ISO string and a UTC datetime for a Google start/end object."""
+    if value.get("dateTime"):
+        raw = value["dateTime"]
+        parsed = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return raw, parsed.astimezone(timezone.utc)
+    if value.get("date"):
+        raw = value["date"]
+        return raw, datetime.combine(date.fromisoformat(raw), time(0), tzinfo=timezone.utc)
+    return None, None
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def is_stale(state: Optional[GoogleCalendarSyncState], calendar_id: str) -> bool:
+    if state is None or state.last_synced_at is None or state.calendar_id != calendar_id:
+        return True
+    now = datetime.now(timezone.utc)
+    age = now - _as_utc(state.last_synced_at)
+    if state.watch_expires_at and _as_utc(state.watch_expires_at) > now:
+        # Google pushes changes to us, so only the safety-net age applies
+        return age > timedelta(seconds=settings.GOOGLE_MIRROR_WATCHED_MAX_AGE_SECONDS)
+    return age > timedelta(seconds=settings.GOOGLE_MIRROR_STALE_SECONDS)
+
+
+async def _apply_items(db: AsyncSession, user_id: uuid.UUID, items: List[Dict[str, Any]]) -> None:
+    if not items:
+        return
+    ids = [item["id"] for item in items]
+    existing = {
+        row.google_event_id: row
+        for row in (
+            await db.exec(
+                select(GoogleEvent).where(
+                    GoogleEvent.user_id == user_id, GoogleEvent.google_event_id.in_(ids)
+                )
+            )
+        ).all()
+    }
+    now = datetime.now(timezone.utc)
+    for item in items:
+        row = existing.get(item["id"])
+        if item.get("status") == "cancelled":
+            if row is not None:
+                await db.delete(row)
+            continue
+
+        start_raw, starts_at = parse_google_time(item.get("start", {}))
+        end_raw, ends_at = parse_google_time(item.get("end", {}))
+        if starts_at is None:
+            continue
+
+        if row is None:
+            row = GoogleEvent(user_id=user_id, google_event_id=item["id"],
+                              title="", start="", end="", starts_at=starts_at, ends_at=starts_at)
+            existing[item["id"]] = row
+            db.add(row)
+        row.title = item.get("summary") or "(No title)"
+        row.start = start_raw
+        row.end = end_raw or start_raw
+        row.starts_at = starts_at
+        row.ends_at = ends_at or starts_at
+        row.is_all_day = "date" in item.get("start", {})
+        row.html_link = item.get("htmlLink")
+        row.updated_at = now
+
+
+async def sync_user_calendar(
+    db: AsyncSession, user: User, access_token: str, force_full: bool = False
+) -> None:
+    """
+    Bring the user's google_events mirror up to date.
+
+    Uses the stored syncToken for an incremental delta when possible and falls
+    back to a full (paginated) read on first sync, calendar change or 410 Gone.
+    """
+    client = get_calendar_client()
+    calendar_id = user.calendar_id or "primary"
+    state = await db.get(GoogleCalendarSyncState, user.user_id)
+
+    items = None
+    if not force_full and state and state.sync_token and state.calendar_id == calendar_id:
+        try:
+            with user_quota(user.user_id):
+                items, next_token = await client.sync_events(
+                    access_token, calendar_id, syncToken=state.sync_token, singleEvents=True
+                )
+        except GoogleAPIError as e:
+            if e.status_code != 410:
+                raise
+            items = None  # token invalidated by Google -> full resync
+
+    full_sync = items is None
+    if full_sync:
+        time_min = datetime.now(timezone.utc) - timedelta(days=settings.GOOGLE_MIRROR_PAST_DAYS)
+        with user_quota(user.user_id):
+            items, next_token = await client.sync_events(
+                access_token, calendar_id, timeMin=time_min.isoformat(), singleEvents=True
+            )
+        await db.exec(delete(GoogleEvent).where(GoogleEvent.user_id == user.user_id))
+
+    await _apply_items(db, user.user_id, items)
+
+    if state is None:
+        state = GoogleCalendarSyncState(user_id=user.user_id, calendar_id=calendar_id)
+        db.add(state)
+    state.calendar_id = calendar_id
+    state.sync_token = next_token
+    state.last_synced_at = datetime.now(timezone.utc)
+    await db.commit()
+
+
+async def sync_now(db: AsyncSession, user: User, access_token: str) -> None:
+    """Run an incremental sync, serialized with any other sync for this user."""
+    async with _lock_for(user.user_id):
+        await sync_user_calendar(db, user, access_token)
+
+
+async def refresh_if_stale(db: AsyncSession, user: User, access_token: str) -> None:
+    """Sync the mirror when it is older than GOOGLE_MIRROR_STALE_SECONDS."""
+    calendar_id = user.calendar_id or "primary"
+    if not is_stale(await db.get(GoogleCalendarSyncState, user.user_id), calendar_id):
+        return
+    async with _lock_for(user.user_id):
+        # another request may have finished the sync while we waited
+        state = await db.get(GoogleCalendarSyncState, user.user_id, populate_existing=True)
+        if is_stale(state, calendar_id):
+            await sync_user_calendar(db, user, access_token)
+
+
+async def read_mirror(
+    db: AsyncSession, user_id: uuid.UUID, time_min: datetime, time_max: datetime
+) -> List[Dict[str, Any]]:
+    """Events overlapping [time_min, time_max), normalized for the frontend."""
+    rows = (
+        await db.exec(
+            select(GoogleEvent)
+            .where(
+                GoogleEvent.user_id == user_id,
+                GoogleEvent.starts_at < time_max,
+                GoogleEvent.ends_at > time_min,
+            )
+            .order_by(GoogleEvent.starts_at)
+        )
+    ).all()
+    return [
+        {
+            "id": row.google_event_id,
+            "title": row.title,
+            "start": row.start,
+            "end": row.end,
+            "htmlLink": row.html_link,
+            "isAllDay": row.is_all_day,
+        }
+        for row in rows
+    ]
@@ -0,0 +1,275 @@
+"""
+Quota-aware scheduling of Google API calls.
+
+Every call made through `GoogleCalendarClient.request` first takes a token
+from the caller's per-user bucket, then from the project-wide bucket. User
+buckets are keyed by user id, set with `user_quota(user_id)` around the
+calls (an access token changes on every refresh, so it would hand the same
+user a fresh bucket each hour); calls outside one only count against the
+project. The
+project bucket serves waiters strictly by priority: interactive calls (a
+request handler waiting on Google) go before background ones (sync worker,
+course fan-out, watch renewal, proactive token refresh). Code marks itself
+as background by running under `background()`; the priority is a context
+variable, so tasks started from there inherit it.
+
+Rates adapt AIMD-style. A rate-limit answer halves the rate of the bucket
+Google blamed: the user's for userRateLimitExceeded, otherwise the
+project's (at most once per DECREASE_COOLDOWN_SECONDS, so one burst of
+429s counts once). A throttled user's bucket is also paused for
+Retry-After. A project-level answer only slows everyone down, and the
+throttled call itself backs off. Each successful call then adds back a
+small step, up to the configured rate. Queue depths, waits and
+throttles are exported as Prometheus metrics and by `snapshot()`
+(/metrics/google-quota).
+"""
+import asyncio
+import enum
+import heapq
+import itertools
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from cachetools import TTLCache
+from prometheus_client import Counter, Gauge
+
+from config import settings
+
+# an AIMD decrease never takes a bucket below this share of its configured rate
+MIN_RATE_FRACTION = 0.05
+# share of the configured rate given back per successful call
+INCREASE_FRACTION = 0.02
+# concurrent 429s from one overload should halve a rate once, not once each
+DECREASE_COOLDOWN_SECONDS = 1.0
+# idle user buckets are dropped after this long; a new bucket starts full
+USER_BUCKET_TTL_SECONDS = 600
+
+QUOTA_WAITING = Gauge(
+    "google_quota_waiting",
+    "Google calls queued for a quota token",
+    ("scope", "priority"),
+    multiprocess_mode="livesum",
+)
+QUOTA_DELAYED = Counter(
+    "google_quota_delayed_total",
+    "Google calls that waited for a quota token",
+    ("scope", "priority"),
+)
+QUOTA_THROTTLED = Counter(
+    "google_quota_throttled_total",
+    "Rate-limit answers from Google, by the bucket they slowed down",
+    ("scope",),
+)
+QUOTA_RATE = Gauge(
+    "google_quota_project_rate",
+    "Current adaptive project-wide rate, in calls per second",
+    multiprocess_mode="liveall",
+)
+
+
+class Priority(enum.IntEnum):
+    interactive = 0
+    background = 1
+
+
+_priority: ContextVar[Priority] = ContextVar("google_priority", default=Priority.interactive)
+_user: ContextVar[Optional[str]] = ContextVar("google_quota_user", default=None)
+
+
+@contextmanager
+def background():
+    """Google calls made inside (and in tasks started inside) queue as background."""
+    token = _priority.set(Priority.background)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> Priority:
+    return _priority.get()
+
+
+@contextmanager
+def user_quota(user_id: uuid.UUID):
+    """Google calls made inside count against `user_id`'s bucket."""
+    token = _user.set(str(user_id))
+    try:
+        yield
+    finally:
+        _user.reset(token)
+
+
+def current_quota_user() -> Optional[str]:
+    return _user.get()
+
+
+class TokenBucket:
+    """`rate` calls per second on average, bursting up to one second's worth."""
+
+    def __init__(self, rate: float):
+        self.max_rate = rate
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._decreased = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until a call could go out; 0 when it can go now."""
+        self._refill()
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def take(self, calls: int = 1) -> None:
+        # a batch may take more than is left; the debt delays later calls
+        self._refill()
+        self._tokens -= calls
+
+    async def acquire(self, calls: int = 1) -> bool:
+        """Wait for a token and take `calls`; returns whether it had to wait."""
+        async with self._lock:
+            waited = False
+            while (delay := self.wait_time()) > 0:
+                waited = True
+                await asyncio.sleep(delay)
+            self.take(calls)
+            return waited
+
+    def pause(self, seconds: float) -> None:
+        """Google asked us to slow down: nothing goes out for `seconds`."""
+        self._refill()
+        self._tokens = min(self._tokens, -seconds * self.rate)
+
+    def decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._decreased < DECREASE_COOLDOWN_SECONDS:
+            return
+        self._decreased = now
+        self._refill()
+        self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+        self._tokens = min(self._tokens, self.rate)
+
+    def increase(self) -> None:
+        if self.rate < self.max_rate:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate * INCREASE_FRACTION)
+
+
+class QuotaScheduler:
+    """Per-user and project-wide token buckets in front of every Google call."""
+
+    def __init__(
+        self,
+        project_rate: float = settings.GOOGLE_QUOTA_PROJECT_RATE,
+        user_rate: float = settings.GOOGLE_QUOTA_USER_RATE,
+        max_users: int = settings.GOOGLE_QUOTA_MAX_USERS,
+    ):
+        self.user_rate = user_rate
+        self.project = TokenBucket(project_rate)
+        self._users: TTLCache = TTLCache(maxsize=max_users, ttl=USER_BUCKET_TTL_SECONDS)
+        # project waiters: (priority, arrival, calls, future)
+        self._queue: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._arrivals = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.throttled = {"user": 0, "project": 0}
+        QUOTA_RATE.set(project_rate)
+
+    def _user(self, user_key: str) -> TokenBucket:
+        bucket = self._users.get(user_key)
+        if bucket is None:
+            bucket = self._users[user_key] = TokenBucket(self.user_rate)
+        else:
+            # reading does not refresh a TTLCache entry; re-setting keeps busy users' buckets
+            self._users[user_key] = bucket
+        return bucket
+
+    async def acquire(self, user_key: Optional[str], calls: int = 1,
+                      priority: Optional[Priority] = None) -> None:
+        """Wait until `calls` Google calls for `user_key` (None: no user quota) may go out."""
+        priority = current_priority() if priority is None else priority
+        label = priority.name
+        if user_key is not None:
+            with _waiting("user", label):
+                if await self._user(user_key).acquire(calls):
+                    QUOTA_DELAYED.labels("user", label).inc()
+
+        if not self._queue and self.project.wait_time() == 0:
+            self.project.take(calls)
+            return
+        QUOTA_DELAYED.labels("project", label).inc()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._arrivals), calls, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        with _waiting("project", label):
+            await future
+
+    async def _dispatch(self) -> None:
+        # hands out project tokens to the queue head, highest priority first
+        while self._queue:
+            delay = self.project.wait_time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, calls, future = heapq.heappop(self._queue)
+            if future.done():
+                continue  # the caller was cancelled while queued
+            self.project.take(calls)
+            future.set_result(None)
+
+    def succeeded(self, user_key: Optional[str]) -> None:
+        self.project.increase()
+        QUOTA_RATE.set(self.project.rate)
+        if user_key is not None and user_key in self._users:
+            self._users[user_key].increase()
+
+    def rate_limited(self, user_key: Optional[str], user_scoped: bool,
+                     retry_after: Optional[float]) -> bool:
+        """
+        Slow down the bucket Google blamed. Returns True when that bucket is
+        now paused, i.e. the caller's retry is already held back.
+        """
+        if user_scoped and user_key is not None:
+            bucket = self._user(user_key)
+            bucket.decrease()
+            bucket.pause(retry_after or 1 / bucket.rate)
+            scope, held = "user", True
+        else:
+            self.project.decrease()
+            QUOTA_RATE.set(self.project.rate)
+            scope, held = "project", False
+        self.throttled[scope] += 1
+        QUOTA_THROTTLED.labels(scope).inc()
+        return held
+
+    def snapshot(self) -> Dict[str, Any]:
+        waiting = {p.name: 0 for p in Priority}
+        for priority, _, _, future in self._queue:
+            if not future.done():
+                waiting[Priority(priority).name] += 1
+        return {
+            "project_rate": round(self.project.rate, 3),
+            "project_max_rate": self.project.max_rate,
+            "user_buckets": len(self._users),
+            "users_slowed_down": sum(1 for b in self._users.values() if b.rate < b.max_rate),
+            "project_queue": waiting,
+            "throttled_total": dict(self.throttled),
+        }
+
+
+@contextmanager
+def _waiting(scope: str, priority: str):
+    gauge = QUOTA_WAITING.labels(scope, priority)
+    gauge.inc()
+    try:
+        yield
+    finally:
+        gauge.dec()
@@ -0,0 +1,196 @@
+import asyncio
+import secrets
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Set
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from models.models import GoogleCalendarSyncState, GoogleWatchChannel, User
+from services.google_calendar import get_calendar_client
+from services.google_quota import background, user_quota
+from services.google_mirror import sync_now
+from services.tokens import token_manager
+
+
+def watch_enabled() -> bool:
+    return bool(settings.GOOGLE_WEBHOOK_URL)
+
+
+async def register_channel(db: AsyncSession, user: User, access_token: str) -> GoogleWatchChannel:
+    """Open a new push channel on the user's calendar; the caller commits."""
+    calendar_id = user.calendar_id or "primary"
+    channel_id = str(uuid.uuid4())
+    token = secrets.token_urlsafe(32)
+    with user_quota(user.user_id):
+        response = await get_calendar_client().watch_events(
+            access_token,
+            calendar_id,
+            channel_id=channel_id,
+            address=settings.GOOGLE_WEBHOOK_URL,
+            token=token,
+            ttl_seconds=settings.GOOGLE_WATCH_TTL_SECONDS,
+        )
+    expiration = datetime.fromtimestamp(int(response["expiration"]) / 1000, tz=timezone.utc)
+    channel = GoogleWatchChannel(
+        id=channel_id,
+        user_id=user.user_id,
+        calendar_id=calendar_id,
+        resource_id=response["resourceId"],
+        token=token,
+        expiration=expiration,
+    )
+    db.add(channel)
+
+    state = await db.get(GoogleCalendarSyncState, user.user_id)
+    if state is not None:
+        state.watch_expires_at = expiration
+    return channel
+
+
+async def ensure_channel(db: AsyncSession, user: User, access_token: str) -> None:
+    """Register a channel for users whose mirror is synced but not yet watched."""
+    if not watch_enabled():
+        return
+    state = await db.get(GoogleCalendarSyncState, user.user_id)
+    if state is None or state.last_synced_at is None:
+        return
+    expires = state.watch_expires_at
+    if expires is not None and expires.tzinfo is None:
+        expires = expires.replace(tzinfo=timezone.utc)
+    if expires and expires > datetime.now(timezone.utc):
+        return
+    await register_channel(db, user, access_token)
+    await db.commit()
+
+
+async def verify_notification(
+    db: AsyncSession, channel_id: str, resource_id: Optional[str], token: Optional[str]
+) -> Optional[GoogleWatchChannel]:
+    """Return the channel a notification belongs to, or None if it is not ours."""
+    channel = await db.get(GoogleWatchChannel, channel_id)
+    if channel is None:
+        return None
+    if not token or not secrets.compare_digest(channel.token, token):
+        return None
+    if resource_id and resource_id != channel.resource_id:
+        return None
+    return channel
+
+
+class NotificationSyncer:
+    """
+    Re-syncs a user's mirror after a push notification.
+
+    Google often sends several notifications for one change; while a sync for
+    a user is queued, further notifications for that user are folded into it.
+    """
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self._queued: Set[uuid.UUID] = set()
+
+    async def resync(self, user_id: uuid.UUID) -> None:
+        if user_id in self._queued:
+            return
+        self._queued.add(user_id)
+        try:
+            async with AsyncSession(self.engine, expire_on_commit=False) as db:
+                user = await db.get(User, user_id)
+                if user is None:
+                    return
+                # nobody is waiting on this sync: queue behind interactive Google reads
+                with background():
+                    access_token = await token_manager.get_access_token(user)
+                    if not access_token:
+                        return
+                    # changes arriving from here on need another sync
+                    self._queued.discard(user_id)
+                    await sync_now(db, user, access_token)
+        except Exception as e:
+            print(f"Google Calendar resync for {user_id} failed: {e}")
+        finally:
+            self._queued.discard(user_id)
+
+
+class WatchChannelRenewer:
+    """Background task that re-registers channels before Google expires them."""
+
+    def __init__(self, engine: AsyncEngine,
+                 interval: int = settings.GOOGLE_WATCH_RENEW_INTERVAL_SECONDS,
+                 renew_before: int = settings.GOOGLE_WATCH_RENEW_BEFORE_SECONDS):
+        self.engine = engine
+        self.interval = interval
+        self.renew_before = timedelta(seconds=renew_before)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            with background():
+                self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.renew_expiring()
+            except Exception as e:
+                print(f"Watch channel renewal failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def renew_expiring(self) -> int:
+        """Renew every channel expiring within `renew_before`; returns how many."""
+        deadline = datetime.now(timezone.utc) + self.renew_before
+        async with AsyncSession(self.engine) as db:
+            channel_ids = (
+                await db.exec(
+                    select(GoogleWatchChannel.id)
+                    .where(GoogleWatchChannel.expiration < deadline)
+                    .order_by(GoogleWatchChannel.expiration)
+                )
+            ).all()
+
+        renewed = 0
+        for channel_id in channel_ids:
+            try:
+                if await self._renew(channel_id, deadline):
+                    renewed += 1
+            except Exception as e:
+                print(f"Renewing watch channel {channel_id} failed: {e}")
+        return renewed
+
+    async def _renew(self, channel_id: str, deadline: datetime) -> bool:
+        async with AsyncSession(self.engine, expire_on_commit=False) as db:
+            # SKIP LOCKED so several app processes never renew the same channel twice
+            channel = (
+                await db.exec(
+                    select(GoogleWatchChannel)
+                    .where(GoogleWatchChannel.id == channel_id,
+                           GoogleWatchChannel.expiration < deadline)
+                    .with_for_update(skip_locked=True)
+                )
+            ).first()
+            if channel is None:
+                return False
+
+            user = await db.get(User, channel.user_id)
+            access_token = await token_manager.get_access_token(user) if user else None
+            old_id, old_resource = channel.id, channel.resource_id
+            if access_token:
+                await register_channel(db, user, access_token)
+            await db.delete(channel)
+            await db.commit()
+
+        if access_token:
+            # the new channel is live; stop the old one so Google doesn't notify twice
+            with user_quota(user.user_id):
+                await get_calendar_client().stop_channel(access_token, old_id, old_resource)
+        return True
@@ -0,0 +1,283 @@
+"""
+iCalendar (RFC 5545) export and import for bulk moves of calendar data.
+
+Both directions work on streams. Export turns events into VEVENT text as
+they come off a server-side cursor; import decodes the upload chunk by
+chunk, unfolds lines and yields one VEVENT at a time. Neither side holds a
+whole calendar in memory.
+
+Only what the events table can represent is kept: start, end, title,
+description, type (from CATEGORIES), and the RRULE subset of
+services/recurrence.py with EXDATEs. Times are stored in UTC; floating
+times (no Z, no TZID) are read as UTC.
+"""
+import codecs
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from models.models import EventType
+from services.recurrence import as_utc
+
+PRODID = "-//NSU Academic Scheduler//CSE299//EN"
+# VEVENTs per yielded chunk of the export
+EXPORT_CHUNK_EVENTS = 200
+
+Params = Dict[str, str]
+VEvent = Dict[str, List[Tuple[Params, str]]]
+
+
+# writing
+
+def _escape(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    # content lines are limited to 75 octets; continuations start with a space
+    raw = line.encode("utf-8")
+    if len(raw) <= 75:
+        return line + "\r\n"
+    parts, limit = [], 75
+    while raw:
+        cut = min(limit, len(raw))
+        # never split inside a UTF-8 sequence
+        while cut < len(raw) and (raw[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(raw[:cut].decode("utf-8"))
+        raw = raw[cut:]
+        limit = 74
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _stamp(value: datetime) -> str:
+    return as_utc(value).astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def vevent(event: Any, dtstamp: datetime) -> str:
+    """One event row (a series stays one VEVENT with its RRULE) as VEVENT text."""
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{event.id}@cse299",
+        f"DTSTAMP:{_stamp(dtstamp)}",
+        f"DTSTART:{_stamp(event.starts_at)}",
+        f"DTEND:{_stamp(event.ends_at)}",
+        f"SUMMARY:{_escape(event.title)}",
+    ]
+    if event.description:
+        lines.append(f"DESCRIPTION:{_escape(event.description)}")
+    event_type = event.type.value if isinstance(event.type, EventType) else event.type
+    lines.append(f"CATEGORIES:{_escape(event_type)}")
+    if event.recurrence_rule:
+        lines.append(f"RRULE:{event.recurrence_rule}")
+        if event.exdates:
+            lines.append("EXDATE:" + ",".join(
+                _stamp(datetime.combine(date.fromisoformat(d), event.task_time, tzinfo=timezone.utc))
+                for d in event.exdates
+            ))
+    lines.append("END:VEVENT")
+    return "".join(_fold(line) for line in lines)
+
+
+async def calendar_chunks(events: AsyncIterable[Any],
+                          chunk_events: int = EXPORT_CHUNK_EVENTS) -> AsyncIterator[bytes]:
+    """A VCALENDAR around `events`, encoded in chunks of `chunk_events` VEVENTs."""
+    yield (
+        "BEGIN:VCALENDAR\r\nVERSION:2.0\r\n"
+        f"PRODID:{PRODID}\r\nCALSCALE:GREGORIAN\r\nMETHOD:PUBLISH\r\n"
+    ).encode()
+    dtstamp = datetime.now(timezone.utc)
+    chunk: List[str] = []
+    async for event in events:
+        chunk.append(vevent(event, dtstamp))
+        if len(chunk) >= chunk_events:
+            yield "".join(chunk).encode("utf-8")
+            chunk = []
+    if chunk:
+        yield "".join(chunk).encode("utf-8")
+    yield b"END:VCALENDAR\r\n"
+
+
+# reading
+
+def _unescape(text: str) -> str:
+    return re.sub(r"\\([\\;,nN])", lambda m: "\n" if m.group(1) in "nN" else m.group(1), text)
+
+
+def _split_line(line: str) -> Tuple[str, Params, str]:
+    """NAME;PARAM=VALUE;...:value -> (NAME, params, value)."""
+    in_quotes = False
+    for i, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ":" and not in_quotes:
+            head, value = line[:i], line[i + 1:]
+            break
+    else:
+        raise ValueError(f"malformed content line {line[:40]!r}")
+    name, *raw_params = head.split(";")
+    params = {}
+    for param in raw_params:
+        key, _, val = param.partition("=")
+        params[key.upper()] = val.strip('"')
+    return name.upper(), params, value
+
+
+async def _lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    for line in pending.split("\n"):
+        yield line.rstrip("\r")
+
+
+async def _unfolded_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    current: Optional[str] = None
+    async for line in _lines(chunks):
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+async def read_vevents(chunks: AsyncIterable[bytes]) -> AsyncIterator[VEvent]:
+    """Each top-level VEVENT of an iCalendar stream as {NAME: [(params, value), ...]}."""
+    depth = 0  # nesting below the VEVENT (VALARM, ...), whose lines are skipped
+    current: Optional[VEvent] = None
+    async for line in _unfolded_lines(chunks):
+        if line.upper().startswith(("BEGIN:", "END:")):
+            keyword, _, component = line.partition(":")
+            component = component.strip().upper()
+            if keyword.upper() == "BEGIN":
+                if current is None and component == "VEVENT":
+                    current = {}
+                elif current is not None:
+                    depth += 1
+            elif current is not None:
+                if depth:
+                    depth -= 1
+                elif component == "VEVENT":
+                    yield current
+                    current = None
+            continue
+        if current is None or depth:
+            continue
+        try:
+            name, params, value = _split_line(line)
+        except ValueError:
+            continue
+        current.setdefault(name, []).append((params, value))
+
+
+def _parse_datetime(value: str, params: Params) -> Tuple[datetime, bool]:
+    """(UTC instant, is_all_day) of a DATE or DATE-TIME value."""
+    value = value.strip()
+    if params.get("VALUE", "").upper() == "DATE" or len(value) == 8:
+        day = datetime.strptime(value, "%Y%m%d")
+        return day.replace(tzinfo=timezone.utc), True
+    if value.endswith("Z"):
+        return datetime.strptime(value[:-1], "%Y%m%dT%H%M%S").replace(tzinfo=timezone.utc), False
+    local = datetime.strptime(value, "%Y%m%dT%H%M%S")
+    tzinfo = timezone.utc
+    if "TZID" in params:
+        try:
+            tzinfo = ZoneInfo(params["TZID"])
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    return local.replace(tzinfo=tzinfo).astimezone(timezone.utc), False
+
+
+_DURATION = re.compile(
+    r"^(?P<sign>[+-])?P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?"
+    r"(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$"
+)
+
+
+# longer is not a calendar entry (and P999999999W does not fit a timedelta)
+MAX_DURATION = timedelta(days=366)
+_DURATION_SECONDS = {"weeks": 7 * 86400, "days": 86400, "hours": 3600, "minutes": 60, "seconds": 1}
+
+
+def _parse_duration(value: str) -> timedelta:
+    match = _DURATION.match(value.strip().upper())
+    if not match:
+        raise ValueError(f"invalid DURATION {value!r}")
+    seconds = sum(
+        int(v) * _DURATION_SECONDS[k] for k, v in match.groupdict().items() if v and k != "sign"
+    )
+    if seconds > MAX_DURATION.total_seconds():
+        raise ValueError(f"DURATION {value!r} is longer than {MAX_DURATION.days} days")
+    duration = timedelta(seconds=seconds)
+    return -duration if match.group("sign") == "-" else duration
+
+
+def _first(vevent: VEvent, name: str) -> Optional[Tuple[Params, str]]:
+    values = vevent.get(name)
+    return values[0] if values else None
+
+
+def vevent_uid(vevent: VEvent) -> str:
+    uid = _first(vevent, "UID")
+    return uid[1] if uid else "(no UID)"
+
+
+def event_fields(vevent: VEvent, default_type: EventType) -> Dict[str, Any]:
+    """EventCreate fields for one VEVENT; raises ValueError if it cannot be stored."""
+    dtstart = _first(vevent, "DTSTART")
+    if dtstart is None:
+        raise ValueError("missing DTSTART")
+    start, all_day = _parse_datetime(dtstart[1], dtstart[0])
+
+    dtend, duration_value = _first(vevent, "DTEND"), _first(vevent, "DURATION")
+    if dtend:
+        duration = _parse_datetime(dtend[1], dtend[0])[0] - start
+    elif duration_value:
+        duration = _parse_duration(duration_value[1])
+    else:
+        duration = timedelta(days=1) if all_day else timedelta(hours=1)
+    if duration < timedelta(0):
+        raise ValueError("DTEND is before DTSTART")
+    if duration > MAX_DURATION:
+        raise ValueError(f"event is longer than {MAX_DURATION.days} days")
+
+    event_type = default_type
+    for _, categories in vevent.get("CATEGORIES", []):
+        for category in categories.split(","):
+            try:
+                event_type = EventType(_unescape(category).strip().lower())
+                break
+            except ValueError:
+                continue
+
+    summary = _first(vevent, "SUMMARY")
+    description = _first(vevent, "DESCRIPTION")
+    rrule = _first(vevent, "RRULE")
+    exdates = []
+    for params, value in vevent.get("EXDATE", []):
+        for item in value.split(","):
+            if item.strip():
+                exdates.append(_parse_datetime(item, params)[0].date())
+
+    return {
+        "title": _unescape(summary[1]).strip() if summary else "(untitled)",
+        "description": _unescape(description[1]) if description else None,
+        "type": event_type,
+        "event_date": datetime.combine(start.date(), time.min, tzinfo=timezone.utc),
+        "task_time": start.time(),
+        "duration_minutes": int(duration.total_seconds() // 60),
+        "recurrence": rrule[1] if rrule else None,
+        "exdates": exdates or None,
+    }
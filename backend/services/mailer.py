@@ -0,0 +1,110 @@
+import uuid
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import httpx
+
+from config import settings
+
+
+@dataclass(frozen=True)
+class MailMessage:
+    to_email: str
+    to_name: Optional[str]
+    subject: str
+    html: str
+    text: str
+
+
+class MailDeliveryError(Exception):
+    """
+    A batch could not be handed to the provider.
+
+    `maybe_sent` is True when the request may have reached the provider (e.g. a
+    read timeout), so the caller must not retry it without risking duplicates.
+    """
+
+    def __init__(self, message: str, maybe_sent: bool, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.maybe_sent = maybe_sent
+        self.status_code = status_code
+
+
+class BrevoMailer:
+    """
+    Brevo transactional email, many recipients per call via `messageVersions`.
+
+    One pooled HTTP client is kept for the mailer's lifetime.
+    """
+
+    def __init__(self, api_key: str, url: str = settings.BREVO_API_URL,
+                 batch_size: int = settings.BREVO_BATCH_SIZE):
+        self.url = url
+        self.batch_size = batch_size
+        self.http = httpx.AsyncClient(
+            headers={"api-key": api_key, "accept": "application/json"},
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+
+    async def send_batch(self, messages: Sequence[MailMessage]) -> List[Optional[str]]:
+        """Send up to `batch_size` messages in one request; returns provider message ids."""
+        first = messages[0]
+        body = {
+            "sender": {"email": settings.MAIL_SENDER_EMAIL, "name": settings.MAIL_SENDER_NAME},
+            # top-level content is required; every version overrides it
+            "subject": first.subject,
+            "htmlContent": first.html,
+            "messageVersions": [
+                {
+                    "to": [{"email": m.to_email, **({"name": m.to_name} if m.to_name else {})}],
+                    "subject": m.subject,
+                    "htmlContent": m.html,
+                    "textContent": m.text,
+                }
+                for m in messages
+            ],
+        }
+        try:
+            response = await self.http.post(self.url, json=body)
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+            raise MailDeliveryError(f"Brevo unreachable: {e}", maybe_sent=False) from e
+        except httpx.HTTPError as e:
+            raise MailDeliveryError(f"Brevo request failed: {e}", maybe_sent=True) from e
+
+        if response.status_code >= 400:
+            # Brevo validates the whole request before queueing any version
+            raise MailDeliveryError(
+                f"Brevo error {response.status_code}: {response.text[:500]}",
+                maybe_sent=False,
+                status_code=response.status_code,
+            )
+        ids = response.json().get("messageIds") or []
+        return [ids[i] if i < len(ids) else None for i in range(len(messages))]
+
+    async def close(self) -> None:
+        await self.http.aclose()
+
+
+class StubMailer:
+    """Keeps messages in memory instead of sending them (tests, local development)."""
+
+    def __init__(self, batch_size: int = settings.BREVO_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.outbox: List[MailMessage] = []
+
+    async def send_batch(self, messages: Sequence[MailMessage]) -> List[Optional[str]]:
+        self.outbox.extend(messages)
+        print(f"StubMailer: {len(messages)} message(s), e.g. {messages[0].subject!r} to {messages[0].to_email}")
+        return [f"stub-{uuid.uuid4()}" for _ in messages]
+
+    async def close(self) -> None:
+        pass
+
+
+def build_mailer():
+    if settings.MAILER_BACKEND == "brevo":
+        if not settings.BREVO_API_KEY:
+            raise RuntimeError("MAILER_BACKEND=brevo requires BREVO_API_KEY")
+        return BrevoMailer(settings.BREVO_API_KEY)
+    return StubMailer()
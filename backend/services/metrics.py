@@ -0,0 +1,185 @@
+"""
+Prometheus metrics: per-route latency, in-flight requests, and the time
+each request spends in the database, in Google API calls and in token
+refreshes.
+
+`MetricsMiddleware` times every request under its route template (e.g.
+/api/courses/{code}) and owns a per-request `_Spans` accumulator in a
+context variable. `span("google")` blocks and the SQLAlchemy cursor hooks
+installed by `instrument_engine` add their time to it, so each route also
+gets a histogram of how much of its latency was DB, Google or token
+refresh. Everything is served by /metrics in the Prometheus text format.
+
+With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty
+directory so /metrics aggregates all of them.
+"""
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# request latencies range from a cached 304 (sub-ms) to a cold Google sync
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# google_quota: waiting for a Google quota token (services/google_quota.py)
+SPANS = ("db", "google", "google_quota", "token_refresh")
+UNMATCHED_ROUTE = "<unmatched>"
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template",
+    ("method", "route", "status"),
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requests currently being handled",
+    multiprocess_mode="livesum",
+)
+REQUEST_SPAN_SECONDS = Histogram(
+    "http_request_span_seconds",
+    "Time one request spent in each kind of dependency",
+    ("route", "span"),
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds",
+    "SQL statement execution time",
+    ("statement",),
+    buckets=LATENCY_BUCKETS,
+)
+GOOGLE_REQUEST_SECONDS = Histogram(
+    "google_api_request_duration_seconds",
+    "Google API round-trips, one per attempt",
+    ("endpoint", "status"),
+    buckets=LATENCY_BUCKETS,
+)
+TOKEN_REFRESHES = Counter(
+    "google_token_refreshes_total",
+    "Google access token refreshes",
+    ("result",),
+)
+
+
+class _Spans:
+    __slots__ = ("seconds",)
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = dict.fromkeys(SPANS, 0.0)
+
+
+# a mutable object, so time recorded in tasks spawned by the request still counts
+_current: ContextVar[Optional[_Spans]] = ContextVar("request_spans", default=None)
+
+
+def _add(name: str, seconds: float) -> None:
+    spans = _current.get()
+    if spans is not None:
+        spans.seconds[name] += seconds
+
+
+class span:
+    """`with span("google"): ...` adds the block's duration to the current request."""
+    __slots__ = ("name", "_start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _add(self.name, time.perf_counter() - self._start)
+
+
+def observe_google(endpoint: str, status: str, seconds: float) -> None:
+    GOOGLE_REQUEST_SECONDS.labels(endpoint, status).observe(seconds)
+    _add("google", seconds)
+
+
+def _statement_kind(statement: str) -> str:
+    head = statement.lstrip()[:6].lower()
+    for kind in ("select", "insert", "update", "delete"):
+        if head.startswith(kind):
+            return kind
+    return "other"
+
+
+def instrument_engine(target: Engine) -> None:
+    """Time every statement run on `target` (for async engines, pass .sync_engine)."""
+
+    @event.listens_for(target, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(target, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_start"].pop()
+        DB_QUERY_SECONDS.labels(_statement_kind(statement)).observe(seconds)
+        _add("db", seconds)
+
+    @event.listens_for(target, "handle_error")
+    def _failed(exception_context):
+        # after_cursor_execute does not run for failed statements
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: no extra task or body buffering per request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        spans = _Spans()
+        token = _current.set(spans)
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            _current.reset(token)
+            route = scope.get("route")
+            # the template, not the raw path, so ids do not explode the label set
+            name = getattr(route, "path", None) or UNMATCHED_ROUTE
+            HTTP_REQUEST_SECONDS.labels(scope["method"], name, status).observe(elapsed)
+            for span_name, seconds in spans.seconds.items():
+                if seconds:
+                    REQUEST_SPAN_SECONDS.labels(name, span_name).observe(seconds)
+
+
+def render() -> bytes:
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
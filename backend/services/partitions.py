@@ -0,0 +1,246 @@
+"""
+Semester partitions of the `events` table (Postgres only).
+
+Since alembic 0011, `events` is range-partitioned on active_until, the last
+instant an event can appear on a calendar (models.event_active_until). There
+is one partition per semester of the university's trimester calendar
+(Spring: January-April, Summer: May-August, Fall: September-December), plus
+a DEFAULT partition for endless series and anything past the newest
+semester. The key is when an event is over, not when it starts, so a past
+semester's partition holds only events nobody will see again:
+
+* window queries add `active_until > start`, so Postgres prunes every
+  semester that ended before the window, and indexes, vacuum and the
+  planner only deal with the current semesters;
+* `ensure_partitions` keeps the current semester and EVENT_PARTITIONS_AHEAD
+  more created, moving any rows the DEFAULT partition already holds for
+  them;
+* `archive_partition` detaches a semester over for more than
+  EVENT_ARCHIVE_AFTER_SEMESTERS, drops its secondary indexes and moves it
+  into EVENT_ARCHIVE_SCHEMA (and EVENT_ARCHIVE_TABLESPACE, if set). There
+  it can still be queried, but the live table does not pay for it.
+
+Each step runs under a transaction-level advisory lock, so every app
+process may run the maintainer. Run in-process with
+EVENT_PARTITIONS_ENABLED, or standalone (e.g. from cron):
+
+    python -m services.partitions [--once]
+"""
+import asyncio
+import re
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from config import settings
+from services.recurrence import as_utc
+
+TERMS = ("spring", "summer", "fall")
+TERM_MONTHS = 4
+DEFAULT_PARTITION = "events_default"
+_PARTITION_NAME = re.compile(r"^events_(\d{4})_(%s)$" % "|".join(TERMS))
+# creating and detaching partitions lock events exclusively; rather than
+# queue every request behind a long-running query, give up until the next run
+LOCK_TIMEOUT = "5s"
+
+
+@dataclass(frozen=True, order=True)
+class Semester:
+    year: int
+    term: int  # index into TERMS
+
+    @classmethod
+    def containing(cls, when: datetime) -> "Semester":
+        when = as_utc(when).astimezone(timezone.utc)
+        return cls(when.year, (when.month - 1) // TERM_MONTHS)
+
+    @classmethod
+    def from_table(cls, name: str) -> Optional["Semester"]:
+        match = _PARTITION_NAME.match(name)
+        if match is None:
+            return None
+        return cls(int(match.group(1)), TERMS.index(match.group(2)))
+
+    def shift(self, semesters: int) -> "Semester":
+        return Semester(*divmod(self.year * len(TERMS) + self.term + semesters, len(TERMS)))
+
+    @property
+    def start(self) -> datetime:
+        return datetime(self.year, self.term * TERM_MONTHS + 1, 1, tzinfo=timezone.utc)
+
+    @property
+    def end(self) -> datetime:
+        return self.shift(1).start
+
+    @property
+    def table(self) -> str:
+        return f"events_{self.year}_{TERMS[self.term]}"
+
+    @property
+    def bounds(self) -> str:
+        # DDL takes no bind parameters; both values are generated here
+        return f"FOR VALUES FROM ('{self.start.isoformat()}') TO ('{self.end.isoformat()}')"
+
+
+async def _try_lock(conn: AsyncConnection) -> bool:
+    await conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+    return bool(await conn.scalar(
+        text("SELECT pg_try_advisory_xact_lock(hashtext('events_partitions'))")
+    ))
+
+
+async def attached_partitions(conn: AsyncConnection) -> List[str]:
+    rows = await conn.scalars(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'events'::regclass ORDER BY c.relname"
+    ))
+    return list(rows)
+
+
+async def ensure_partitions(conn: AsyncConnection, now: datetime, ahead: int) -> List[str]:
+    """Create the partitions of the current and next `ahead` semesters; returns the new ones."""
+    existing = set(await attached_partitions(conn))
+    current = Semester.containing(now)
+    created = []
+    for semester in (current.shift(i) for i in range(ahead + 1)):
+        if semester.table in existing:
+            continue
+        in_range = "active_until >= :lo AND active_until < :hi"
+        params = {"lo": semester.start, "hi": semester.end}
+        strays = await conn.scalar(
+            text(f"SELECT count(*) FROM {DEFAULT_PARTITION} WHERE {in_range}"), params
+        )
+        if strays:
+            # a new partition may not overlap rows already in DEFAULT: take
+            # DEFAULT out, route its rows for this semester, put it back
+            await conn.execute(text(f"ALTER TABLE events DETACH PARTITION {DEFAULT_PARTITION}"))
+            await conn.execute(text(f"CREATE TABLE {semester.table} PARTITION OF events {semester.bounds}"))
+            await conn.execute(
+                text(f"INSERT INTO events SELECT * FROM {DEFAULT_PARTITION} WHERE {in_range}"), params
+            )
+            await conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_range}"), params)
+            await conn.execute(text(f"ALTER TABLE events ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+        else:
+            await conn.execute(text(f"CREATE TABLE {semester.table} PARTITION OF events {semester.bounds}"))
+        created.append(semester.table)
+    return created
+
+
+def archivable(partitions: List[str], now: datetime, archive_after: int) -> List[str]:
+    """Semester partitions over for more than `archive_after` semesters (0: none)."""
+    if archive_after <= 0:
+        return []
+    cutoff = Semester.containing(now).shift(-archive_after)
+    return [
+        name for name in partitions
+        if (semester := Semester.from_table(name)) is not None and semester < cutoff
+    ]
+
+
+async def archive_partition(conn: AsyncConnection, name: str, schema: str,
+                            tablespace: Optional[str] = None) -> None:
+    """Detach `name` from events and move it, primary key only, into `schema`."""
+    await conn.execute(text(f"ALTER TABLE events DETACH PARTITION {name}"))
+    # the secondary indexes served the app's queries; cold storage keeps the key
+    indexes = await conn.scalars(
+        text("SELECT indexrelid::regclass::text FROM pg_index "
+             "WHERE indrelid = CAST(:name AS regclass) AND NOT indisprimary"),
+        {"name": name},
+    )
+    for index in list(indexes):
+        await conn.execute(text(f"DROP INDEX {index}"))
+    await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+    await conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {schema}"))
+    if tablespace:
+        # rewrites the table (and its key) compactly onto the cheaper storage
+        await conn.execute(text(f"ALTER TABLE {schema}.{name} SET TABLESPACE {tablespace}"))
+        await conn.execute(text(f"ALTER INDEX {schema}.{name}_pkey SET TABLESPACE {tablespace}"))
+
+
+class PartitionMaintainer:
+    """Creates upcoming semester partitions of `events` and archives old ones."""
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        ahead: int = settings.EVENT_PARTITIONS_AHEAD,
+        archive_after: int = settings.EVENT_ARCHIVE_AFTER_SEMESTERS,
+        archive_schema: str = settings.EVENT_ARCHIVE_SCHEMA,
+        archive_tablespace: Optional[str] = settings.EVENT_ARCHIVE_TABLESPACE or None,
+        interval: float = settings.EVENT_PARTITION_CHECK_SECONDS,
+    ):
+        self.engine = engine
+        self.ahead = ahead
+        self.archive_after = archive_after
+        self.archive_schema = archive_schema
+        self.archive_tablespace = archive_tablespace
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None and self.engine.dialect.name == "postgresql":
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Event partition maintenance failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self, now: Optional[datetime] = None) -> Dict[str, List[str]]:
+        """One maintenance pass; returns the partitions created and archived."""
+        done: Dict[str, List[str]] = {"created": [], "archived": []}
+        if self.engine.dialect.name != "postgresql":
+            return done
+        now = now or datetime.now(timezone.utc)
+
+        async with self.engine.begin() as conn:
+            if not await _try_lock(conn):
+                return done  # another process is on it
+            done["created"] = await ensure_partitions(conn, now, self.ahead)
+            old = archivable(await attached_partitions(conn), now, self.archive_after)
+
+        # one transaction per partition: each holds the exclusive lock briefly
+        for name in old:
+            async with self.engine.begin() as conn:
+                if not await _try_lock(conn):
+                    break
+                await archive_partition(conn, name, self.archive_schema, self.archive_tablespace)
+            done["archived"].append(name)
+        return done
+
+
+async def _main(once: bool) -> None:
+    from database import dispose_engines, get_async_engine
+
+    maintainer = PartitionMaintainer(get_async_engine())
+    try:
+        if once:
+            done = await maintainer.run_once()
+            print(f"Created {done['created'] or 'no'} partitions, archived {done['archived'] or 'none'}")
+        else:
+            maintainer.start()
+            if maintainer._task is not None:
+                await maintainer._task
+    finally:
+        await maintainer.stop()
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(_main(once="--once" in sys.argv[1:]))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,360 @@
+"""
+Recurring events: a small RRULE subset plus exception dates.
+
+A recurring `Event` row is the series; its occurrences are never stored.
+They are generated on demand for the requested window, jumping straight to
+the first period inside the window instead of stepping from the series start,
+so a query for week 12 of a semester costs the same as one for week 1.
+
+Supported rules (RFC 5545 syntax, without the "RRULE:" prefix):
+
+    FREQ=DAILY|WEEKLY|MONTHLY
+    INTERVAL=n          (default 1)
+    BYDAY=MO,WE,...     (WEEKLY only; defaults to the weekday of the start)
+    COUNT=n | UNTIL=YYYYMMDD[THHMMSSZ]
+
+COUNT, UNTIL and INTERVAL are capped (MAX_COUNT, MAX_UNTIL, MAX_INTERVAL),
+so a series' last occurrence is always a representable date.
+"""
+import calendar
+import heapq
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import count as counter
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from models.models import event_bounds
+
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+# far beyond any semester plan; anything larger is a typo or an attack
+MAX_COUNT = 1000
+MAX_INTERVAL = 1000
+MAX_UNTIL = datetime(2200, 1, 1, tzinfo=timezone.utc)
+
+
+def as_utc(value: datetime) -> datetime:
+    # event_date is timestamptz, but sqlite hands it back naive
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _parse_until(value: str) -> datetime:
+    if "T" in value:
+        parsed = datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+    else:
+        # a bare date includes the whole day
+        parsed = datetime.combine(datetime.strptime(value, "%Y%m%d").date(), time.max)
+    return parsed.replace(tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True)
+class RecurrenceRule:
+    freq: str
+    interval: int = 1
+    byday: Tuple[int, ...] = ()
+    count: Optional[int] = None
+    until: Optional[datetime] = None
+
+    @classmethod
+    def parse(cls, value: str) -> "RecurrenceRule":
+        """Parse an RRULE string; raises ValueError for anything outside the subset."""
+        if value.upper().startswith("RRULE:"):
+            value = value[len("RRULE:"):]
+        parts = {}
+        for part in value.strip().split(";"):
+            if not part:
+                continue
+            key, sep, val = part.partition("=")
+            if not sep:
+                raise ValueError(f"malformed RRULE part {part!r}")
+            parts[key.strip().upper()] = val.strip().upper()
+
+        unknown = set(parts) - {"FREQ", "INTERVAL", "BYDAY", "COUNT", "UNTIL", "WKST"}
+        if unknown:
+            raise ValueError(f"unsupported RRULE parts: {', '.join(sorted(unknown))}")
+        freq = parts.get("FREQ")
+        if freq not in FREQUENCIES:
+            raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+
+        interval = int(parts.get("INTERVAL", 1))
+        if not 1 <= interval <= MAX_INTERVAL:
+            raise ValueError(f"INTERVAL must be between 1 and {MAX_INTERVAL}")
+
+        byday: Tuple[int, ...] = ()
+        if "BYDAY" in parts:
+            if freq != "WEEKLY":
+                raise ValueError("BYDAY is only supported with FREQ=WEEKLY")
+            try:
+                byday = tuple(sorted({WEEKDAYS.index(d) for d in parts["BYDAY"].split(",")}))
+            except ValueError:
+                raise ValueError(f"invalid BYDAY {parts['BYDAY']!r}") from None
+
+        if "COUNT" in parts and "UNTIL" in parts:
+            raise ValueError("COUNT and UNTIL cannot both be set")
+        count = int(parts["COUNT"]) if "COUNT" in parts else None
+        if count is not None and not 1 <= count <= MAX_COUNT:
+            raise ValueError(f"COUNT must be between 1 and {MAX_COUNT}")
+        until = _parse_until(parts["UNTIL"]) if "UNTIL" in parts else None
+        if until is not None and until >= MAX_UNTIL:
+            raise ValueError(f"UNTIL must be before {MAX_UNTIL.year}")
+
+        return cls(freq=freq, interval=interval, byday=byday, count=count, until=until)
+
+    def to_rrule(self) -> str:
+        """Canonical form, as stored in `events.recurrence_rule`."""
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.byday:
+            parts.append("BYDAY=" + ",".join(WEEKDAYS[d] for d in self.byday))
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        if self.until is not None:
+            parts.append("UNTIL=" + self.until.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ"))
+        return ";".join(parts)
+
+    def starts(self, dtstart: datetime, lower: Optional[datetime] = None) -> Iterator[datetime]:
+        """
+        Occurrence starts in order, beginning at the first one >= `lower`.
+
+        The generator is unbounded for rules without COUNT/UNTIL, so callers
+        stop it themselves (window end or page size).
+        """
+        dtstart = as_utc(dtstart)
+        lower = max(as_utc(lower), dtstart) if lower else dtstart
+        if self.freq == "MONTHLY":
+            candidates = self._monthly(dtstart, lower)
+        else:
+            candidates = self._daily_or_weekly(dtstart, lower)
+
+        try:
+            for index, start in candidates:
+                if self.count is not None and index >= self.count:
+                    return
+                if self.until is not None and start > self.until:
+                    return
+                if start >= lower:
+                    yield start
+        except OverflowError:
+            # an endless series read far out: nothing after year 9999
+            return
+
+    def _daily_or_weekly(self, dtstart: datetime, lower: datetime) -> Iterator[Tuple[int, datetime]]:
+        if self.freq == "DAILY":
+            step = timedelta(days=self.interval)
+            first = max(0, -((dtstart - lower) // step))  # ceil((lower - dtstart) / step)
+            for k in counter(first):
+                yield k, dtstart + k * step
+            return
+
+        days = self.byday or (dtstart.weekday(),)
+        step = timedelta(weeks=self.interval)
+        anchor = dtstart - timedelta(days=dtstart.weekday())  # Monday of the first week
+        # days of the first week that fall before dtstart are not occurrences
+        skipped = sum(1 for d in days if d < dtstart.weekday())
+        first_week = max(0, (lower - anchor) // step)
+        for week in counter(first_week):
+            base = anchor + week * step
+            for position, day in enumerate(days):
+                index = week * len(days) + position - skipped
+                if index >= 0:
+                    yield index, base + timedelta(days=day)
+
+    def _month_start(self, dtstart: datetime, k: int) -> Optional[datetime]:
+        """Start in the k-th period of a MONTHLY rule; None if that month lacks the day."""
+        months = dtstart.month - 1 + k * self.interval
+        year, month = dtstart.year + months // 12, months % 12 + 1
+        if year > datetime.max.year:
+            raise OverflowError("date value out of range")
+        # months without this day (e.g. the 31st) are skipped, as in RFC 5545
+        if dtstart.day > calendar.monthrange(year, month)[1]:
+            return None
+        return dtstart.replace(year=year, month=month)
+
+    def _monthly(self, dtstart: datetime, lower: datetime) -> Iterator[Tuple[int, datetime]]:
+        months_to_lower = (lower.year - dtstart.year) * 12 + lower.month - dtstart.month
+        first = max(0, months_to_lower // self.interval)
+        # COUNT needs the number of occurrences before the jump; only months
+        # without the start day are uncounted, so this is a short scan
+        index = 0
+        if self.count:
+            index = sum(1 for k in range(first) if self._month_start(dtstart, k) is not None)
+        for k in counter(first):
+            start = self._month_start(dtstart, k)
+            if start is None:
+                continue
+            yield index, start
+            index += 1
+
+    def last_start(self, dtstart: datetime) -> Optional[datetime]:
+        """
+        Start of the final occurrence; None if the series never ends (or has
+        no occurrence at all).
+
+        Computed from COUNT/UNTIL directly rather than by stepping through
+        the series. Only MONTHLY with COUNT scans, over at most MAX_COUNT
+        occurrences, since months without the start day are not counted.
+        """
+        if self.count is None and self.until is None:
+            return None
+        try:
+            return self._last_start(as_utc(dtstart))
+        except OverflowError:
+            raise ValueError("series ends after the last representable date") from None
+
+    def _last_start(self, dtstart: datetime) -> Optional[datetime]:
+        if self.freq == "MONTHLY":
+            return self._monthly_last(dtstart)
+        if self.freq == "DAILY":
+            step = timedelta(days=self.interval)
+            if self.count is not None:
+                return dtstart + (self.count - 1) * step
+            if self.until < dtstart:
+                return None
+            return dtstart + ((self.until - dtstart) // step) * step
+
+        days = self.byday or (dtstart.weekday(),)
+        step = timedelta(weeks=self.interval)
+        anchor = dtstart - timedelta(days=dtstart.weekday())
+        if self.count is not None:
+            skipped = sum(1 for d in days if d < dtstart.weekday())
+            week, position = divmod(self.count - 1 + skipped, len(days))
+            return anchor + week * step + timedelta(days=days[position])
+        if self.until < dtstart:
+            return None
+        # the last occurrence is in the week holding UNTIL, or the one before
+        week = (self.until - anchor) // step
+        for base in (anchor + week * step, anchor + (week - 1) * step):
+            for day in reversed(days):
+                start = base + timedelta(days=day)
+                if dtstart <= start <= self.until:
+                    return start
+        return None
+
+    def _monthly_last(self, dtstart: datetime) -> Optional[datetime]:
+        if self.count is not None:
+            found, last = 0, None
+            for found, last in enumerate(self.starts(dtstart), 1):
+                pass
+            if found < self.count:
+                # starts() stops at the end of the calendar
+                raise OverflowError("date value out of range")
+            return last
+        if self.until < dtstart:
+            return None
+        months = (self.until.year - dtstart.year) * 12 + self.until.month - dtstart.month
+        # step back past months without the start day (at most a few)
+        for k in range(months // self.interval, -1, -1):
+            start = self._month_start(dtstart, k)
+            if start is not None and start <= self.until:
+                return start
+        return None
+
+
+def normalize_rule(value: str) -> str:
+    return RecurrenceRule.parse(value).to_rrule()
+
+
+def recurrence_until(rule: Optional[str], dtstart: datetime) -> Optional[datetime]:
+    """Value for `events.recurrence_until`; None for single events and endless series."""
+    if not rule:
+        return None
+    return RecurrenceRule.parse(rule).last_start(dtstart)
+
+
+@dataclass(frozen=True)
+class Occurrence:
+    """One generated instance of a recurring event; shaped like an `Event` row."""
+    id: uuid.UUID
+    series_id: uuid.UUID
+    user_id: uuid.UUID
+    title: str
+    description: Optional[str]
+    type: Any
+    event_date: datetime
+    task_time: time
+    duration_minutes: int
+    starts_at: datetime
+    ends_at: datetime
+    is_synced: bool
+    recurrence_rule: str
+    exdates: Optional[List[str]]
+    course_id: Optional[uuid.UUID] = None
+    is_shared: bool = False
+
+
+def occurrence_id(series_id: uuid.UUID, start: datetime) -> uuid.UUID:
+    # stable across requests, so clients and cursors can refer to an instance
+    return uuid.uuid5(series_id, start.date().isoformat())
+
+
+def sort_key(event: Any) -> Tuple[datetime, uuid.UUID]:
+    return as_utc(event.starts_at), event.id
+
+
+def _series_occurrences(series: Any, lower: Optional[datetime],
+                        upper: Optional[datetime]) -> Iterator[Occurrence]:
+    rule = RecurrenceRule.parse(series.recurrence_rule)
+    skip = {date.fromisoformat(d) for d in (series.exdates or [])}
+    # the rule steps event_date while the occurrence runs from its day's
+    # task_time, so start a day plus one duration early and filter below
+    slack = timedelta(days=1, minutes=series.duration_minutes or 60)
+    for start in rule.starts(series.event_date, lower - slack if lower else None):
+        if start.date() in skip:
+            continue
+        starts_at, ends_at = event_bounds(start, series.task_time, series.duration_minutes)
+        if upper is not None and starts_at >= upper:
+            return
+        if lower is not None and ends_at <= lower:
+            continue
+        yield Occurrence(
+            id=occurrence_id(series.id, start),
+            series_id=series.id,
+            user_id=series.user_id,
+            title=series.title,
+            description=series.description,
+            type=series.type,
+            event_date=start,
+            task_time=series.task_time,
+            duration_minutes=series.duration_minutes,
+            starts_at=starts_at,
+            ends_at=ends_at,
+            is_synced=series.is_synced,
+            recurrence_rule=series.recurrence_rule,
+            exdates=series.exdates,
+            course_id=getattr(series, "course_id", None),
+            is_shared=getattr(series, "is_shared", False),
+        )
+
+
+def expand(series: Iterable[Any], lower: Optional[datetime] = None,
+           upper: Optional[datetime] = None) -> Iterator[Occurrence]:
+    """
+    Occurrences of all `series` overlapping [lower, upper), merged into one
+    stream ordered like GET /api/events (starts_at, id).
+
+    Every series is expanded lazily, so consuming only the first N items
+    costs O(N log S) for S series, even when upper is None.
+    """
+    streams: Sequence[Iterator[Occurrence]] = [
+        _series_occurrences(s, lower, upper) for s in series
+    ]
+    return heapq.merge(*streams, key=sort_key)
+
+
+def google_recurrence(event: Any) -> Optional[List[str]]:
+    """The `recurrence` field of a Calendar events resource for a series row."""
+    if not getattr(event, "recurrence_rule", None):
+        return None
+    lines = ["RRULE:" + event.recurrence_rule]
+    if event.exdates:
+        # EXDATE must match the instance start, which google_event_body sends in UTC
+        stamps = [
+            datetime.combine(date.fromisoformat(d), event.task_time).strftime("%Y%m%dT%H%M%S")
+            for d in event.exdates
+        ]
+        lines.append("EXDATE;TZID=UTC:" + ",".join(stamps))
+    return lines
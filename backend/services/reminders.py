@@ -0,0 +1,480 @@
+"""
+Reminder emails: a daily digest for every user plus an early alert per exam.
+
+Planning and sending are separate steps, both safe to run in several
+processes at once:
+
+* the planner writes one `reminders` row per email it intends to send; the
+  unique `dedupe_key` (``digest:<user>:<date>``, ``exam:<event>:<date>``,
+  ``exam:<event>:<date>:<user>`` for students enrolled in a shared exam's course)
+  makes re-planning after a restart a no-op;
+* every tick claims due rows with a single query on the partial
+  `ix_reminders_pending_due_at` index (FOR UPDATE SKIP LOCKED), renders
+  them per user from one events query for the whole batch, and sends them
+  through the mailer in batches of `BREVO_BATCH_SIZE` messages.
+
+A row is moved to `sending` before the provider is called. If the process
+dies mid-send, that row is marked failed once its lease runs out instead of
+being retried, because the provider may already have delivered it: users
+miss at most one email but never get two.
+
+Run in-process with REMINDERS_ENABLED=true, or standalone:
+
+    python -m services.reminders [--once]
+"""
+import asyncio
+import html
+import random
+import sys
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import or_, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from models.models import Enrollment, Event, EventType, Reminder, ReminderKind, ReminderStatus, User
+from repositories.events import SERIES_SLACK, EventRepository
+from services.mailer import MailDeliveryError, MailMessage, build_mailer
+from services.recurrence import as_utc, expand
+
+# a claimed row whose worker died is given up on after this long
+SEND_LEASE = timedelta(minutes=10)
+# a digest planned after its hour (e.g. the app was down) is still sent this late
+DIGEST_GRACE = timedelta(hours=3)
+PLAN_USER_BATCH = 1000
+MAX_BACKOFF_SECONDS = 3600
+
+EXAM_TYPES = (EventType.exam, EventType.final)
+DEADLINE_TYPES = (EventType.assignment, EventType.project)
+
+
+def _backoff(attempts: int) -> timedelta:
+    # 1, 2, 4, ... minutes capped at an hour, with jitter
+    seconds = min(60 * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+    return timedelta(seconds=seconds * random.uniform(0.5, 1.0))
+
+
+def _insert_ignore(dialect: str):
+    """INSERT ... ON CONFLICT (dedupe_key) DO NOTHING for the reminders table."""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"reminders are not supported on {dialect}")
+    return insert(Reminder.__table__).on_conflict_do_nothing(index_elements=["dedupe_key"])
+
+
+def _row(user_id: uuid.UUID, kind: ReminderKind, dedupe_key: str, due_at: datetime,
+         now: datetime, event_id: Optional[uuid.UUID] = None) -> Dict[str, Any]:
+    return {
+        "id": uuid.uuid4(),
+        "user_id": user_id,
+        "kind": kind,
+        "event_id": event_id,
+        "dedupe_key": dedupe_key,
+        "due_at": due_at,
+        "status": ReminderStatus.pending,
+        "attempts": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+@dataclass
+class _Pending:
+    """A claimed reminder with its rendered email (None: nothing to report)."""
+    reminder: Reminder
+    message: Optional[MailMessage] = None
+
+
+class ReminderScheduler:
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        mailer=None,
+        concurrency: int = settings.REMINDER_CONCURRENCY,
+        poll_interval: float = settings.REMINDER_POLL_SECONDS,
+        plan_interval: float = settings.REMINDER_PLAN_INTERVAL_SECONDS,
+        claim_limit: int = settings.REMINDER_CLAIM_LIMIT,
+        max_attempts: int = settings.REMINDER_MAX_ATTEMPTS,
+    ):
+        self.engine = engine
+        self.mailer = mailer or build_mailer()
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.plan_interval = plan_interval
+        self.claim_limit = claim_limit
+        self.max_attempts = max_attempts
+        self.tz = ZoneInfo(settings.REMINDER_TIMEZONE)
+        self.digest_hour = settings.REMINDER_DIGEST_HOUR
+        self.exam_lead = timedelta(days=settings.REMINDER_EXAM_LEAD_DAYS)
+        self.deadline_lookahead = timedelta(days=settings.REMINDER_ASSIGNMENT_LOOKAHEAD_DAYS)
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._plan_loop()))
+        self._tasks.append(asyncio.create_task(self._send_loop()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.mailer.close()
+
+    async def _plan_loop(self) -> None:
+        while True:
+            try:
+                await self.plan()
+            except Exception as e:
+                print(f"Reminder planning failed: {e}")
+            await asyncio.sleep(self.plan_interval)
+
+    async def _send_loop(self) -> None:
+        while True:
+            try:
+                claimed = await self.tick()
+            except Exception as e:
+                print(f"Reminder tick failed: {e}")
+                claimed = 0
+            # a full batch means a backlog (e.g. digest time): keep going
+            if claimed < self.claim_limit:
+                await asyncio.sleep(self.poll_interval)
+
+    # planning
+
+    def digest_due_times(self, now: datetime) -> List[Tuple[date, datetime]]:
+        """(local date, due instant) of today's digest if still sendable, and tomorrow's."""
+        today = now.astimezone(self.tz).date()
+        due_times = []
+        for day in (today, today + timedelta(days=1)):
+            due_at = datetime.combine(day, time(self.digest_hour), tzinfo=self.tz)
+            due_at = due_at.astimezone(timezone.utc)
+            if due_at + DIGEST_GRACE > now:
+                due_times.append((day, due_at))
+        return due_times
+
+    async def plan(self, now: Optional[datetime] = None) -> None:
+        """Insert reminder rows for upcoming digests and exam alerts (idempotent)."""
+        now = now or datetime.now(timezone.utc)
+        async with AsyncSession(self.engine) as db:
+            insert_ignore = _insert_ignore(db.bind.dialect.name)
+            async for rows in self._digest_rows(db, now):
+                await db.execute(insert_ignore, rows)
+            exam_rows = await self._exam_rows(db, now)
+            if exam_rows:
+                await db.execute(insert_ignore, exam_rows)
+            await db.commit()
+
+    async def _digest_rows(self, db: AsyncSession, now: datetime):
+        # users are paged by primary key so one statement never carries the
+        # whole user base
+        due_times = self.digest_due_times(now)
+        after = None
+        while due_times:
+            query = select(User.user_id).order_by(User.user_id).limit(PLAN_USER_BATCH)
+            if after is not None:
+                query = query.where(User.user_id > after)
+            user_ids = (await db.exec(query)).all()
+            if not user_ids:
+                return
+            yield [
+                _row(user_id, ReminderKind.digest, f"digest:{user_id}:{day.isoformat()}", due_at, now)
+                for user_id in user_ids
+                for day, due_at in due_times
+            ]
+            if len(user_ids) < PLAN_USER_BATCH:
+                return
+            after = user_ids[-1]
+
+    async def _exam_rows(self, db: AsyncSession, now: datetime) -> List[Dict[str, Any]]:
+        # everything whose alert falls due before the next planning run
+        horizon = now + self.exam_lead + timedelta(seconds=self.plan_interval) + timedelta(days=1)
+        singles = (
+            await db.exec(
+                select(Event).where(
+                    Event.type.in_(EXAM_TYPES),
+                    Event.recurrence_rule.is_(None),
+                    Event.active_until > now,
+                    Event.starts_at > now,
+                    Event.starts_at < horizon,
+                )
+            )
+        ).all()
+        series = (
+            await db.exec(
+                select(Event).where(
+                    Event.type.in_(EXAM_TYPES),
+                    Event.recurrence_rule.is_not(None),
+                    or_(Event.recurrence_until.is_(None),
+                        Event.recurrence_until >= now - SERIES_SLACK),
+                    Event.active_until > now,
+                    Event.starts_at < horizon,
+                )
+            )
+        ).all()
+
+        items = list(singles) + list(expand(series, now, horizon))
+        # a shared course exam alerts everyone enrolled, not just the poster
+        readers: Dict[uuid.UUID, List[uuid.UUID]] = defaultdict(list)
+        shared_courses = {item.course_id for item in items if item.is_shared}
+        if shared_courses:
+            enrollments = await db.exec(
+                select(Enrollment.course_id, Enrollment.user_id)
+                .where(Enrollment.course_id.in_(shared_courses))
+            )
+            for course_id, user_id in enrollments.all():
+                readers[course_id].append(user_id)
+
+        rows = []
+        for item in items:
+            starts_at = as_utc(item.starts_at)
+            if starts_at <= now:
+                continue
+            event_id = getattr(item, "series_id", item.id)
+            day = starts_at.astimezone(self.tz).date().isoformat()
+            due_at = max(starts_at - self.exam_lead, now)
+            # an exam moved to another day gets a fresh alert
+            rows.append(_row(item.user_id, ReminderKind.event, f"exam:{event_id}:{day}",
+                             due_at, now, event_id))
+            for user_id in readers.get(item.course_id, []) if item.is_shared else []:
+                if user_id != item.user_id:
+                    rows.append(_row(user_id, ReminderKind.event,
+                                     f"exam:{event_id}:{day}:{user_id}", due_at, now, event_id))
+        return rows
+
+    # sending
+
+    async def tick(self, now: Optional[datetime] = None) -> int:
+        """Claim, render and send one batch of due reminders; returns how many were claimed."""
+        now = now or datetime.now(timezone.utc)
+        async with AsyncSession(self.engine, expire_on_commit=False) as db:
+            await self._expire_stale(db, now)
+            claimed = await self._claim(db, now)
+            if not claimed:
+                return 0
+            pending = await self._render(db, claimed, now)
+
+        outcomes = await self._deliver([p for p in pending if p.message is not None])
+        skipped = [p.reminder.id for p in pending if p.message is None]
+        async with AsyncSession(self.engine) as db:
+            await self._record(db, outcomes, skipped)
+        return len(claimed)
+
+    async def _expire_stale(self, db: AsyncSession, now: datetime) -> None:
+        # the provider may already have accepted these: never send them again
+        await db.exec(
+            update(Reminder)
+            .where(Reminder.status == ReminderStatus.sending, Reminder.locked_until < now)
+            .values(status=ReminderStatus.failed, locked_until=None, updated_at=now,
+                    last_error="send lease expired; not retried to avoid a duplicate")
+        )
+        await db.commit()
+
+    async def _claim(self, db: AsyncSession, now: datetime) -> List[Reminder]:
+        reminders = (
+            await db.exec(
+                select(Reminder)
+                .where(Reminder.status == ReminderStatus.pending, Reminder.due_at <= now)
+                .order_by(Reminder.due_at)
+                .limit(self.claim_limit)
+                .with_for_update(skip_locked=True)
+            )
+        ).all()
+        for reminder in reminders:
+            reminder.status = ReminderStatus.sending
+            reminder.locked_until = now + SEND_LEASE
+            reminder.updated_at = now
+        await db.commit()
+        return list(reminders)
+
+    async def _render(self, db: AsyncSession, reminders: Sequence[Reminder],
+                      now: datetime) -> List[_Pending]:
+        user_ids = list({r.user_id for r in reminders})
+        users = {
+            u.user_id: u
+            for u in (await db.exec(select(User).where(User.user_id.in_(user_ids)))).all()
+        }
+        # one events query covers every user in the batch
+        day_start = min(self._local_day(r.due_at)[0] for r in reminders)
+        window_end = max(as_utc(r.due_at) for r in reminders) + max(
+            self.deadline_lookahead, self.exam_lead
+        ) + timedelta(days=1)
+        per_user: Dict[uuid.UUID, List[Any]] = defaultdict(list)
+        repository = EventRepository(db)
+        for event in await repository.in_window(user_ids, day_start, window_end):
+            per_user[event.user_id].append(event)
+        for user_id, event in await repository.shared_in_window(user_ids, day_start, window_end):
+            per_user[user_id].append(event)
+        for events in per_user.values():
+            events.sort(key=lambda e: as_utc(e.starts_at))
+
+        pending = []
+        for reminder in reminders:
+            user = users.get(reminder.user_id)
+            message = None
+            if user is not None:
+                if reminder.kind == ReminderKind.digest:
+                    message = self.render_digest(user, per_user[user.user_id], reminder.due_at, now)
+                else:
+                    message = self.render_exam_alert(user, per_user[user.user_id], reminder)
+            pending.append(_Pending(reminder, message))
+        return pending
+
+    def _local_day(self, instant: datetime) -> Tuple[datetime, datetime]:
+        day = as_utc(instant).astimezone(self.tz).date()
+        start = datetime.combine(day, time.min, tzinfo=self.tz).astimezone(timezone.utc)
+        end = datetime.combine(day + timedelta(days=1), time.min, tzinfo=self.tz)
+        return start, end.astimezone(timezone.utc)
+
+    def _when(self, event: Any) -> str:
+        return as_utc(event.starts_at).astimezone(self.tz).strftime("%a %d %b, %I:%M %p")
+
+    def render_digest(self, user: User, events: Sequence[Any], due_at: datetime,
+                      now: datetime) -> Optional[MailMessage]:
+        """Today's schedule plus upcoming deadlines and exams; None if all are empty."""
+        day_start, day_end = self._local_day(due_at)
+        since = max(as_utc(now), day_start)
+        today, deadlines, exams = [], [], []
+        for event in events:
+            starts_at, ends_at = as_utc(event.starts_at), as_utc(event.ends_at)
+            if starts_at < day_end and ends_at > day_start:
+                today.append(event)
+            elif starts_at >= day_end:
+                if event.type in DEADLINE_TYPES and starts_at < since + self.deadline_lookahead:
+                    deadlines.append(event)
+                elif event.type in EXAM_TYPES and starts_at < since + self.exam_lead:
+                    exams.append(event)
+        if not (today or deadlines or exams):
+            return None
+
+        sections = [("Today", today), ("Upcoming deadlines", deadlines), ("Upcoming exams", exams)]
+        text_parts, html_parts = [], []
+        for heading, items in sections:
+            if not items:
+                continue
+            text_parts.append(heading + ":\n" + "\n".join(
+                f"  - {self._when(e)}  {e.title}" for e in items
+            ))
+            html_parts.append(f"<h3>{heading}</h3><ul>" + "".join(
+                f"<li>{html.escape(self._when(e))} &mdash; {html.escape(e.title)}</li>" for e in items
+            ) + "</ul>")
+
+        day = as_utc(due_at).astimezone(self.tz).strftime("%A, %d %B")
+        greeting = f"Hi {user.name or user.email},"
+        return MailMessage(
+            to_email=user.email,
+            to_name=user.name,
+            subject=f"Your schedule for {day}",
+            html=f"<p>{html.escape(greeting)}</p>" + "".join(html_parts),
+            text=greeting + "\n\n" + "\n\n".join(text_parts),
+        )
+
+    def render_exam_alert(self, user: User, events: Sequence[Any],
+                          reminder: Reminder) -> Optional[MailMessage]:
+        """The alert for the exam named by the reminder; None if it was moved or deleted."""
+        # exam:<event>:<date>, plus :<user> for an enrolled student's copy
+        day = reminder.dedupe_key.split(":")[2]
+        for event in events:
+            if reminder.event_id not in (event.id, getattr(event, "series_id", None)):
+                continue
+            if as_utc(event.starts_at).astimezone(self.tz).date().isoformat() != day:
+                continue
+            when = self._when(event)
+            return MailMessage(
+                to_email=user.email,
+                to_name=user.name,
+                subject=f"Coming up: {event.title} on {when}",
+                html=(f"<p>Hi {html.escape(user.name or user.email)},</p>"
+                      f"<p><b>{html.escape(event.title)}</b> is on {html.escape(when)}.</p>"),
+                text=f"Hi {user.name or user.email},\n\n{event.title} is on {when}.",
+            )
+        return None
+
+    async def _deliver(self, pending: List[_Pending]) -> List[Tuple[_Pending, Optional[str], Optional[Exception]]]:
+        size = self.mailer.batch_size
+        batches = [pending[i:i + size] for i in range(0, len(pending), size)]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send(batch: List[_Pending]):
+            async with semaphore:
+                try:
+                    ids = await self.mailer.send_batch([p.message for p in batch])
+                except Exception as e:
+                    return [(p, None, e) for p in batch]
+                return [(p, message_id, None) for p, message_id in zip(batch, ids)]
+
+        results = await asyncio.gather(*(send(b) for b in batches))
+        return [outcome for batch in results for outcome in batch]
+
+    async def _record(self, db: AsyncSession, outcomes, skipped: List[uuid.UUID]) -> None:
+        now = datetime.now(timezone.utc)
+        changes = []
+        for p, message_id, error in outcomes:
+            reminder = p.reminder
+            if error is None:
+                changes.append({
+                    "id": reminder.id, "status": ReminderStatus.sent, "sent_at": now,
+                    "provider_message_id": message_id, "locked_until": None, "updated_at": now,
+                })
+                continue
+            attempts = reminder.attempts + 1
+            retry = (
+                isinstance(error, MailDeliveryError)
+                and not error.maybe_sent
+                and attempts < self.max_attempts
+            )
+            changes.append({
+                "id": reminder.id,
+                "status": ReminderStatus.pending if retry else ReminderStatus.failed,
+                "attempts": attempts,
+                "due_at": now + _backoff(attempts) if retry else reminder.due_at,
+                "last_error": str(error)[:2000],
+                "locked_until": None,
+                "updated_at": now,
+            })
+        changes.extend(
+            {"id": reminder_id, "status": ReminderStatus.skipped, "locked_until": None, "updated_at": now}
+            for reminder_id in skipped
+        )
+        # executemany grouped by column set: one round trip per outcome type
+        by_shape: Dict[Tuple[str, ...], List[Dict[str, Any]]] = defaultdict(list)
+        for change in changes:
+            by_shape[tuple(sorted(change))].append(change)
+        for rows in by_shape.values():
+            await db.execute(update(Reminder), rows)
+        await db.commit()
+
+
+async def _main(once: bool) -> None:
+    from database import dispose_engines, get_async_engine
+
+    scheduler = ReminderScheduler(get_async_engine())
+    try:
+        if once:
+            await scheduler.plan()
+            while await scheduler.tick() >= scheduler.claim_limit:
+                pass
+        else:
+            scheduler.start()
+            await asyncio.gather(*scheduler._tasks)
+    finally:
+        await scheduler.stop()
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(_main(once="--once" in sys.argv[1:]))
+    except KeyboardInterrupt:
+        pass
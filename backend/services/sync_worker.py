@@ -0,0 +1,311 @@
+import asyncio
+import random
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from models.models import Event, EventSyncJob, SyncJobStatus, SyncOperation, User
+from services.google_calendar import (
+    BatchOperation,
+    GoogleAPIError,
+    GoogleCalendarClient,
+    get_calendar_client,
+    google_event_body,
+    google_event_id,
+)
+from services.event_cache import event_versions
+from services.google_quota import background, user_quota
+from services.tokens import token_manager
+
+
+# a claimed job whose worker died is picked up again after this long
+JOB_LEASE = timedelta(minutes=5)
+MAX_BACKOFF_SECONDS = 3600
+
+
+def _backoff(attempts: int) -> timedelta:
+    # 2s, 4s, 8s, ... capped at an hour, with jitter so retries don't align
+    seconds = min(2 ** attempts, MAX_BACKOFF_SECONDS)
+    return timedelta(seconds=seconds * random.uniform(0.5, 1.0))
+
+
+def _is_permanent(error: Exception) -> bool:
+    # bad request / missing calendar etc. will not fix themselves by retrying
+    return (
+        isinstance(error, GoogleAPIError)
+        and 400 <= error.status_code < 500
+        and error.status_code != 401
+        and not error.is_rate_limited
+    )
+
+
+class EventSyncWorker:
+    """
+    In-process worker pool draining the `event_sync_jobs` outbox.
+
+    A dispatcher claims due jobs (FOR UPDATE SKIP LOCKED, so several app
+    processes can share the table) and hands them out grouped per user;
+    `concurrency` workers push each user's batch to Google and write
+    `google_event_id` / `is_synced` back on the event.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        concurrency: int = settings.SYNC_WORKER_CONCURRENCY,
+        batch_size: int = settings.SYNC_WORKER_BATCH_SIZE,
+        poll_interval: float = settings.SYNC_WORKER_POLL_SECONDS,
+        max_attempts: int = settings.SYNC_WORKER_MAX_ATTEMPTS,
+    ):
+        self.engine = engine
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self._queue: "asyncio.Queue[Tuple[uuid.UUID, List[uuid.UUID]]]" = asyncio.Queue(
+            maxsize=concurrency * 2
+        )
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        # pushes queue behind interactive Google reads (services/google_quota.py)
+        with background():
+            self._tasks.append(asyncio.create_task(self._dispatch_loop()))
+            for _ in range(self.concurrency):
+                self._tasks.append(asyncio.create_task(self._worker_loop()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake the dispatcher right away instead of waiting for the next poll."""
+        self._wakeup.set()
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            try:
+                batches = await self._claim_due_jobs()
+            except Exception as e:
+                print(f"Sync dispatcher failed to claim jobs: {e}")
+                batches = []
+
+            for batch in batches:
+                await self._queue.put(batch)
+
+            if not batches:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def _worker_loop(self) -> None:
+        while True:
+            user_id, job_ids = await self._queue.get()
+            try:
+                await self.process_batch(user_id, job_ids)
+            except Exception as e:
+                print(f"Sync batch for user {user_id} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _claim_due_jobs(self) -> List[Tuple[uuid.UUID, List[uuid.UUID]]]:
+        now = datetime.now(timezone.utc)
+        limit = self.batch_size * self.concurrency
+        async with AsyncSession(self.engine) as db:
+            jobs = (
+                await db.exec(
+                    select(EventSyncJob)
+                    .where(
+                        or_(
+                            (EventSyncJob.status == SyncJobStatus.pending)
+                            & (EventSyncJob.next_attempt_at <= now),
+                            (EventSyncJob.status == SyncJobStatus.in_progress)
+                            & (EventSyncJob.locked_until < now),
+                        )
+                    )
+                    .order_by(EventSyncJob.next_attempt_at)
+                    .limit(limit)
+                    .with_for_update(skip_locked=True)
+                )
+            ).all()
+
+            per_user: Dict[uuid.UUID, List[uuid.UUID]] = defaultdict(list)
+            for job in jobs:
+                job.status = SyncJobStatus.in_progress
+                job.locked_until = now + JOB_LEASE
+                job.updated_at = now
+                per_user[job.user_id].append(job.id)
+            await db.commit()
+
+        batches = []
+        for user_id, ids in per_user.items():
+            for i in range(0, len(ids), self.batch_size):
+                batches.append((user_id, ids[i:i + self.batch_size]))
+        return batches
+
+    async def process_batch(self, user_id: uuid.UUID, job_ids: List[uuid.UUID]) -> None:
+        """Push one user's claimed jobs to Google as a single batch request."""
+        client = get_calendar_client()
+        async with AsyncSession(self.engine, expire_on_commit=False) as db:
+            user = await db.get(User, user_id)
+            jobs = (
+                await db.exec(
+                    select(EventSyncJob)
+                    .where(EventSyncJob.id.in_(job_ids))
+                    .order_by(EventSyncJob.created_at)
+                )
+            ).all()
+
+            try:
+                access_token = await token_manager.get_access_token(user) if user else None
+                access_token = access_token or (user.google_access_token if user else None)
+                if not access_token:
+                    raise RuntimeError("user has no Google credentials")
+            except Exception as e:
+                self._fail_all(jobs, e)
+                await db.commit()
+                return
+
+            calendar_id = user.calendar_id or "primary"
+            pending: List[Tuple[EventSyncJob, Optional[Event], BatchOperation]] = []
+            for job in jobs:
+                event = await db.get(Event, job.event_id) if job.event_id else None
+                operation = self._operation(calendar_id, job, event)
+                if operation is None:
+                    self._mark_done(job)
+                else:
+                    pending.append((job, event, operation))
+
+            try:
+                with user_quota(user_id):
+                    results = await client.send(access_token, [op for _, _, op in pending])
+            except GoogleAPIError as e:
+                if e.is_rate_limited:
+                    # Google asked us to slow down: park the whole batch for this
+                    # user instead of hammering the quota
+                    self._defer([job for job, _, _ in pending], e)
+                else:
+                    self._fail_all([job for job, _, _ in pending], e)
+                await db.commit()
+                return
+            except Exception as e:
+                self._fail_all([job for job, _, _ in pending], e)
+                await db.commit()
+                return
+
+            throttled = []
+            for (job, event, operation), result in zip(pending, results):
+                if result.ok:
+                    # a DELETE answers 204 with no body
+                    google_id = (
+                        None if job.operation == SyncOperation.delete else result.payload["id"]
+                    )
+                    self._apply(job, event, google_id)
+                elif operation.method == "POST" and result.status_code == 409:
+                    # an earlier attempt created it after all; the id is ours
+                    self._adopt(job, event, operation.body["id"])
+                elif job.operation == SyncOperation.delete and result.status_code in (404, 410):
+                    # already gone on Google's side
+                    self._mark_done(job)
+                elif result.error().is_rate_limited:
+                    throttled.append(job)
+                else:
+                    self._record_failure(job, result.error())
+            if throttled:
+                self._defer(throttled, GoogleAPIError(429, "rate limited inside batch"))
+            await db.commit()
+        # is_synced / google_event_id are part of the GET /api/events payload
+        await event_versions.bump(user_id)
+
+    @staticmethod
+    def _operation(calendar_id: str, job: EventSyncJob,
+                   event: Optional[Event]) -> Optional[BatchOperation]:
+        path = GoogleCalendarClient.events_path
+        if job.operation == SyncOperation.delete:
+            if not job.google_event_id:
+                return None
+            return BatchOperation("DELETE", path(calendar_id, job.google_event_id))
+
+        if event is None:
+            # the event was deleted locally before it could be synced
+            return None
+
+        if job.operation == SyncOperation.update and event.google_event_id:
+            return BatchOperation(
+                "PATCH", path(calendar_id, event.google_event_id), google_event_body(event)
+            )
+        return BatchOperation(
+            "POST", path(calendar_id), {**google_event_body(event), "id": google_event_id(event.id)}
+        )
+
+    def _apply(self, job: EventSyncJob, event: Optional[Event],
+               google_id: Optional[str]) -> None:
+        if event is not None and job.operation != SyncOperation.delete:
+            if job.operation == SyncOperation.insert or not event.google_event_id:
+                event.google_event_id = google_id
+            event.is_synced = True
+            event.updated_at = datetime.now(timezone.utc)
+        self._mark_done(job)
+
+    def _adopt(self, job: EventSyncJob, event: Event, google_id: str) -> None:
+        if job.operation == SyncOperation.insert:
+            self._apply(job, event, google_id)
+            return
+        # an update whose insert was lost: the copy on Google may be older
+        # than the row, so PATCH it on the next pass
+        event.google_event_id = google_id
+        event.updated_at = datetime.now(timezone.utc)
+        job.status = SyncJobStatus.pending
+        job.next_attempt_at = event.updated_at
+        job.locked_until = None
+        job.updated_at = event.updated_at
+
+    @staticmethod
+    def _mark_done(job: EventSyncJob) -> None:
+        job.status = SyncJobStatus.done
+        job.locked_until = None
+        job.last_error = None
+        job.updated_at = datetime.now(timezone.utc)
+
+    def _record_failure(self, job: EventSyncJob, error: Exception) -> None:
+        now = datetime.now(timezone.utc)
+        job.attempts += 1
+        job.last_error = str(error)[:2000]
+        job.locked_until = None
+        job.updated_at = now
+        if _is_permanent(error) or job.attempts >= self.max_attempts:
+            job.status = SyncJobStatus.failed
+        else:
+            job.status = SyncJobStatus.pending
+            job.next_attempt_at = now + _backoff(job.attempts)
+
+    def _fail_all(self, jobs: List[EventSyncJob], error: Exception) -> None:
+        for job in jobs:
+            self._record_failure(job, error)
+
+    def _defer(self, jobs: List[EventSyncJob], error: GoogleAPIError) -> None:
+        now = datetime.now(timezone.utc)
+        delay = timedelta(seconds=error.retry_after) if error.retry_after else _backoff(
+            max(job.attempts for job in jobs) + 1
+        )
+        for job in jobs:
+            # rate limiting is not the job's fault, so it does not use up an attempt
+            job.status = SyncJobStatus.pending
+            job.next_attempt_at = now + delay
+            job.locked_until = None
+            job.last_error = str(error)[:2000]
+            job.updated_at = now
@@ -0,0 +1,191 @@
+import asyncio
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from models.models import User
+from services.google_calendar import get_calendar_client
+from services.google_quota import background
+from services.metrics import TOKEN_REFRESHES, span
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands token_expiry back without a timezone; it is always written in UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+@dataclass
+class CachedToken:
+    access_token: str
+    expiry: Optional[datetime]
+    last_used: datetime
+
+    def valid_for(self, seconds: int) -> bool:
+        if self.expiry is None:
+            return True
+        return self.expiry > datetime.now(timezone.utc) + timedelta(seconds=seconds)
+
+
+class TokenManager:
+    """
+    Per-process owner of users' Google access tokens.
+
+    Live tokens are served from memory until GOOGLE_TOKEN_EXPIRY_MARGIN_SECONDS
+    before they expire. Concurrent refreshes for one user share a single
+    in-flight request, and the users row is locked while refreshing so other
+    app processes reuse the new token instead of refreshing again. A
+    background task renews tokens of recently active users ahead of time.
+    """
+
+    def __init__(
+        self,
+        engine=None,
+        margin: int = settings.GOOGLE_TOKEN_EXPIRY_MARGIN_SECONDS,
+        refresh_ahead: int = settings.GOOGLE_TOKEN_REFRESH_AHEAD_SECONDS,
+        interval: int = settings.GOOGLE_TOKEN_REFRESH_INTERVAL_SECONDS,
+        active_window: int = settings.GOOGLE_TOKEN_ACTIVE_SECONDS,
+    ):
+        self._engine = engine
+        self.margin = margin
+        self.refresh_ahead = refresh_ahead
+        self.interval = interval
+        self.active_window = timedelta(seconds=active_window)
+        self._tokens: Dict[uuid.UUID, CachedToken] = {}
+        self._inflight: Dict[uuid.UUID, "asyncio.Task[Optional[str]]"] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            # imported lazily so importing this module never builds an engine
+            from database import get_async_engine
+            self._engine = get_async_engine()
+        return self._engine
+
+    async def get_access_token(self, user: User) -> Optional[str]:
+        """Return a usable access token for `user`, refreshing it only if needed."""
+        if not user.google_refresh_token:
+            return None
+
+        now = datetime.now(timezone.utc)
+        cached = self._tokens.get(user.user_id)
+        if cached is None and user.google_access_token:
+            cached = self._tokens[user.user_id] = CachedToken(
+                user.google_access_token, _as_utc(user.token_expiry), now
+            )
+        if cached is not None:
+            cached.last_used = now
+            if cached.valid_for(self.margin):
+                return cached.access_token
+        return await self.refresh(user.user_id)
+
+    def store(self, user_id: uuid.UUID, access_token: str, expiry: Optional[datetime]) -> None:
+        """Cache a token obtained elsewhere (the OAuth callback)."""
+        self._tokens[user_id] = CachedToken(
+            access_token, _as_utc(expiry), datetime.now(timezone.utc)
+        )
+
+    def forget(self, user_id: uuid.UUID) -> None:
+        self._tokens.pop(user_id, None)
+
+    async def refresh(self, user_id: uuid.UUID) -> Optional[str]:
+        """Refresh the user's token; concurrent callers share one request."""
+        task = self._inflight.get(user_id)
+        if task is None:
+            task = asyncio.create_task(self._refresh(user_id))
+            self._inflight[user_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(user_id, None))
+        # shield: one cancelled request must not abort the refresh for the others
+        return await asyncio.shield(task)
+
+    async def _refresh(self, user_id: uuid.UUID) -> Optional[str]:
+        async with AsyncSession(self.engine, expire_on_commit=False) as db:
+            user = (
+                await db.exec(
+                    select(User).where(User.user_id == user_id).with_for_update()
+                )
+            ).first()
+            if user is None or not user.google_refresh_token:
+                self.forget(user_id)
+                return None
+
+            previous = self._tokens.get(user_id)
+            last_used = previous.last_used if previous else datetime.now(timezone.utc)
+            current = CachedToken(
+                user.google_access_token, _as_utc(user.token_expiry), last_used
+            )
+            # another process may have refreshed while we waited for the row lock
+            if (
+                user.google_access_token
+                and (previous is None or previous.access_token != user.google_access_token)
+                and current.valid_for(self.refresh_ahead)
+            ):
+                self._tokens[user_id] = current
+                return current.access_token
+
+            try:
+                with span("token_refresh"):
+                    token_data = await get_calendar_client().refresh_access_token(
+                        user.google_refresh_token,
+                        settings.Google_CLIENT_ID,
+                        settings.Google_CLIENT_SECRET,
+                    )
+            except Exception:
+                TOKEN_REFRESHES.labels("error").inc()
+                raise
+            TOKEN_REFRESHES.labels("ok").inc()
+            now = datetime.now(timezone.utc)
+            user.google_access_token = token_data["access_token"]
+            user.token_expiry = now + timedelta(seconds=token_data.get("expires_in", 3600))
+            await db.commit()
+
+        self._tokens[user_id] = CachedToken(user.google_access_token, user.token_expiry, last_used)
+        return user.google_access_token
+
+    def start(self) -> None:
+        if self._task is None:
+            with background():
+                self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh_expiring()
+            except Exception as e:
+                print(f"Proactive token refresh failed: {e}")
+
+    async def refresh_expiring(self) -> int:
+        """Renew tokens of active users that expire within `refresh_ahead`; returns how many."""
+        cutoff = datetime.now(timezone.utc) - self.active_window
+        due = []
+        for user_id, cached in list(self._tokens.items()):
+            if cached.last_used < cutoff:
+                # idle users are dropped; their next request reloads from the row
+                self._tokens.pop(user_id, None)
+            elif not cached.valid_for(self.refresh_ahead):
+                due.append(user_id)
+
+        results = await asyncio.gather(
+            *(self.refresh(user_id) for user_id in due), return_exceptions=True
+        )
+        for user_id, result in zip(due, results):
+            if isinstance(result, Exception):
+                print(f"Refreshing Google token for {user_id} failed: {result}")
+        return sum(1 for result in results if isinstance(result, str))
+
+
+token_manager = TokenManager()
@@ -0,0 +1,84 @@
+"""
+Tests run against a throwaway SQLite database migrated to head; Google and
+the mailer are replaced per test, so nothing leaves the process.
+
+    cd backend && python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, time, timezone
+from pathlib import Path
+
+# config.py and database.py read the environment at import time
+_DB_PATH = Path(tempfile.mkdtemp(prefix="calendar-tests-")) / "test.db"
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_DB_PATH}",
+    "JWT_SECRET_KEY": "tests-only-" + "x" * 32,
+    "MAILER_BACKEND": "stub",
+    "REMINDER_TIMEZONE": "Asia/Dhaka",
+})
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import pytest  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+
+from database import create_async_db_engine, create_db_engine, run_migrations  # noqa: E402
+from models.models import Event, EventType, event_active_until, event_bounds  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def migrated():
+    run_migrations()
+
+
+@pytest.fixture(autouse=True)
+def empty_tables(migrated):
+    yield
+    engine = create_db_engine()
+    with engine.begin() as conn:
+        for table in reversed(SQLModel.metadata.sorted_tables):
+            conn.execute(table.delete())
+    engine.dispose()
+
+
+@pytest.fixture
+def run():
+    """
+    `run(scenario)` awaits `scenario(engine)` on a fresh event loop. The async
+    engine is created and disposed inside that loop, since aiosqlite
+    connections cannot move between loops.
+    """
+    def runner(scenario):
+        async def main():
+            engine = create_async_db_engine()
+            try:
+                return await scenario(engine)
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    return runner
+
+
+def _make_event(user_id, starts_at: datetime, type: EventType = EventType.exam, **fields) -> Event:
+    starts_at, ends_at = event_bounds(starts_at, starts_at.time(), fields.get("duration_minutes"))
+    return Event(
+        user_id=user_id,
+        title=fields.pop("title", "Midterm"),
+        type=type,
+        event_date=datetime.combine(starts_at.date(), time.min, tzinfo=timezone.utc),
+        task_time=starts_at.time(),
+        starts_at=starts_at,
+        ends_at=ends_at,
+        active_until=event_active_until(starts_at, ends_at, None, None),
+        **fields,
+    )
+
+
+@pytest.fixture
+def make_event():
+    """`make_event(user_id, starts_at, type, **fields)`: an Event starting at `starts_at` (UTC)."""
+    return _make_event
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.models import Course, Enrollment, Reminder, ReminderKind, ReminderStatus, User
+from services.mailer import StubMailer
+from services.reminders import SEND_LEASE, ReminderScheduler
+
+# 18:00 in Dhaka: today's digest is past its grace period and tomorrow's is
+# not due yet, so only exam alerts go out
+NOW = datetime(2030, 3, 4, 12, 0, tzinfo=timezone.utc)
+
+
+async def _add(engine, *rows):
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        for row in rows:
+            db.add(row)
+            # users and courses first: later rows reference them
+            await db.flush()
+        await db.commit()
+
+
+async def _reminders(engine, kind=ReminderKind.event):
+    async with AsyncSession(engine) as db:
+        query = select(Reminder)
+        if kind is not None:
+            query = query.where(Reminder.kind == kind)
+        return (await db.exec(query)).all()
+
+
+async def _shared_exam(engine, make_event):
+    """A course exam a day after NOW, posted by a teacher, with one enrolled student."""
+    teacher = User(email="teacher@northsouth.edu")
+    student = User(email="student@northsouth.edu")
+    course = Course(code="CSE299", name="Junior Design", semester="Spring 2030")
+    await _add(engine, teacher, student, course)
+    exam = make_event(teacher.user_id, NOW + timedelta(days=1), course_id=course.id, is_shared=True)
+    await _add(engine, Enrollment(course_id=course.id, user_id=student.user_id), exam)
+    return exam, teacher, student
+
+
+def test_shared_exam_alerts_enrolled_students(run, make_event):
+    mailer = StubMailer()
+
+    async def scenario(engine):
+        _, teacher, student = await _shared_exam(engine, make_event)
+        scheduler = ReminderScheduler(engine, mailer=mailer)
+        await scheduler.plan(NOW)
+        await scheduler.tick(NOW)
+        return {r.user_id: r.status for r in await _reminders(engine)}, teacher, student
+
+    statuses, teacher, student = run(scenario)
+    assert statuses == {teacher.user_id: ReminderStatus.sent, student.user_id: ReminderStatus.sent}
+    assert sorted(m.to_email for m in mailer.outbox) == [student.email, teacher.email]
+    assert all(m.subject.startswith("Coming up: Midterm") for m in mailer.outbox)
+
+
+def test_replanning_adds_no_rows(run, make_event):
+    async def scenario(engine):
+        user = User(email="a@northsouth.edu")
+        await _add(engine, user)
+        await _add(engine, make_event(user.user_id, NOW + timedelta(days=1)))
+        scheduler = ReminderScheduler(engine, mailer=StubMailer())
+        await scheduler.plan(NOW)
+        first = {r.dedupe_key: r.id for r in await _reminders(engine, kind=None)}
+        # a restart plans the same window again, a little later
+        await scheduler.plan(NOW + timedelta(minutes=5))
+        second = {r.dedupe_key: r.id for r in await _reminders(engine, kind=None)}
+        return first, second
+
+    first, second = run(scenario)
+    kinds = sorted(key.split(":")[0] for key in first)
+    # tomorrow's digest and the exam alert; today's digest is past its grace period
+    assert kinds == ["digest", "exam"]
+    assert second == first
+
+
+def test_exam_alert_keys(run, make_event):
+    async def scenario(engine):
+        exam, teacher, student = await _shared_exam(engine, make_event)
+        await ReminderScheduler(engine, mailer=StubMailer()).plan(NOW)
+        return exam, teacher, student, await _reminders(engine)
+
+    exam, teacher, student, reminders = run(scenario)
+    # the exam's local date (Asia/Dhaka), not its UTC one
+    day = (NOW + timedelta(days=1, hours=6)).date().isoformat()
+    assert {r.user_id: r.dedupe_key for r in reminders} == {
+        teacher.user_id: f"exam:{exam.id}:{day}",
+        student.user_id: f"exam:{exam.id}:{day}:{student.user_id}",
+    }
+    assert {r.event_id for r in reminders} == {exam.id}
+    assert {r.due_at.replace(tzinfo=timezone.utc) for r in reminders} == {NOW}
+
+
+def test_expired_send_lease_fails_instead_of_resending(run, make_event):
+    mailer = StubMailer()
+
+    async def scenario(engine):
+        await _shared_exam(engine, make_event)
+        scheduler = ReminderScheduler(engine, mailer=mailer)
+        await scheduler.plan(NOW)
+        # a worker claims the alerts and dies before recording the outcome
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            claimed = await scheduler._claim(db, NOW)
+        before = {r.status for r in await _reminders(engine)}
+        # still leased: nobody else picks them up
+        await scheduler.tick(NOW + SEND_LEASE - timedelta(seconds=1))
+        during = {r.status for r in await _reminders(engine)}
+        await scheduler.tick(NOW + SEND_LEASE + timedelta(seconds=1))
+        return len(claimed), before, during, await _reminders(engine)
+
+    claimed, before, during, reminders = run(scenario)
+    assert claimed == 2
+    assert before == during == {ReminderStatus.sending}
+    assert {r.status for r in reminders} == {ReminderStatus.failed}
+    assert all("lease expired" in r.last_error for r in reminders)
+    assert mailer.outbox == []
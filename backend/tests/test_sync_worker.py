@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.models import Event, EventSyncJob, SyncJobStatus, SyncOperation, User
+from services import sync_worker
+from services.google_calendar import BatchResult, GoogleCalendarClient, google_event_id
+from services.sync_worker import EventSyncWorker
+
+
+def test_batch_with_a_delete_job(run, make_event, monkeypatch):
+    sent = []
+
+    async def fake_send(self, access_token, operations):
+        sent.append([(op.method, op.path) for op in operations])
+        # inserts echo the event back; a successful DELETE is 204 with no body
+        return [
+            BatchResult(204, None) if op.method == "DELETE" else BatchResult(200, op.body)
+            for op in operations
+        ]
+
+    async def fake_token(user):
+        return user.google_access_token
+
+    monkeypatch.setattr(GoogleCalendarClient, "send", fake_send)
+    monkeypatch.setattr(sync_worker.token_manager, "get_access_token", fake_token)
+
+    async def scenario(engine):
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            user = User(email="a@northsouth.edu", google_access_token="token", calendar_id="primary")
+            db.add(user)
+            await db.commit()
+            event = make_event(user.user_id, datetime.now(timezone.utc) + timedelta(days=3))
+            db.add(event)
+            jobs = [
+                EventSyncJob(event_id=event.id, user_id=user.user_id, operation=SyncOperation.insert),
+                EventSyncJob(user_id=user.user_id, operation=SyncOperation.delete,
+                             google_event_id="removed-elsewhere"),
+            ]
+            db.add_all(jobs)
+            await db.commit()
+
+        await EventSyncWorker(engine).process_batch(user.user_id, [job.id for job in jobs])
+
+        async with AsyncSession(engine) as db:
+            statuses = {
+                job.operation: job.status for job in (await db.exec(select(EventSyncJob))).all()
+            }
+            return await db.get(Event, event.id), statuses
+
+    event, statuses = run(scenario)
+    assert [method for method, _ in sent[0]] == ["POST", "DELETE"]
+    assert statuses == {SyncOperation.insert: SyncJobStatus.done, SyncOperation.delete: SyncJobStatus.done}
+    assert event.is_synced
+    assert event.google_event_id == google_event_id(event.id)
@@ -0,0 +1,73 @@
+"""
+Send a fake Google Calendar push notification to a running backend.
+
+Lets the /api/google/notifications webhook be exercised locally without a
+public HTTPS address. Run from the backend directory:
+
+    python -m tools.fake_google_notify --email someone@northsouth.edu
+    python -m tools.fake_google_notify --channel-id ... --resource-id ... --token ...
+"""
+import argparse
+import sys
+
+import httpx
+from sqlmodel import Session, select
+
+
+def _channel_for(email: str):
+    # imported lazily so explicit --channel-id use needs no database
+    from database import create_db_engine
+    from models.models import GoogleWatchChannel, User
+
+    with Session(create_db_engine()) as db:
+        channel = db.exec(
+            select(GoogleWatchChannel)
+            .join(User, User.user_id == GoogleWatchChannel.user_id)
+            .where(User.email == email)
+            .order_by(GoogleWatchChannel.expiration.desc())
+        ).first()
+        if channel is None:
+            sys.exit(f"No watch channel registered for {email}")
+        return channel.id, channel.resource_id, channel.token
+
+
+def send_notification(url: str, channel_id: str, resource_id: str, token: str,
+                      state: str = "exists", message_number: int = 1) -> httpx.Response:
+    headers = {
+        "X-Goog-Channel-ID": channel_id,
+        "X-Goog-Channel-Token": token,
+        "X-Goog-Resource-ID": resource_id,
+        "X-Goog-Resource-State": state,
+        "X-Goog-Message-Number": str(message_number),
+        "X-Goog-Resource-URI": "https://www.googleapis.com/calendar/v3/calendars/primary/events",
+    }
+    return httpx.post(url, headers=headers)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000/api/google/notifications")
+    parser.add_argument("--email", help="look the channel up in the database by user email")
+    parser.add_argument("--channel-id")
+    parser.add_argument("--resource-id")
+    parser.add_argument("--token")
+    parser.add_argument("--state", default="exists", choices=["sync", "exists", "not_exists"])
+    parser.add_argument("--count", type=int, default=1, help="notifications to send")
+    args = parser.parse_args()
+
+    if args.email:
+        channel_id, resource_id, token = _channel_for(args.email)
+    elif args.channel_id and args.resource_id and args.token:
+        channel_id, resource_id, token = args.channel_id, args.resource_id, args.token
+    else:
+        parser.error("pass --email or all of --channel-id/--resource-id/--token")
+
+    for number in range(1, args.count + 1):
+        response = send_notification(
+            args.url, channel_id, resource_id, token, args.state, number
+        )
+        print(f"#{number}: {response.status_code}")
+
+
+if __name__ == "__main__":
+    main()